@@ -1,5 +1,5 @@
 from django.contrib import admin
-from security.models import SecurityProfile
+from security.models import Location, SecurityProfile
 from .models import Route
 
 @admin.register(SecurityProfile)
@@ -25,3 +25,11 @@ class RouteAdmin(admin.ModelAdmin):
     list_filter = ['assigned_security_guard', 'created_at']
     search_fields = ['name', 'description']
     filter_horizontal = ['checkpoints']  # For many-to-many field
+    readonly_fields = ['checkpoint_order', 'planned_distance_m', 'estimated_walk_seconds', 'planned_at']
+
+
+@admin.register(Location)
+class LocationAdmin(admin.ModelAdmin):
+    list_display = ['name', 'is_active', 'created_at']
+    list_filter = ['is_active']
+    search_fields = ['name', 'description']
@@ -0,0 +1,153 @@
+"""
+Per-guard facts behind the security compliance dashboard.
+
+collect_guard_facts() computes them from the source tables with a fixed number
+of queries. When settings.COMPLIANCE_SUMMARY_ENABLED is on, the same facts are
+kept in GuardComplianceSummary and refreshed incrementally as compliance records
+and routes are written (see adminstrator/signals.py), so the dashboard reads a
+single table regardless of how many guards there are. Checkpoints visited today
+come from the route visit bitmaps (see adminstrator/route_progress.py), not
+from these facts.
+"""
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Count, OuterRef, Q, Subquery
+
+from security.models import SecurityProfile
+from .models import GuardComplianceSummary, Route, SecurityCompliance, compliance_score_expression
+
+
+def summary_enabled():
+    return getattr(settings, 'COMPLIANCE_SUMMARY_ENABLED', False)
+
+
+def latest_compliance_subquery(guard_ref='pk'):
+    """Subquery selecting the id of a guard's most recent compliance record"""
+    return Subquery(
+        SecurityCompliance.objects.filter(
+            security_guard=OuterRef(guard_ref)
+        ).order_by('-date', '-id').values('id')[:1]
+    )
+
+
+def collect_guard_facts(guard_ids, using=None):
+    """Return {guard_id: facts} computed from the source tables in three queries, on the `using` alias if given"""
+    guard_ids = list(guard_ids)
+
+    latest_ids = dict(
+        SecurityProfile.objects.using(using).filter(id__in=guard_ids).annotate(
+            latest_compliance_id=latest_compliance_subquery()
+        ).values_list('id', 'latest_compliance_id')
+    )
+    latest_records = SecurityCompliance.objects.using(using).with_score().in_bulk(
+        [record_id for record_id in latest_ids.values() if record_id]
+    )
+
+    # First route by name for each guard, matching Route.objects.filter(...).first()
+    routes = {}
+    for route in Route.objects.using(using).filter(assigned_security_guard_id__in=guard_ids).annotate(
+        total_checkpoints=Count('checkpoints')
+    ).order_by('name'):
+        routes.setdefault(route.assigned_security_guard_id, route)
+
+    facts = {}
+    for guard_id in guard_ids:
+        route = routes.get(guard_id)
+        latest = latest_records.get(latest_ids.get(guard_id))
+        facts[guard_id] = {
+            'latest': latest,
+            'score': latest.score if latest else None,
+            'has_route': route is not None,
+            'route_id': route.id if route else None,
+            'route_name': route.name if route else '',
+            'total_checkpoints': route.total_checkpoints if route else 0,
+        }
+    return facts
+
+
+def rebuild_summaries(guard_ids=None):
+    """Recompute GuardComplianceSummary rows for the given guards (all guards when None)"""
+    # Read from the primary even inside a @replica_reads view: the rows written here outlive the request
+    if guard_ids is None:
+        guard_ids = SecurityProfile.objects.using(DEFAULT_DB_ALIAS).values_list('id', flat=True)
+    facts = collect_guard_facts(guard_ids, using=DEFAULT_DB_ALIAS)
+
+    existing = {
+        summary.security_guard_id: summary
+        for summary in GuardComplianceSummary.objects.using(DEFAULT_DB_ALIAS).filter(security_guard_id__in=facts.keys())
+    }
+    to_create, to_update = [], []
+    for guard_id, guard_facts in facts.items():
+        summary = existing.get(guard_id) or GuardComplianceSummary(security_guard_id=guard_id)
+        latest = guard_facts['latest']
+        summary.latest_compliance = latest
+        summary.latest_date = latest.date if latest else None
+        summary.has_route = guard_facts['has_route']
+        summary.route_id = guard_facts['route_id']
+        summary.route_name = guard_facts['route_name']
+        summary.total_checkpoints = guard_facts['total_checkpoints']
+        (to_update if summary.pk else to_create).append(summary)
+
+    GuardComplianceSummary.objects.using(DEFAULT_DB_ALIAS).bulk_create(to_create)
+    GuardComplianceSummary.objects.using(DEFAULT_DB_ALIAS).bulk_update(to_update, [
+        'latest_compliance', 'latest_date', 'has_route', 'route', 'route_name',
+        'total_checkpoints',
+    ])
+    return len(facts)
+
+
+def _summaries_for(guard_ids, using=None):
+    return GuardComplianceSummary.objects.using(using).filter(
+        security_guard_id__in=guard_ids
+    ).select_related('latest_compliance').annotate(
+        latest_score=compliance_score_expression('latest_compliance__')
+    )
+
+
+def load_guard_facts(guard_ids):
+    """Return {guard_id: facts} from GuardComplianceSummary, backfilling missing rows"""
+    guard_ids = list(guard_ids)
+    summaries = {
+        summary.security_guard_id: summary
+        for summary in _summaries_for(guard_ids)
+    }
+    missing = [guard_id for guard_id in guard_ids if guard_id not in summaries]
+    if missing:
+        rebuild_summaries(missing)
+        summaries.update({
+            summary.security_guard_id: summary
+            for summary in _summaries_for(missing, using=DEFAULT_DB_ALIAS)
+        })
+
+    return {
+        guard_id: {
+            'latest': summary.latest_compliance,
+            'score': summary.latest_score,
+            'has_route': summary.has_route,
+            'route_id': summary.route_id,
+            'route_name': summary.route_name,
+            'total_checkpoints': summary.total_checkpoints,
+        }
+        for guard_id, summary in summaries.items()
+    }
+
+
+def note_compliance_record(record):
+    """Point a guard's summary at a compliance record if it is the most recent one"""
+    if not summary_enabled():
+        return
+    updated = GuardComplianceSummary.objects.filter(
+        Q(latest_date__lte=record.date) | Q(latest_date__isnull=True),
+        security_guard_id=record.security_guard_id,
+    ).update(latest_compliance=record, latest_date=record.date)
+    if not updated and not GuardComplianceSummary.objects.filter(security_guard_id=record.security_guard_id).exists():
+        rebuild_summaries([record.security_guard_id])
+
+
+def refresh_guards(guard_ids=None):
+    """Recompute summaries after route or compliance changes that can't be applied incrementally"""
+    if not summary_enabled():
+        return
+    if guard_ids is None:
+        guard_ids = GuardComplianceSummary.objects.values_list('security_guard_id', flat=True)
+    rebuild_summaries(guard_ids)
@@ -0,0 +1,89 @@
+"""
+Cached counters for the administrator dashboard.
+
+compute_summary() reads every dashboard number with one conditional
+aggregation per model (Count/Sum with filter=Q(...)), so the cost does not
+depend on how many guards, members or subscriptions exist. dashboard_summary
+keeps the result in process; adminstrator/signals.py invalidates it when a
+SecurityProfile, UserProfile or Subscription is written, once the transaction
+commits. Other processes do not see that invalidation, so entries also expire
+after DASHBOARD_SUMMARY_TTL seconds. The counters are always read from the
+primary, even inside @replica_reads views: a value computed from a lagging
+replica right after an invalidation would be cached for the whole TTL.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Count, Q, Sum
+
+from members.models import UserProfile
+from security.models import SecurityProfile
+from .models import Subscription
+
+STATUSES = ('pending', 'approved', 'rejected')
+
+
+def _status_counts(model):
+    return model.objects.using(DEFAULT_DB_ALIAS).aggregate(**{
+        status: Count('id', filter=Q(status=status)) for status in STATUSES
+    })
+
+
+def compute_summary():
+    """Every dashboard counter, in one query per model, read from the primary"""
+    security = _status_counts(SecurityProfile)
+    members = _status_counts(UserProfile)
+    subscriptions = Subscription.objects.using(DEFAULT_DB_ALIAS).aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(status='active')),
+        revenue=Sum('monthly_fee', filter=Q(status='active')),
+    )
+    summary = {f'{status}_security_count': security[status] for status in STATUSES}
+    summary.update({f'{status}_members_count': members[status] for status in STATUSES})
+    summary.update({
+        'not_members_count': members['pending'],
+        'total_subscriptions': subscriptions['total'],
+        'active_subscriptions': subscriptions['active'],
+        'monthly_revenue': subscriptions['revenue'] or 0,
+    })
+    return summary
+
+
+class DashboardSummaryCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._value = None
+        self._expires = 0.0
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self):
+        with self._lock:
+            if self._value is not None and time.monotonic() < self._expires:
+                self.hits += 1
+                return dict(self._value)
+            self.misses += 1
+            generation = self._generation
+
+        value = compute_summary()
+        with self._lock:
+            # Keep it only if nothing was invalidated while it was being computed
+            if generation == self._generation:
+                self._value = value
+                self._expires = time.monotonic() + getattr(settings, 'DASHBOARD_SUMMARY_TTL', 60)
+        return dict(value)
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._value = None
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'cached': self._value is not None}
+
+
+dashboard_summary = DashboardSummaryCache()
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from adminstrator.subscription_analytics import expire_due
+
+
+class Command(BaseCommand):
+    help = 'Expire active subscriptions whose end date has passed and record them in the subscription rollups (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        count = expire_due(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Expired {count} subscriptions!'))
@@ -1,52 +1,41 @@
-import qrcode
-import os
-from io import BytesIO
 from django.core.management.base import BaseCommand
-from django.core.files.base import ContentFile
-from django.conf import settings
 from adminstrator.models import House
+from members.qr import bulk_generate_qr_codes
+from security.qr_signing import active_key
 
 
 class Command(BaseCommand):
-    help = 'Generate QR codes for houses that don\'t have them'
+    help = 'Generate QR codes for houses that don\'t have them, or re-sign them with --reissue'
 
-    def handle(self, *args, **options):
-        houses_without_qr = House.objects.filter(qr_code_data__exact='')
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help='Processes used to render PNGs (default: 1, no pool)')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Houses rendered and saved per bulk update')
+        parser.add_argument('--reissue', action='store_true',
+                            help='Also re-sign codes not signed with the active QR key, e.g. after a key rotation')
 
-        if not houses_without_qr.exists():
+    def handle(self, *args, **options):
+        if options['reissue']:
+            houses = House.objects.exclude(qr_code_data__contains=f'.{active_key().id}.')
+        else:
+            houses = House.objects.filter(qr_code_data__exact='')
+
+        def report(done, total, elapsed):
+            rate = done / elapsed if elapsed else 0
+            remaining = (total - done) / rate if rate else 0
+            self.stdout.write(f'{done}/{total} houses ({rate:.1f}/s, ~{remaining:.0f}s remaining)')
+
+        total = bulk_generate_qr_codes(
+            houses,
+            payload_prefix='house',
+            workers=options['workers'],
+            chunk_size=options['chunk_size'],
+            progress=report,
+        )
+
+        if not total:
             self.stdout.write(self.style.SUCCESS('All houses already have QR codes!'))
             return
 
-        self.stdout.write(f'Generating QR codes for {houses_without_qr.count()} houses...')
-
-        for house in houses_without_qr:
-            # Generate QR code data
-            qr_data = f"house:{house.id}"
-
-            # Create QR code
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.ERROR_CORRECT_L,
-                box_size=10,
-                border=4,
-            )
-            qr.add_data(qr_data)
-            qr.make(fit=True)
-
-            # Create QR code image
-            img = qr.make_image(fill_color="black", back_color="white")
-
-            # Save to BytesIO
-            buffer = BytesIO()
-            img.save(buffer, 'PNG')
-            buffer.seek(0)
-
-            # Save to model
-            filename = f'qr_house_{house.id}.png'
-            house.qr_code.save(filename, ContentFile(buffer.getvalue()), save=False)
-            house.qr_code_data = qr_data
-            house.save()
-
-            self.stdout.write(f'Generated QR code for house {house.house_number} - {house.address}')
-
-        self.stdout.write(self.style.SUCCESS(f'Successfully generated QR codes for {houses_without_qr.count()} houses!'))
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS(f'Successfully generated QR codes for {total} houses!'))
+        if options['reissue']:
+            self.stdout.write('Run prune_qr_images to delete the images the re-signed codes replaced.')
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from adminstrator.route_planner import plan_routes
+
+
+class Command(BaseCommand):
+    help = 'Recompute the checkpoint visiting order and walking estimate of every patrol route'
+
+    def handle(self, *args, **options):
+        count = plan_routes()
+        self.stdout.write(self.style.SUCCESS(f'Planned {count} routes!'))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from adminstrator.compliance_summary import rebuild_summaries
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the cached per-guard compliance dashboard summaries'
+
+    def handle(self, *args, **options):
+        count = rebuild_summaries()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt compliance summaries for {count} security guards!'))
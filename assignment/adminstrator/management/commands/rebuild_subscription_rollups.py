@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from adminstrator.subscription_analytics import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the subscription totals and daily rollups from the subscriptions table'
+
+    def handle(self, *args, **options):
+        count = rebuild_rollups()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt subscription rollups for {count} type/day combinations!'))
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('security', '0007_scanlog_client_scan_id'),
+        ('adminstrator', '0006_add_route_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GuardComplianceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('latest_date', models.DateField(blank=True, null=True)),
+                ('has_route', models.BooleanField(default=False)),
+                ('route_name', models.CharField(blank=True, max_length=100)),
+                ('total_checkpoints', models.PositiveIntegerField(default=0)),
+                ('scans_date', models.DateField(blank=True, null=True)),
+                ('scans_today', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('latest_compliance', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='adminstrator.securitycompliance')),
+                ('security_guard', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='compliance_summary', to='security.securityprofile')),
+            ],
+            options={
+                'verbose_name': 'Guard Compliance Summary',
+                'verbose_name_plural': 'Guard Compliance Summaries',
+            },
+        ),
+    ]
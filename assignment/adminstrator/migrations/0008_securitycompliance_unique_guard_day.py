@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:25
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def merge_duplicate_compliance(apps, schema_editor):
+    """Fold duplicate (security_guard, date) records into the oldest one before adding the constraint"""
+    SecurityCompliance = apps.get_model('adminstrator', 'SecurityCompliance')
+    GuardComplianceSummary = apps.get_model('adminstrator', 'GuardComplianceSummary')
+
+    duplicates = (
+        SecurityCompliance.objects.values('security_guard_id', 'date')
+        .annotate(rows=Count('id')).filter(rows__gt=1)
+    )
+    for duplicate in duplicates:
+        keep, *extra = SecurityCompliance.objects.filter(
+            security_guard_id=duplicate['security_guard_id'], date=duplicate['date']
+        ).order_by('id')
+        for record in extra:
+            keep.patrols_completed += record.patrols_completed
+            keep.tasks_completed += record.tasks_completed
+            keep.incidents_reported += record.incidents_reported
+            keep.total_tasks_assigned = max(keep.total_tasks_assigned, record.total_tasks_assigned)
+            keep.on_time = keep.on_time and record.on_time
+            if record.notes:
+                keep.notes = '\n'.join(filter(None, [keep.notes, record.notes]))
+        keep.save()
+        extra_ids = [record.id for record in extra]
+        GuardComplianceSummary.objects.filter(latest_compliance_id__in=extra_ids).update(latest_compliance=keep)
+        SecurityCompliance.objects.filter(id__in=extra_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adminstrator', '0007_guardcompliancesummary'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_compliance, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='securitycompliance',
+            constraint=models.UniqueConstraint(fields=('security_guard', 'date'), name='unique_compliance_per_guard_day'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adminstrator', '0008_securitycompliance_unique_guard_day'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubscriptionDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('subscription_type', models.CharField(max_length=20)),
+                ('property_type', models.CharField(blank=True, max_length=50)),
+                ('new_count', models.IntegerField(default=0)),
+                ('cancelled_count', models.IntegerField(default=0)),
+                ('expired_count', models.IntegerField(default=0)),
+                ('new_mrr', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('churned_mrr', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+            ],
+            options={
+                'verbose_name': 'Subscription Daily Rollup',
+                'verbose_name_plural': 'Subscription Daily Rollups',
+                'ordering': ['date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SubscriptionTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subscription_type', models.CharField(max_length=20)),
+                ('status', models.CharField(max_length=20)),
+                ('property_type', models.CharField(blank=True, max_length=50)),
+                ('count', models.IntegerField(default=0)),
+                ('mrr', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+            ],
+            options={
+                'verbose_name': 'Subscription Total',
+                'verbose_name_plural': 'Subscription Totals',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['status', 'end_date'], name='adminstrato_status_2cae92_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['-created_at'], name='adminstrato_created_d713b1_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='subscriptiontotal',
+            constraint=models.UniqueConstraint(fields=('subscription_type', 'status', 'property_type'), name='unique_subscription_total'),
+        ),
+        migrations.AddConstraint(
+            model_name='subscriptiondailyrollup',
+            constraint=models.UniqueConstraint(fields=('date', 'subscription_type', 'property_type'), name='unique_subscription_rollup_day'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adminstrator', '0009_subscription_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='house',
+            name='latitude',
+            field=models.FloatField(blank=True, help_text='Checkpoint position used for scan geofencing', null=True),
+        ),
+        migrations.AddField(
+            model_name='house',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adminstrator', '0010_house_coordinates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='route',
+            name='checkpoint_order',
+            field=models.JSONField(blank=True, default=list, help_text='Checkpoint ids in planned visiting order (see adminstrator/route_planner.py)'),
+        ),
+        migrations.AddField(
+            model_name='route',
+            name='estimated_walk_seconds',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='route',
+            name='planned_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='route',
+            name='planned_distance_m',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def assign_checkpoint_slots(apps, schema_editor):
+    Route = apps.get_model('adminstrator', 'Route')
+    routes = list(Route.objects.prefetch_related('checkpoints'))
+    for route in routes:
+        route.checkpoint_slots = sorted(member.id for member in route.checkpoints.all())
+    Route.objects.bulk_update(routes, ['checkpoint_slots'], batch_size=500)
+
+    # Summaries point at the guard's first route by name, as compliance_summary does
+    GuardComplianceSummary = apps.get_model('adminstrator', 'GuardComplianceSummary')
+    first_routes = {}
+    for route in sorted(routes, key=lambda route: route.name):
+        if route.assigned_security_guard_id is not None:
+            first_routes.setdefault(route.assigned_security_guard_id, route.id)
+    summaries = list(GuardComplianceSummary.objects.all())
+    for summary in summaries:
+        summary.route_id = first_routes.get(summary.security_guard_id)
+    GuardComplianceSummary.objects.bulk_update(summaries, ['route'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('security', '0010_scanlog_coordinates'),
+        ('adminstrator', '0011_route_plan'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='guardcompliancesummary',
+            name='route',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='adminstrator.route'),
+        ),
+        migrations.AddField(
+            model_name='route',
+            name='checkpoint_slots',
+            field=models.JSONField(blank=True, default=list, help_text='Checkpoint id per visit bitmap position, null once removed (see adminstrator/route_progress.py)'),
+        ),
+        migrations.CreateModel(
+            name='RouteVisitBitmap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('word', models.PositiveSmallIntegerField(default=0)),
+                ('bits', models.BigIntegerField(default=0)),
+                ('route', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visit_bitmaps', to='adminstrator.route')),
+                ('security_guard', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='route_visits', to='security.securityprofile')),
+            ],
+            options={
+                'verbose_name': 'Route Visit Bitmap',
+                'verbose_name_plural': 'Route Visit Bitmaps',
+                'indexes': [models.Index(fields=['date', 'security_guard'], name='adminstrato_date_af1cf0_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='routevisitbitmap',
+            constraint=models.UniqueConstraint(fields=('security_guard', 'route', 'date', 'word'), name='unique_route_visit_word'),
+        ),
+        migrations.RunPython(assign_checkpoint_slots, migrations.RunPython.noop),
+    ]
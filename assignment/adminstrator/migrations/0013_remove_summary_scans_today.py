@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:16
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adminstrator', '0012_route_visit_bitmaps'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='guardcompliancesummary',
+            name='scans_date',
+        ),
+        migrations.RemoveField(
+            model_name='guardcompliancesummary',
+            name='scans_today',
+        ),
+    ]
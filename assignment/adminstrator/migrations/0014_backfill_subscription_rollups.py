@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+def backfill_rollups(apps, schema_editor):
+    """Fill the rollups from subscriptions created before migration 0009 added them"""
+    from adminstrator.subscription_analytics import rebuild_rollups
+
+    rebuild_rollups(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adminstrator', '0013_remove_summary_scans_today'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import Avg, Case, Count, F, FloatField, Q, Value, When
+from django.db.models.functions import Cast, Least, TruncMonth
 from django.contrib.auth.models import User
 from security.models import SecurityProfile
 from members.models import UserProfile
@@ -37,6 +39,8 @@ class House(models.Model):
     is_occupied = models.BooleanField(default=True)
     qr_code = models.ImageField(upload_to='qr_codes/', blank=True, null=True)
     qr_code_data = models.TextField(blank=True, help_text="QR code data string for scanning")
+    latitude = models.FloatField(null=True, blank=True, help_text="Checkpoint position used for scan geofencing")
+    longitude = models.FloatField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -48,7 +52,12 @@ class House(models.Model):
         return f"{self.house_number} - {self.address}"
 
 class Subscription(models.Model):
-    """Subscription management model"""
+    """Subscription management model
+
+    Status and fee changes must go through adminstrator/subscription_analytics.py
+    (or be followed by `manage.py rebuild_subscription_rollups`) to keep the
+    subscription rollups in step.
+    """
     SUBSCRIPTION_TYPES = [
         ('basic', 'Basic'),
         ('premium', 'Premium'),
@@ -75,10 +84,64 @@ class Subscription(models.Model):
     class Meta:
         verbose_name = 'Subscription'
         verbose_name_plural = 'Subscriptions'
+        indexes = [
+            models.Index(fields=['status', 'end_date']),  # Expiry sweep
+            models.Index(fields=['-created_at']),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.subscription_type} ({self.status})"
 
+def compliance_score_expression(prefix=''):
+    """SQL form of SecurityCompliance.compliance_score.
+
+    prefix lets the expression be evaluated through a relation,
+    e.g. compliance_score_expression('latest_compliance__').
+    """
+    def field(name):
+        return F(f'{prefix}{name}')
+
+    task_completion = Cast(field('tasks_completed'), FloatField()) * Value(100.0) / Cast(field('total_tasks_assigned'), FloatField())
+    time_bonus = Case(When(**{f'{prefix}on_time': True}, then=Value(10.0)), default=Value(0.0), output_field=FloatField())
+    patrol_bonus = Least(Cast(field('patrols_completed'), FloatField()) * Value(5.0), Value(20.0))
+    return Case(
+        When(**{f'{prefix}total_tasks_assigned': 0}, then=Value(0.0)),
+        default=Least(task_completion + time_bonus + patrol_bonus, Value(100.0)),
+        output_field=FloatField(),
+    )
+
+
+class SecurityComplianceQuerySet(models.QuerySet):
+    """Compliance reporting that runs in SQL instead of over model instances"""
+
+    def with_score(self):
+        """Annotate each record with `score`, matching the compliance_score property"""
+        return self.annotate(score=compliance_score_expression())
+
+    def compliant(self, threshold=60):
+        return self.with_score().filter(score__gte=threshold)
+
+    def non_compliant(self, threshold=60):
+        return self.with_score().filter(score__lt=threshold)
+
+    def score_summary(self, threshold=60):
+        """Average score and compliant/total counts over the queryset"""
+        return self.with_score().aggregate(
+            average_score=Avg('score'),
+            compliant_count=Count('id', filter=Q(score__gte=threshold)),
+            total_count=Count('id'),
+        )
+
+    def score_trend(self, period=TruncMonth):
+        """Average score per guard per period, e.g. period=TruncWeek for weekly trends"""
+        return self.with_score().annotate(period=period('date')).order_by().values(
+            'security_guard', 'period'
+        ).annotate(
+            average_score=Avg('score'),
+            records=Count('id'),
+        ).order_by('security_guard', 'period')
+
+
 class SecurityCompliance(models.Model):
     """Security guard compliance tracking model"""
     security_guard = models.ForeignKey('security.SecurityProfile', on_delete=models.CASCADE, related_name='compliance_records')
@@ -91,10 +154,12 @@ class SecurityCompliance(models.Model):
     total_tasks_assigned = models.PositiveIntegerField(default=1)
     on_time = models.BooleanField(default=True)
     notes = models.TextField(blank=True)
-    
+
+    objects = SecurityComplianceQuerySet.as_manager()
+
     @property
     def compliance_score(self):
-        """Calculate compliance score as percentage"""
+        """Calculate compliance score as percentage (see compliance_score_expression for the SQL form)"""
         if self.total_tasks_assigned == 0:
             return 0
         task_completion = (self.tasks_completed / self.total_tasks_assigned) * 100
@@ -111,6 +176,10 @@ class SecurityCompliance(models.Model):
         verbose_name = 'Security Compliance'
         verbose_name_plural = 'Security Compliance Records'
         ordering = ['-date']
+        constraints = [
+            # Scan-time counters update the guard's single record for the day (see compliance_counters.py)
+            models.UniqueConstraint(fields=['security_guard', 'date'], name='unique_compliance_per_guard_day'),
+        ]
 
     def __str__(self):
         return f"{self.security_guard.user.username} - {self.date} ({self.compliance_score:.1f}%)"
@@ -128,6 +197,11 @@ class Route(models.Model):
         blank=True,
         related_name='assigned_routes'
     )
+    checkpoint_order = models.JSONField(default=list, blank=True, help_text="Checkpoint ids in planned visiting order (see adminstrator/route_planner.py)")
+    checkpoint_slots = models.JSONField(default=list, blank=True, help_text="Checkpoint id per visit bitmap position, null once removed (see adminstrator/route_progress.py)")
+    planned_distance_m = models.FloatField(null=True, blank=True)
+    estimated_walk_seconds = models.PositiveIntegerField(null=True, blank=True)
+    planned_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -141,4 +215,83 @@ class Route(models.Model):
 
     def __str__(self):
         assigned = self.assigned_security_guard.user.get_full_name() if self.assigned_security_guard else "Unassigned"
-        return f"{self.name} - {assigned}"
\ No newline at end of file
+        return f"{self.name} - {assigned}"
+
+class GuardComplianceSummary(models.Model):
+    """Cached per-guard row behind the compliance dashboard (see adminstrator/compliance_summary.py)"""
+    security_guard = models.OneToOneField(SecurityProfile, on_delete=models.CASCADE, related_name='compliance_summary')
+    latest_compliance = models.ForeignKey(SecurityCompliance, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    latest_date = models.DateField(null=True, blank=True)
+    has_route = models.BooleanField(default=False)
+    route_name = models.CharField(max_length=100, blank=True)
+    total_checkpoints = models.PositiveIntegerField(default=0)
+    route = models.ForeignKey(Route, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Guard Compliance Summary'
+        verbose_name_plural = 'Guard Compliance Summaries'
+
+    def __str__(self):
+        return f"Compliance summary for {self.security_guard}"
+
+class RouteVisitBitmap(models.Model):
+    """One 63-checkpoint word of the bitset of a route's checkpoints a guard visited on a day"""
+    security_guard = models.ForeignKey(SecurityProfile, on_delete=models.CASCADE, related_name='route_visits')
+    route = models.ForeignKey(Route, on_delete=models.CASCADE, related_name='visit_bitmaps')
+    date = models.DateField()
+    word = models.PositiveSmallIntegerField(default=0)
+    bits = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Route Visit Bitmap'
+        verbose_name_plural = 'Route Visit Bitmaps'
+        constraints = [
+            models.UniqueConstraint(fields=['security_guard', 'route', 'date', 'word'], name='unique_route_visit_word'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'security_guard']),
+        ]
+
+    def __str__(self):
+        return f"{self.security_guard} visits on {self.route} for {self.date}"
+
+class SubscriptionTotal(models.Model):
+    """Current subscription count and fee sum per type, status and property type (see adminstrator/subscription_analytics.py)"""
+    subscription_type = models.CharField(max_length=20)
+    status = models.CharField(max_length=20)
+    property_type = models.CharField(max_length=50, blank=True)
+    count = models.IntegerField(default=0)
+    mrr = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = 'Subscription Total'
+        verbose_name_plural = 'Subscription Totals'
+        constraints = [
+            models.UniqueConstraint(fields=['subscription_type', 'status', 'property_type'], name='unique_subscription_total'),
+        ]
+
+    def __str__(self):
+        return f"{self.subscription_type}/{self.status}/{self.property_type or '-'}: {self.count}"
+
+class SubscriptionDailyRollup(models.Model):
+    """Subscription movements on one day per type and property type (see adminstrator/subscription_analytics.py)"""
+    date = models.DateField()
+    subscription_type = models.CharField(max_length=20)
+    property_type = models.CharField(max_length=50, blank=True)
+    new_count = models.IntegerField(default=0)
+    cancelled_count = models.IntegerField(default=0)
+    expired_count = models.IntegerField(default=0)
+    new_mrr = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    churned_mrr = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = 'Subscription Daily Rollup'
+        verbose_name_plural = 'Subscription Daily Rollups'
+        ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'subscription_type', 'property_type'], name='unique_subscription_rollup_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.subscription_type}/{self.property_type or '-'}"
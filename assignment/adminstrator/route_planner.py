@@ -0,0 +1,153 @@
+"""
+Patrol route ordering.
+
+plan_route() orders a route's checkpoints into a short walking loop and
+stores the result on the Route: checkpoint_order, planned_distance_m and
+estimated_walk_seconds (at ROUTE_WALKING_SPEED_MPS). security_route serves the
+stored plan, so nothing is computed per request. The order starts from a
+nearest-neighbour tour, trying every start point on small routes, and is then
+improved with 2-opt until no segment reversal shortens it. Checkpoints without
+coordinates cannot be placed and are visited last, in id order.
+
+Distances come from distance_matrix, an in-process cache of each route's
+pairwise distances. When checkpoints are added, removed or moved only their
+rows are computed. adminstrator/signals.py replans a route after a commit that
+changes its checkpoints or moves one of them; `manage.py plan_routes` replans
+every route.
+"""
+import threading
+
+from django.conf import settings
+from django.utils import timezone
+
+from security.geo_index import distance_m
+from .models import Route
+
+# Routes up to this size try a nearest-neighbour tour from every checkpoint
+MULTI_START_LIMIT = 30
+MAX_TWO_OPT_PASSES = 50
+
+
+class DistanceMatrixCache:
+    """Thread-safe route_id -> pairwise checkpoint distances, updated row by row"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}  # route_id -> ({checkpoint_id: (lat, lon)}, {checkpoint_id: {checkpoint_id: metres}})
+        self.computed = 0
+
+    def sync(self, route_id, positions):
+        """Return {a: {b: metres}} for positions ({checkpoint_id: (lat, lon)}), reusing unchanged rows"""
+        with self._lock:
+            cached_positions, rows = self._routes.get(route_id, ({}, {}))
+            for checkpoint_id in [key for key in cached_positions if positions.get(key) != cached_positions[key]]:
+                del cached_positions[checkpoint_id]
+                del rows[checkpoint_id]
+                for row in rows.values():
+                    row.pop(checkpoint_id, None)
+
+            for checkpoint_id, position in positions.items():
+                if checkpoint_id in cached_positions:
+                    continue
+                row = rows[checkpoint_id] = {checkpoint_id: 0.0}
+                for other_id, other_position in cached_positions.items():
+                    row[other_id] = rows[other_id][checkpoint_id] = distance_m(*position, *other_position)
+                    self.computed += 1
+                cached_positions[checkpoint_id] = position
+
+            self._routes[route_id] = (cached_positions, rows)
+            return {checkpoint_id: dict(row) for checkpoint_id, row in rows.items()}
+
+    def forget(self, route_id):
+        with self._lock:
+            self._routes.pop(route_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._routes.clear()
+            self.computed = 0
+
+
+distance_matrix = DistanceMatrixCache()
+
+
+def tour_length(order, distances):
+    """Length of the closed loop visiting order and returning to its start"""
+    if len(order) < 2:
+        return 0.0
+    return sum(distances[a][b] for a, b in zip(order, order[1:] + order[:1]))
+
+
+def _nearest_neighbour(start, distances):
+    order, remaining = [start], set(distances) - {start}
+    while remaining:
+        current = distances[order[-1]]
+        step = min(remaining, key=lambda checkpoint_id: (current[checkpoint_id], checkpoint_id))
+        order.append(step)
+        remaining.remove(step)
+    return order
+
+
+def _two_opt(order, distances):
+    """Reverse segments of the loop while that shortens it"""
+    count = len(order)
+    for _ in range(MAX_TWO_OPT_PASSES):
+        improved = False
+        for i in range(count - 1):
+            a, b = order[i], order[i + 1]
+            for j in range(i + 2, count if i else count - 1):
+                c, d = order[j], order[(j + 1) % count]
+                if distances[a][c] + distances[b][d] < distances[a][b] + distances[c][d] - 1e-9:
+                    order[i + 1:j + 1] = reversed(order[i + 1:j + 1])
+                    b = order[i + 1]
+                    improved = True
+        if not improved:
+            break
+    return order
+
+
+def order_checkpoints(distances):
+    """Near-optimal closed visiting order for the checkpoints in distances"""
+    if len(distances) < 3:
+        return sorted(distances)
+    starts = sorted(distances) if len(distances) <= MULTI_START_LIMIT else [min(distances)]
+    best = min((_nearest_neighbour(start, distances) for start in starts),
+               key=lambda order: tour_length(order, distances))
+    order = _two_opt(best, distances)
+    # Start the loop at the lowest id, so an unchanged route keeps a stable order
+    first = order.index(min(order))
+    return order[first:] + order[:first]
+
+
+def plan_route(route_id):
+    """Order the route's checkpoints and store the plan; return the stored fields, or None if it is gone"""
+    rows = list(Route.checkpoints.through.objects.filter(route_id=route_id).values_list(
+        'userprofile_id', 'userprofile__latitude', 'userprofile__longitude'
+    ))
+    positions = {
+        checkpoint_id: (latitude, longitude) for checkpoint_id, latitude, longitude in rows
+        if latitude is not None and longitude is not None
+    }
+    distances = distance_matrix.sync(route_id, positions)
+    order = order_checkpoints(distances)
+    order += sorted(checkpoint_id for checkpoint_id, _, _ in rows if checkpoint_id not in positions)
+
+    planned_distance = tour_length(order[:len(positions)], distances)
+    plan = {
+        'checkpoint_order': order,
+        'planned_distance_m': round(planned_distance, 1),
+        'estimated_walk_seconds': round(planned_distance / getattr(settings, 'ROUTE_WALKING_SPEED_MPS', 1.3)),
+        'planned_at': timezone.now(),
+    }
+    # update() rather than save(): the plan is derived data and must not fire Route signals
+    if not Route.objects.filter(id=route_id).update(**plan):
+        distance_matrix.forget(route_id)
+        return None
+    return plan
+
+
+def plan_routes(route_ids=None):
+    """Replan the given routes, or all of them; return how many were planned"""
+    if route_ids is None:
+        route_ids = Route.objects.values_list('id', flat=True)
+    return sum(1 for route_id in list(route_ids) if plan_route(route_id) is not None)
@@ -0,0 +1,138 @@
+"""
+Per-day checkpoint visit bitmaps for patrol route progress.
+
+Every checkpoint on a route owns a fixed slot in Route.checkpoint_slots. New
+checkpoints are appended, and a removed checkpoint's slot is set to null and
+never reused, so a bit always means the same checkpoint. A guard's visits to a
+route on a day form a bitset over those slots. It is stored as RouteVisitBitmap
+rows of WORD_BITS bits each, which is a single row for routes of up to 63
+checkpoints.
+
+mark_visited() sets a bit with one UPDATE ... SET bits = bits | mask, so
+concurrent scans never lose a visit and repeat scans change nothing. The scan
+endpoints reach it through mark_scan(), which finds the route and slot in
+security.route_index without a query. Reading progress is a popcount of the
+day's words: visited, remaining and percent complete never touch ScanLog, and
+visited_counts() serves every guard on the compliance dashboard in one query.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from security.qr_signing import InvalidQRSignature, verify_payload
+from security.route_index import route_index
+from .models import Route, RouteVisitBitmap
+
+# Bits per BigIntegerField word, leaving the sign bit alone
+WORD_BITS = 63
+
+
+def _locked_slots(route_id):
+    """The route's slot list, with its row locked until the surrounding transaction ends; None if it is gone"""
+    return Route.objects.select_for_update().filter(id=route_id).values_list('checkpoint_slots', flat=True).first()
+
+
+def assign_slots(route_id, member_ids):
+    """Give checkpoints added to a route a slot each, keeping existing slots"""
+    with transaction.atomic():
+        # Locked so concurrent additions cannot both append to the same old list and share a slot
+        slots = _locked_slots(route_id)
+        if slots is None:
+            return
+        added = sorted(set(member_ids) - set(slots))
+        if added:
+            Route.objects.filter(id=route_id).update(checkpoint_slots=slots + added)
+
+
+def release_slots(route_id, member_ids=None, day=None):
+    """Retire the slots of checkpoints removed from a route (all of them when None), clearing their visits on day"""
+    with transaction.atomic():
+        slots = _locked_slots(route_id)
+        if slots is None:
+            return
+        released = [slot for slot, member_id in enumerate(slots)
+                    if member_id is not None and (member_ids is None or member_id in member_ids)]
+        if not released:
+            return
+        Route.objects.filter(id=route_id).update(
+            checkpoint_slots=[None if slot in released else member_id for slot, member_id in enumerate(slots)]
+        )
+        if day is not None:
+            # Keep today's visited count in step with the route's remaining checkpoints
+            masks = {}
+            for slot in released:
+                word, bit = divmod(slot, WORD_BITS)
+                masks[word] = masks.get(word, 0) | (1 << bit)
+            for word, mask in masks.items():
+                RouteVisitBitmap.objects.filter(route_id=route_id, date=day, word=word).update(
+                    bits=F('bits').bitand(~mask)
+                )
+
+
+def mark_visited(guard_id, route_id, slot, day):
+    """Set the bit for slot in the guard's bitmap for route and day"""
+    word, bit = divmod(slot, WORD_BITS)
+    keys = {'security_guard_id': guard_id, 'route_id': route_id, 'date': day, 'word': word}
+    mask = 1 << bit
+    if RouteVisitBitmap.objects.filter(**keys).update(bits=F('bits').bitor(mask)):
+        return
+    try:
+        with transaction.atomic():
+            RouteVisitBitmap.objects.create(bits=mask, **keys)
+    except IntegrityError:
+        # First visit of the day recorded concurrently
+        RouteVisitBitmap.objects.filter(**keys).update(bits=F('bits').bitor(mask))
+
+
+def mark_scan(guard_id, qr_data, day):
+    """Mark the checkpoint a member scan refers to on each of the guard's routes; return False if it is on none"""
+    prefix, _, value = (qr_data or '').strip().partition(':')
+    if prefix != 'member':
+        return False
+    try:
+        member_id = int(verify_payload('member', value.strip()))
+    except (InvalidQRSignature, ValueError):
+        return False
+    visits = route_index.visit_slots(guard_id, member_id)
+    for route_id, slot in visits:
+        mark_visited(guard_id, route_id, slot, day)
+    return bool(visits)
+
+
+def _visited_slots(words):
+    """Slots set in {word: bits}"""
+    slots = []
+    for word, bits in words.items():
+        while bits:
+            low = bits & -bits
+            slots.append(word * WORD_BITS + low.bit_length() - 1)
+            bits ^= low
+    return slots
+
+
+def route_progress(guard_id, route, day):
+    """Visited and remaining checkpoint ids and percent complete for a guard's route on day, in one query"""
+    words = dict(RouteVisitBitmap.objects.filter(
+        security_guard_id=guard_id, route_id=route.id, date=day
+    ).values_list('word', 'bits'))
+    slots = route.checkpoint_slots
+    visited = {slots[slot] for slot in _visited_slots(words) if slot < len(slots) and slots[slot] is not None}
+    checkpoints = [member_id for member_id in slots if member_id is not None]
+    total = len(checkpoints)
+    return {
+        'date': day,
+        'visited': [member_id for member_id in checkpoints if member_id in visited],
+        'remaining': [member_id for member_id in checkpoints if member_id not in visited],
+        'visited_count': len(visited),
+        'total_checkpoints': total,
+        'completion_percentage': round(len(visited) / total * 100, 1) if total else 0,
+    }
+
+
+def visited_counts(guard_ids, day):
+    """{(guard_id, route_id): checkpoints visited on day} for the given guards, in one query"""
+    counts = {}
+    for guard_id, route_id, bits in RouteVisitBitmap.objects.filter(
+        security_guard_id__in=guard_ids, date=day
+    ).values_list('security_guard_id', 'route_id', 'bits'):
+        counts[(guard_id, route_id)] = counts.get((guard_id, route_id), 0) + bits.bit_count()
+    return counts
@@ -0,0 +1,110 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from members.models import UserProfile
+from security.models import ScanLog, SecurityProfile
+from security.route_index import route_index
+from . import compliance_summary, route_planner, route_progress
+from .dashboard_summary import dashboard_summary
+from .models import Route, SecurityCompliance, Subscription
+
+
+@receiver(post_save, sender=ScanLog)
+def scan_logged(sender, instance, created, **kwargs):
+    if created and instance.qr_data and instance.qr_data.startswith('member:'):
+        route_progress.mark_scan(
+            instance.security_guard_id, instance.qr_data,
+            timezone.localdate(instance.client_scanned_at or instance.scanned_at)
+        )
+
+
+@receiver(post_save, sender=SecurityCompliance)
+def compliance_saved(sender, instance, **kwargs):
+    compliance_summary.note_compliance_record(instance)
+
+
+@receiver(post_delete, sender=SecurityCompliance)
+def compliance_deleted(sender, instance, **kwargs):
+    compliance_summary.refresh_guards([instance.security_guard_id])
+
+
+@receiver(post_save, sender=Route)
+@receiver(post_delete, sender=Route)
+def route_changed(sender, instance, **kwargs):
+    # The previous assignee is unknown here, so every summary's route facts are recomputed
+    compliance_summary.refresh_guards()
+
+
+@receiver(post_delete, sender=Route)
+def route_deleted(sender, instance, **kwargs):
+    route_planner.distance_matrix.forget(instance.id)
+
+
+@receiver(m2m_changed, sender=Route.checkpoints.through)
+def route_checkpoints_changed(sender, instance, action, reverse, pk_set=None, **kwargs):
+    if not action.startswith('post_'):
+        return
+    update_visit_slots(instance, action, reverse, pk_set)
+    if reverse:
+        compliance_summary.refresh_guards()
+    elif instance.assigned_security_guard_id:
+        compliance_summary.refresh_guards([instance.assigned_security_guard_id])
+
+    # Replan the routes whose checkpoints changed; a cleared member may have left any route
+    if not reverse:
+        route_ids = [instance.id]
+    elif action == 'post_clear':
+        route_ids = None
+    else:
+        route_ids = list(pk_set or ())
+    transaction.on_commit(lambda: route_planner.plan_routes(route_ids))
+
+
+def update_visit_slots(instance, action, reverse, pk_set):
+    """Keep each route's visit bitmap slots in step with its checkpoints"""
+    today = timezone.localdate()
+    if not reverse:
+        pairs = [(instance.id, pk_set)]
+    elif action == 'post_clear':
+        # The cleared routes are gone from the through table; their slots still name the member
+        pairs = [(route_id, {instance.id}) for route_id in Route.objects.values_list('id', flat=True)]
+    else:
+        pairs = [(route_id, {instance.id}) for route_id in pk_set or ()]
+    for route_id, member_ids in pairs:
+        if action == 'post_add':
+            route_progress.assign_slots(route_id, member_ids)
+        else:
+            route_progress.release_slots(route_id, member_ids, today)
+    # Guard entries cached while the slots were being written would miss new ones
+    route_index.invalidate_all_guards()
+
+
+@receiver(pre_delete, sender=UserProfile)
+def checkpoint_deleting(sender, instance, **kwargs):
+    # Cascaded deletes of route membership rows do not send m2m_changed
+    today = timezone.localdate()
+    for route_id in Route.objects.filter(checkpoints=instance.id).values_list('id', flat=True):
+        route_progress.release_slots(route_id, {instance.id}, today)
+
+
+@receiver(post_save, sender=UserProfile)
+def checkpoint_saved(sender, instance, created, update_fields=None, **kwargs):
+    """A checkpoint that may have moved changes the best order of every route it is on"""
+    if created or (update_fields is not None and not {'latitude', 'longitude'} & set(update_fields)):
+        return
+    member_id = instance.id
+    transaction.on_commit(lambda: route_planner.plan_routes(
+        Route.objects.filter(checkpoints=member_id).values_list('id', flat=True)
+    ))
+
+
+@receiver(post_save, sender=SecurityProfile)
+@receiver(post_delete, sender=SecurityProfile)
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def dashboard_counts_changed(sender, **kwargs):
+    transaction.on_commit(dashboard_summary.invalidate)
@@ -0,0 +1,271 @@
+"""
+Subscription analytics from incremental rollups.
+
+Two small tables replace scans of Subscription:
+
+* SubscriptionTotal holds the current count and monthly fee sum per
+  (subscription type, status, property type). The statistics page reads it
+  whole.
+* SubscriptionDailyRollup holds each day's movements per (subscription type,
+  property type): new subscriptions, cancellations, expiries, and the MRR
+  they added or removed.
+
+Both are updated with F() increments in the same transaction as the
+subscription write: record_new() from pay_subscription, record_status_change()
+from cancel_subscription, and expire_due() from the nightly
+`expire_subscriptions` sweep. Active count and MRR on a past day are rebuilt
+backwards from the current totals and the later days' movements, so
+time_series() costs two queries no matter how many subscriptions exist.
+Migration 0014 fills both tables from the subscriptions that existed before
+them.
+
+Nothing listens for Subscription saves: the rollups only follow writes made
+through these helpers. Anything else, such as edits in the shell or admin,
+QuerySet.update(), bulk_create() or fixture loads, leaves them stale until
+`manage.py rebuild_subscription_rollups` is run.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Subscription, SubscriptionDailyRollup, SubscriptionTotal
+
+ACTIVE = 'active'
+EXPIRED = 'expired'
+INTERVALS = ('day', 'week', 'month')
+MAX_SERIES_DAYS = 731
+
+
+def property_type_of(subscription):
+    return subscription.house.property_type if subscription.house_id else ''
+
+
+def _bump(model, keys, **deltas):
+    """Add deltas to the row identified by keys, creating it on first use"""
+    increments = {field: F(field) + delta for field, delta in deltas.items()}
+    if model.objects.filter(**keys).update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**keys, **deltas)
+    except IntegrityError:
+        # Created concurrently
+        model.objects.filter(**keys).update(**increments)
+
+
+def _bump_total(subscription_type, status, property_type, count, mrr):
+    _bump(SubscriptionTotal, {'subscription_type': subscription_type, 'status': status, 'property_type': property_type},
+          count=count, mrr=mrr)
+
+
+def _bump_day(day, subscription_type, property_type, **deltas):
+    _bump(SubscriptionDailyRollup, {'date': day, 'subscription_type': subscription_type, 'property_type': property_type},
+          **deltas)
+
+
+def _exit_field(status):
+    # Leaving active for any status other than expired counts as a cancellation
+    return 'expired_count' if status == EXPIRED else 'cancelled_count'
+
+
+def record_new(subscription, day=None):
+    """Count a newly created subscription; call inside the transaction that created it"""
+    day = day or timezone.localdate()
+    property_type = property_type_of(subscription)
+    _bump_total(subscription.subscription_type, subscription.status, property_type, 1, subscription.monthly_fee)
+    if subscription.status == ACTIVE:
+        _bump_day(day, subscription.subscription_type, property_type, new_count=1, new_mrr=subscription.monthly_fee)
+
+
+def record_status_change(subscription, old_status, day=None):
+    """Move a subscription between statuses in the rollups; subscription.status is the new status"""
+    new_status = subscription.status
+    if new_status == old_status:
+        return
+    day = day or timezone.localdate()
+    property_type = property_type_of(subscription)
+    fee = subscription.monthly_fee
+    _bump_total(subscription.subscription_type, old_status, property_type, -1, -fee)
+    _bump_total(subscription.subscription_type, new_status, property_type, 1, fee)
+    if old_status == ACTIVE:
+        _bump_day(day, subscription.subscription_type, property_type, **{_exit_field(new_status): 1, 'churned_mrr': fee})
+    elif new_status == ACTIVE:
+        _bump_day(day, subscription.subscription_type, property_type, new_count=1, new_mrr=fee)
+
+
+def expire_due(today=None, batch_size=500):
+    """Expire active subscriptions that ended before today; return how many were expired"""
+    today = today or timezone.localdate()
+    expired = 0
+    while True:
+        with transaction.atomic():
+            due_ids = list(
+                Subscription.objects.select_for_update(of=('self',))
+                .filter(status=ACTIVE, end_date__lt=today)
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not due_ids:
+                return expired
+            # Only rows still active are moved, and the stamp picks out exactly those, so a subscription
+            # cancelled or expired by someone else since the select is not counted twice
+            stamp = timezone.now()
+            Subscription.objects.filter(id__in=due_ids, status=ACTIVE).update(status=EXPIRED, updated_at=stamp)
+            due = list(Subscription.objects.filter(id__in=due_ids, status=EXPIRED, updated_at=stamp).values(
+                'id', 'subscription_type', 'monthly_fee', 'house__property_type'
+            ))
+
+            groups = defaultdict(lambda: [0, Decimal(0)])
+            for row in due:
+                group = groups[(row['subscription_type'], row['house__property_type'] or '')]
+                group[0] += 1
+                group[1] += row['monthly_fee']
+            for (subscription_type, property_type), (count, fees) in groups.items():
+                _bump_total(subscription_type, ACTIVE, property_type, -count, -fees)
+                _bump_total(subscription_type, EXPIRED, property_type, count, fees)
+                _bump_day(today, subscription_type, property_type, expired_count=count, churned_mrr=fees)
+        expired += len(due)
+
+
+@transaction.atomic
+def rebuild_rollups(apps=None):
+    """Recompute both tables from Subscription; return the number of daily rollup rows
+
+    Migrations pass their app registry so the historical models are used.
+    """
+    if apps is None:
+        subscriptions, totals, daily = Subscription, SubscriptionTotal, SubscriptionDailyRollup
+    else:
+        subscriptions, totals, daily = (apps.get_model('adminstrator', name) for name in
+                                        ('Subscription', 'SubscriptionTotal', 'SubscriptionDailyRollup'))
+    totals.objects.all().delete()
+    daily.objects.all().delete()
+
+    totals.objects.bulk_create([
+        totals(subscription_type=row['subscription_type'], status=row['status'],
+               property_type=row['house__property_type'] or '', count=row['count'], mrr=row['mrr'] or 0)
+        for row in subscriptions.objects.values('subscription_type', 'status', 'house__property_type')
+        .annotate(count=Count('id'), mrr=Sum('monthly_fee')).order_by()
+    ])
+
+    # Every subscription starts active. Exits are dated by the sweep (the day after end_date) for
+    # expiries and by the last update for cancellations, the closest record of when they happened.
+    days = defaultdict(lambda: {'new_count': 0, 'cancelled_count': 0, 'expired_count': 0,
+                                'new_mrr': Decimal(0), 'churned_mrr': Decimal(0)})
+    movements = (
+        (subscriptions.objects.annotate(day=F('start_date')), 0, 'new_count', 'new_mrr'),
+        (subscriptions.objects.filter(status=EXPIRED).annotate(day=F('end_date')), 1, 'expired_count', 'churned_mrr'),
+        (subscriptions.objects.exclude(status__in=[ACTIVE, EXPIRED]).annotate(day=TruncDate('updated_at')), 0,
+         'cancelled_count', 'churned_mrr'),
+    )
+    for queryset, offset, count_field, mrr_field in movements:
+        rows = queryset.values('day', 'subscription_type', 'house__property_type').annotate(
+            count=Count('id'), fees=Sum('monthly_fee')
+        ).order_by()
+        for row in rows:
+            entry = days[(row['day'] + timedelta(days=offset), row['subscription_type'], row['house__property_type'] or '')]
+            entry[count_field] += row['count']
+            entry[mrr_field] += row['fees'] or 0
+
+    daily.objects.bulk_create([
+        daily(date=day, subscription_type=subscription_type, property_type=property_type, **values)
+        for (day, subscription_type, property_type), values in days.items()
+    ], batch_size=1000)
+    return len(days)
+
+
+def current_statistics():
+    """Totals, type and status distributions from SubscriptionTotal in one query"""
+    totals = list(SubscriptionTotal.objects.filter(count__gt=0).values('subscription_type', 'status', 'count', 'mrr'))
+    total = sum(row['count'] for row in totals)
+    by_type, by_status = defaultdict(int), defaultdict(int)
+    for row in totals:
+        by_type[row['subscription_type']] += row['count']
+        by_status[row['status']] += row['count']
+    return {
+        'total_subscriptions': total,
+        'active_subscriptions': by_status.get(ACTIVE, 0),
+        'monthly_revenue': sum((row['mrr'] for row in totals if row['status'] == ACTIVE), Decimal(0)),
+        'subscription_types': {
+            subscription_type: {'count': count, 'percentage': round(count / total * 100, 1) if total else 0}
+            for subscription_type, count in sorted(by_type.items())
+        },
+        'subscription_status': dict(by_status),
+    }
+
+
+def time_series(start, end, subscription_type=None, property_type=None, today=None):
+    """Daily points from start to end (inclusive) with movements, active count, MRR and churn rate"""
+    today = today or timezone.localdate()
+    filters = {}
+    if subscription_type:
+        filters['subscription_type'] = subscription_type
+    if property_type is not None:
+        filters['property_type'] = property_type
+
+    current = SubscriptionTotal.objects.filter(status=ACTIVE, **filters).aggregate(count=Sum('count'), mrr=Sum('mrr'))
+    days = {
+        row['date']: row for row in SubscriptionDailyRollup.objects.filter(date__gte=start, **filters).values('date').annotate(
+            new=Sum('new_count'), cancelled=Sum('cancelled_count'), expired=Sum('expired_count'),
+            new_mrr=Sum('new_mrr'), churned_mrr=Sum('churned_mrr'),
+        ).order_by()
+    }
+
+    # Walk back from the latest movement, undoing each day to get the previous day's closing figures
+    active, mrr = current['count'] or 0, current['mrr'] or Decimal(0)
+    day = max([today, *days])
+    points = []
+    while day >= start:
+        row = days.get(day)
+        new, cancelled, expired = (row['new'], row['cancelled'], row['expired']) if row else (0, 0, 0)
+        new_mrr, churned_mrr = (row['new_mrr'], row['churned_mrr']) if row else (Decimal(0), Decimal(0))
+        opening_active = active - new + cancelled + expired
+        if day <= end:
+            points.append({
+                'date': day, 'new': new, 'cancelled': cancelled, 'expired': expired,
+                'new_mrr': new_mrr, 'churned_mrr': churned_mrr, 'active': active, 'mrr': mrr,
+                'opening_active': opening_active,
+            })
+        active, mrr = opening_active, mrr - new_mrr + churned_mrr
+        day -= timedelta(days=1)
+    points.reverse()
+    return points
+
+
+def _bucket(day, interval):
+    if interval == 'week':
+        return day - timedelta(days=day.weekday())
+    if interval == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def group_series(points, interval='day'):
+    """Sum movements per day, week or month; active and MRR are the period's closing values"""
+    periods = {}
+    for point in points:
+        key = _bucket(point['date'], interval)
+        period = periods.get(key)
+        if period is None:
+            period = periods[key] = {**point, 'date': key}
+        else:
+            for field in ('new', 'cancelled', 'expired', 'new_mrr', 'churned_mrr'):
+                period[field] += point[field]
+            period['active'], period['mrr'] = point['active'], point['mrr']
+    for period in periods.values():
+        opening = period.pop('opening_active')
+        churned = period['cancelled'] + period['expired']
+        period['churn_rate'] = round(churned / opening * 100, 2) if opening else 0.0
+    return list(periods.values())
+
+
+def trailing_revenue(today=None, days=365):
+    """Fees earned over the last `days` days, from each day's MRR"""
+    today = today or timezone.localdate()
+    points = time_series(today - timedelta(days=days - 1), today, today=today)
+    earned = sum((point['mrr'] for point in points), Decimal(0)) * 12 / 365
+    return earned.quantize(Decimal('0.01'))
@@ -148,3 +148,558 @@ class AdministratorMemberApprovalTest(TestCase):
         # Check status changed to rejected
         self.assertEqual(self.member_profile.status, 'rejected')
         self.assertFalse(self.member_profile.is_approved)
+
+
+class SecurityComplianceDashboardTest(TestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(
+            username='admin',
+            email='admin@test.com',
+            password='admin123'
+        )
+        self.client = Client()
+        self.client.login(username='admin', password='admin123')
+
+    def create_guard(self, index):
+        from datetime import date
+        from members.models import UserProfile
+        from security.models import ScanLog
+        from .models import Route, SecurityCompliance
+
+        user = User.objects.create_user(username=f'guard{index}@test.com', email=f'guard{index}@test.com', password='pass')
+        guard = SecurityProfile.objects.create(user=user, employee_id=f'SEC9{index:04d}', status='approved')
+        member_user = User.objects.create_user(username=f'member{index}@test.com', email=f'member{index}@test.com', password='pass')
+        member = UserProfile.objects.create(user=member_user, full_name=f'Member {index}', phone='1', address='1 Rd', status='approved')
+        route = Route.objects.create(name=f'Route {index}', assigned_security_guard=guard)
+        route.checkpoints.add(member)
+        SecurityCompliance.objects.create(
+            security_guard=guard, date=date.today(), shift_start='09:00', shift_end='17:00',
+            tasks_completed=4, total_tasks_assigned=5
+        )
+        ScanLog.objects.create(security_guard=guard, qr_data=f'member:{member.id}')
+        return guard
+
+    def dashboard_queries(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('adminstrator:security_compliance'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_query_count_is_flat_in_guard_count(self):
+        self.create_guard(1)
+        small, _ = self.dashboard_queries()
+        for index in range(2, 7):
+            self.create_guard(index)
+        large, response = self.dashboard_queries()
+        self.assertEqual(small, large)
+        self.assertEqual(response.context['total_guards'], 6)
+        self.assertEqual(response.context['route_completion_data'][0]['scanned_today'], 1)
+
+    def test_summary_matches_live_facts(self):
+        from .compliance_summary import collect_guard_facts, load_guard_facts
+
+        guard_ids = [self.create_guard(index).id for index in range(1, 4)]
+        live = collect_guard_facts(guard_ids)
+        cached = load_guard_facts(guard_ids)
+        self.assertEqual(live, cached)
+
+
+class SecurityComplianceScoreTest(TestCase):
+    def setUp(self):
+        from datetime import date, timedelta
+        from .models import SecurityCompliance
+
+        user = User.objects.create_user(username='scored@test.com', email='scored@test.com', password='pass')
+        self.guard = SecurityProfile.objects.create(user=user, employee_id='SEC5000', status='approved')
+        rows = [
+            # tasks_completed, total_tasks_assigned, patrols_completed, on_time
+            (4, 5, 1, True),
+            (1, 5, 0, False),
+            (0, 0, 3, True),
+            (5, 5, 10, True),
+            (2, 3, 2, False),
+        ]
+        for offset, (tasks, total, patrols, on_time) in enumerate(rows):
+            SecurityCompliance.objects.create(
+                security_guard=self.guard, date=date(2025, 1, 1) + timedelta(days=offset * 20),
+                shift_start='09:00', shift_end='17:00', tasks_completed=tasks,
+                total_tasks_assigned=total, patrols_completed=patrols, on_time=on_time
+            )
+
+    def test_sql_score_matches_property(self):
+        from .models import SecurityCompliance
+
+        for record in SecurityCompliance.objects.with_score():
+            self.assertAlmostEqual(record.score, record.compliance_score)
+            self.assertEqual(record.score >= 60, record.is_compliant)
+
+    def test_filtering_and_aggregation(self):
+        from .models import SecurityCompliance
+
+        records = list(SecurityCompliance.objects.all())
+        expected = [record for record in records if record.is_compliant]
+        self.assertEqual(SecurityCompliance.objects.compliant().count(), len(expected))
+
+        summary = SecurityCompliance.objects.score_summary()
+        self.assertAlmostEqual(summary['average_score'], sum(r.compliance_score for r in records) / len(records))
+        self.assertEqual(summary['compliant_count'], len(expected))
+
+        trend = list(SecurityCompliance.objects.score_trend())
+        self.assertEqual(sum(row['records'] for row in trend), len(records))
+
+
+class ComplianceCounterTest(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='counted@test.com', email='counted@test.com', password='pass')
+        self.guard = SecurityProfile.objects.create(user=user, employee_id='SEC5100', status='approved')
+
+    def test_increments_accumulate_on_one_record(self):
+        from datetime import date
+        from django.db import IntegrityError, transaction
+        from .compliance_counters import increment_compliance
+        from .models import SecurityCompliance
+
+        increment_compliance(self.guard.id, date(2025, 3, 1))
+        increment_compliance(self.guard.id, date(2025, 3, 1), patrols=2, tasks=2)
+
+        record = SecurityCompliance.objects.get(security_guard=self.guard)
+        self.assertEqual((record.patrols_completed, record.tasks_completed), (3, 3))
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            SecurityCompliance.objects.create(security_guard=self.guard, date=date(2025, 3, 1), shift_start='09:00', shift_end='17:00')
+
+    def test_write_behind_coalesces_until_flush(self):
+        from datetime import date
+        from unittest import mock
+        from django.test import override_settings
+        from .compliance_counters import compliance_accumulator, record_checkpoint_scans
+        from .models import SecurityCompliance
+
+        with override_settings(COMPLIANCE_WRITE_BEHIND=True), \
+                mock.patch.object(compliance_accumulator, '_ensure_thread'), \
+                self.captureOnCommitCallbacks(execute=True):
+            for _ in range(3):
+                record_checkpoint_scans(self.guard.id, date(2025, 3, 2))
+
+        self.assertEqual(compliance_accumulator.pending(), {(self.guard.id, date(2025, 3, 2)): 3})
+        self.assertFalse(SecurityCompliance.objects.filter(security_guard=self.guard).exists())
+
+        self.assertEqual(compliance_accumulator.flush(), 1)
+        self.assertEqual(SecurityCompliance.objects.get(security_guard=self.guard).patrols_completed, 3)
+
+
+class GenerateHouseQRCommandTest(TestCase):
+    def test_parallel_chunked_generation_resumes(self):
+        import tempfile
+        from io import StringIO
+        from django.core.management import call_command
+        from django.test import override_settings
+        from members.qr import qr_cache_key, qr_cache_name
+        from security.qr_signing import verify_payload
+        from .models import House
+
+        owner = User.objects.create_user(username='owner@test.com', email='owner@test.com', password='pass')
+        houses = [
+            House.objects.create(address=f'{number} Main Rd', owner=owner, house_number=f'H{number}',
+                                 square_footage=1000, property_type='house')
+            for number in range(3)
+        ]
+        houses[0].qr_code_data = f'house:{houses[0].id}'
+        houses[0].save()
+
+        with override_settings(MEDIA_ROOT=tempfile.mkdtemp()):
+            out = StringIO()
+            call_command('generate_house_qr', workers=2, chunk_size=1, stdout=out)
+            self.assertIn('Successfully generated QR codes for 2 houses', out.getvalue())
+
+            for house in houses[1:]:
+                house.refresh_from_db()
+                self.assertEqual(verify_payload('house', house.qr_code_data.split(':', 1)[1]), str(house.id))
+                self.assertEqual(house.qr_code.name, qr_cache_name(qr_cache_key(house.qr_code_data)))
+
+            out = StringIO()
+            call_command('generate_house_qr', stdout=out)
+            self.assertIn('All houses already have QR codes', out.getvalue())
+
+            # Re-issuing signs the one code that predates the active key
+            out = StringIO()
+            call_command('generate_house_qr', reissue=True, stdout=out)
+            self.assertIn('Successfully generated QR codes for 1 houses', out.getvalue())
+            houses[0].refresh_from_db()
+            self.assertEqual(verify_payload('house', houses[0].qr_code_data.split(':', 1)[1]), str(houses[0].id))
+
+    def test_prune_removes_images_replaced_by_reissue(self):
+        import tempfile
+        from datetime import timedelta
+        from io import StringIO
+        from django.core.files.storage import default_storage
+        from django.core.management import call_command
+        from django.test import override_settings
+        from members.qr import prune_qr_images, qr_image_name
+        from .models import House
+
+        owner = User.objects.create_user(username='pruner@test.com', email='pruner@test.com', password='pass')
+        house = House.objects.create(address='9 Main Rd', owner=owner, house_number='H9', square_footage=1000,
+                                     property_type='house', qr_code_data='house:legacy')
+        with override_settings(MEDIA_ROOT=tempfile.mkdtemp()):
+            House.objects.filter(id=house.id).update(qr_code=qr_image_name(house.qr_code_data))
+            call_command('generate_house_qr', reissue=True, stdout=StringIO())
+            house.refresh_from_db()
+            old_name = qr_image_name('house:legacy')
+
+            # Too recent to be pruned by default
+            self.assertEqual(prune_qr_images(), [])
+            self.assertEqual(prune_qr_images(timedelta(0), dry_run=True), [old_name])
+            self.assertTrue(default_storage.exists(old_name))
+
+            out = StringIO()
+            call_command('prune_qr_images', min_age_hours=0, stdout=out)
+            self.assertIn('Deleted 1 unused QR images', out.getvalue())
+            self.assertFalse(default_storage.exists(old_name))
+            self.assertTrue(default_storage.exists(house.qr_code.name))
+
+
+class QRCodeImageCacheTest(TestCase):
+    def setUp(self):
+        import tempfile
+        from django.test import override_settings
+        from members.models import UserProfile
+        from members.qr import qr_image_cache
+
+        media = override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+        media.enable()
+        self.addCleanup(media.disable)
+        qr_image_cache.clear()
+
+        User.objects.create_superuser(username='admin', email='admin@test.com', password='admin123')
+        self.member_user = User.objects.create_user(username='qr@test.com', email='qr@test.com', password='pass')
+        UserProfile.objects.create(user=self.member_user, full_name='QR Member', phone='1', address='1 Rd',
+                                   qr_code_data=f'member:{self.member_user.id}')
+        self.client = Client()
+        self.client.login(username='admin', password='admin123')
+
+    def test_identical_payloads_render_once_and_revalidate(self):
+        from members.qr import qr_image_cache, qr_image_name
+
+        url = reverse('adminstrator:qr_code_image', args=[self.member_user.id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        etag = response['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.assertEqual(qr_image_name(f'member:{self.member_user.id}'), qr_image_name(f'member:{self.member_user.id}'))
+        self.assertEqual(qr_image_cache.renders, 1)
+
+
+class AdministratorDashboardTest(TestCase):
+    def setUp(self):
+        from .dashboard_summary import dashboard_summary
+
+        dashboard_summary.invalidate()
+        self.addCleanup(dashboard_summary.invalidate)
+        User.objects.create_superuser(username='admin', email='admin@test.com', password='admin123')
+        self.client = Client()
+        self.client.login(username='admin', password='admin123')
+
+    def create_members(self, count, status='pending'):
+        from members.models import UserProfile
+
+        profiles = []
+        for index in range(count):
+            user = User.objects.create_user(username=f'{status}{index}@test.com', email=f'{status}{index}@test.com', password='pass')
+            profiles.append(UserProfile.objects.create(user=user, full_name=f'M {index}', phone='1', address='1 Rd', status=status))
+        return profiles
+
+    def dashboard(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('adminstrator:administrator_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_counts_are_cached_and_flat_in_population(self):
+        self.create_members(2)
+        cold, response = self.dashboard()
+        self.assertEqual(response.context['pending_members_count'], 2)
+        warm, _ = self.dashboard()
+        self.assertEqual(cold - warm, 3)  # One aggregate per model on a miss
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_members(25, status='approved')
+        after_writes, response = self.dashboard()
+        self.assertEqual(after_writes, cold)
+        self.assertEqual(response.context['approved_members_count'], 25)
+
+    def test_approval_invalidates_summary(self):
+        member = self.create_members(1)[0]
+        self.dashboard()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('adminstrator:approve_member', args=[member.id]))
+        _, response = self.dashboard()
+        self.assertEqual(response.context['pending_members_count'], 0)
+        self.assertEqual(response.context['approved_members_count'], 1)
+
+    def test_lists_are_paginated(self):
+        self.create_members(25)
+        url = reverse('adminstrator:dashboard_list', args=['pending_members'])
+        first = self.client.get(url)
+        self.assertEqual(len(first.context['page_obj']), 20)
+        self.assertContains(first, 'Page 1 of 2')
+        second = self.client.get(url, {'page': 2})
+        self.assertEqual(len(second.context['page_obj']), 5)
+        self.assertEqual(self.client.get(reverse('adminstrator:dashboard_list', args=['everyone'])).status_code, 404)
+
+
+class SubscriptionAnalyticsTest(TestCase):
+    def setUp(self):
+        from members.models import UserProfile
+
+        User.objects.create_superuser(username='admin', email='admin@test.com', password='admin123')
+        self.members = []
+        for index in range(2):
+            user = User.objects.create_user(username=f'payer{index}@test.com', email=f'payer{index}@test.com', password='pass')
+            UserProfile.objects.create(user=user, full_name=f'Payer {index}', phone='1', address=f'{index} Rd', status='approved')
+            self.members.append(user)
+
+    def rollup_rows(self):
+        from .models import SubscriptionDailyRollup, SubscriptionTotal
+
+        totals = sorted(SubscriptionTotal.objects.filter(count__gt=0).values_list('subscription_type', 'status', 'property_type', 'count', 'mrr'))
+        days = sorted(SubscriptionDailyRollup.objects.values_list(
+            'date', 'subscription_type', 'property_type', 'new_count', 'cancelled_count', 'expired_count', 'new_mrr', 'churned_mrr'
+        ))
+        return totals, days
+
+    def test_writes_update_rollups_incrementally(self):
+        from datetime import date, timedelta
+        from rest_framework.test import APIClient
+        from .models import Subscription
+        from .subscription_analytics import current_statistics, expire_due, rebuild_rollups
+
+        api = APIClient()
+        for user, plan in zip(self.members, ['premium', 'enterprise']):
+            response = api.post(reverse('members:pay_subscription'), {'email': user.email, 'amount': 1, 'subscription_type': plan})
+            self.assertEqual(response.status_code, 201, response.data)
+        api.force_authenticate(self.members[0])
+        self.assertEqual(api.post(reverse('members:cancel_subscription')).status_code, 200)
+        self.assertEqual(api.post(reverse('members:cancel_subscription')).status_code, 404)
+
+        stats = current_statistics()
+        self.assertEqual((stats['total_subscriptions'], stats['active_subscriptions'], stats['monthly_revenue']), (2, 1, 500))
+        self.assertEqual(stats['subscription_status'], {'active': 1, 'cancelled': 1})
+
+        # The enterprise plan lapsed yesterday; the sweep runs today
+        Subscription.objects.filter(subscription_type='enterprise').update(end_date=date.today() - timedelta(days=1))
+        self.assertEqual(expire_due(), 1)
+        self.assertEqual(expire_due(), 0)
+        self.assertEqual(current_statistics()['active_subscriptions'], 0)
+
+        incremental = self.rollup_rows()
+        rebuild_rollups()
+        self.assertEqual(self.rollup_rows(), incremental)
+
+    def test_time_series_rebuilds_past_days(self):
+        from datetime import date, timedelta
+        from .models import Subscription
+        from .subscription_analytics import rebuild_rollups
+
+        today = date.today()
+        for user, (started, fee) in zip(self.members, [(10, 100), (3, 500)]):
+            Subscription.objects.create(user=user, subscription_type='premium', status='active', monthly_fee=fee,
+                                        start_date=today - timedelta(days=started), end_date=today + timedelta(days=30))
+        rebuild_rollups()
+
+        self.client.login(username='admin', password='admin123')
+        url = reverse('adminstrator:subscription_timeseries')
+        response = self.client.get(url, {'start': (today - timedelta(days=11)).isoformat()})
+        self.assertEqual(response.status_code, 200)
+        series = response.json()['series']
+        self.assertEqual(len(series), 12)
+        self.assertEqual([series[0]['active'], series[1]['active'], series[-1]['active']], [0, 1, 2])
+        self.assertEqual(series[-1]['mrr'], '600.00')
+        self.assertEqual(sum(point['new'] for point in series), 2)
+
+        self.assertEqual(self.client.get(url, {'interval': 'hour'}).status_code, 400)
+        self.client.login(username='payer0@test.com', password='pass')
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+    def test_migration_backfills_existing_subscriptions(self):
+        from datetime import date, timedelta
+        from importlib import import_module
+        from django.apps import apps
+        from .models import Subscription
+        from .subscription_analytics import current_statistics
+
+        migration = import_module('adminstrator.migrations.0014_backfill_subscription_rollups')
+        today = date.today()
+        # Written before the rollups existed, so nothing counted them
+        for user, status in zip(self.members, ['active', 'cancelled']):
+            Subscription.objects.create(user=user, subscription_type='premium', status=status, monthly_fee=100,
+                                        start_date=today - timedelta(days=5), end_date=today + timedelta(days=25))
+        self.assertEqual(current_statistics()['total_subscriptions'], 0)
+
+        migration.backfill_rollups(apps, None)
+
+        stats = current_statistics()
+        self.assertEqual((stats['total_subscriptions'], stats['active_subscriptions'], stats['monthly_revenue']), (2, 1, 100))
+        self.assertEqual(stats['subscription_status'], {'active': 1, 'cancelled': 1})
+
+
+class RoutePlannerTest(TestCase):
+    def setUp(self):
+        from members.models import UserProfile
+        from .models import Route
+        from .route_planner import distance_matrix
+
+        distance_matrix.clear()
+        guard_user = User.objects.create_user(username='planner@test.com', email='planner@test.com', password='pass')
+        self.guard = SecurityProfile.objects.create(user=guard_user, employee_id='SEC-PLAN', status='approved')
+        self.route = Route.objects.create(name='Grid Loop', assigned_security_guard=self.guard)
+        # Corners of a ~200 m square, created out of walking order
+        corners = [(0, 0), (1, 1), (0, 1), (1, 0)]
+        self.members = []
+        for index, (row, column) in enumerate(corners):
+            user = User.objects.create_user(username=f'corner{index}@test.com', password='pass')
+            self.members.append(UserProfile.objects.create(
+                user=user, full_name=f'Corner {index}', phone='1', address=f'{index} Corner St', status='approved',
+                latitude=51.5 + row * 0.0018, longitude=-0.12 + column * 0.0029,
+            ))
+
+    def test_plan_follows_the_perimeter_and_is_served_without_recomputing(self):
+        from rest_framework.test import APIClient
+        from .route_planner import distance_matrix
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.route.checkpoints.add(*self.members)
+        self.route.refresh_from_db()
+        ids = [member.id for member in self.members]
+        self.assertIn(self.route.checkpoint_order, ([ids[0], ids[2], ids[1], ids[3]], [ids[0], ids[3], ids[1], ids[2]]))
+        self.assertAlmostEqual(self.route.planned_distance_m, 800, delta=20)
+        self.assertGreater(self.route.estimated_walk_seconds, 0)
+        self.assertEqual(distance_matrix.computed, 6)
+
+        client = APIClient()
+        client.force_authenticate(user=self.guard.user)
+        computed = distance_matrix.computed
+        response = client.get('/security/route/')
+        self.assertEqual([checkpoint['id'] for checkpoint in response.data['route']['checkpoints']],
+                         self.route.checkpoint_order)
+        self.assertEqual(distance_matrix.computed, computed)
+
+    def test_matrix_is_updated_incrementally(self):
+        from members.models import UserProfile
+        from .route_planner import distance_matrix
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.route.checkpoints.add(*self.members[:3])
+        self.assertEqual(distance_matrix.computed, 3)
+
+        # One new checkpoint costs one row, not a full rebuild
+        with self.captureOnCommitCallbacks(execute=True):
+            self.route.checkpoints.add(self.members[3])
+        self.assertEqual(distance_matrix.computed, 6)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.route.checkpoints.remove(self.members[0])
+        self.assertEqual(distance_matrix.computed, 6)
+
+        # A checkpoint without coordinates is visited last
+        user = User.objects.create_user(username='nowhere@test.com', password='pass')
+        nowhere = UserProfile.objects.create(user=user, full_name='Nowhere', phone='1', address='?', status='approved')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.route.checkpoints.add(nowhere)
+        self.route.refresh_from_db()
+        self.assertEqual(self.route.checkpoint_order[-1], nowhere.id)
+        self.assertEqual(len(self.route.checkpoint_order), 4)
+
+
+class RouteProgressTest(TestCase):
+    def setUp(self):
+        from members.models import UserProfile
+        from security.route_index import route_index
+        from .models import Route
+
+        route_index.clear()
+        guard_user = User.objects.create_user(username='progress@test.com', email='progress@test.com', password='pass')
+        self.guard = SecurityProfile.objects.create(user=guard_user, employee_id='SEC-PROG', status='approved')
+        self.route = Route.objects.create(name='Progress Loop', assigned_security_guard=self.guard)
+        self.members = []
+        for index in range(3):
+            user = User.objects.create_user(username=f'stop{index}@test.com', password='pass')
+            self.members.append(UserProfile.objects.create(
+                user=user, full_name=f'Stop {index}', phone='1', address=f'{index} Stop St', status='approved',
+            ))
+        self.route.checkpoints.add(*self.members)
+
+    def scan(self, member):
+        from rest_framework.test import APIClient
+
+        client = APIClient()
+        client.force_authenticate(user=self.guard.user)
+        response = client.post('/security/scan-qr/', {'qr_data': f'member:{member.id}'}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+
+    def progress(self):
+        from django.utils import timezone
+        from .route_progress import route_progress
+
+        self.route.refresh_from_db()
+        return route_progress(self.guard.id, self.route, timezone.localdate())
+
+    def test_repeat_scans_count_once(self):
+        from .models import RouteVisitBitmap
+
+        self.scan(self.members[0])
+        self.scan(self.members[0])
+        self.scan(self.members[2])
+        progress = self.progress()
+        self.assertEqual(progress['visited'], [self.members[0].id, self.members[2].id])
+        self.assertEqual(progress['remaining'], [self.members[1].id])
+        self.assertEqual(progress['visited_count'], 2)
+        self.assertEqual(RouteVisitBitmap.objects.count(), 1)
+
+        client = Client()
+        User.objects.create_superuser(username='admin', email='admin@test.com', password='admin123')
+        client.login(username='admin', password='admin123')
+        response = client.get(reverse('adminstrator:security_compliance'))
+        self.assertEqual(response.context['route_completion_data'][0]['scanned_today'], 2)
+
+    def test_slots_are_stable_across_membership_changes(self):
+        from members.models import UserProfile
+
+        self.scan(self.members[0])
+        self.scan(self.members[1])
+        self.route.checkpoints.remove(self.members[0])
+        progress = self.progress()
+        self.assertEqual(progress['visited'], [self.members[1].id])
+        self.assertEqual(progress['total_checkpoints'], 2)
+
+        # A new checkpoint takes a fresh slot instead of inheriting the removed one's visit
+        user = User.objects.create_user(username='stop3@test.com', password='pass')
+        added = UserProfile.objects.create(user=user, full_name='Stop 3', phone='1', address='3 Stop St', status='approved')
+        self.route.checkpoints.add(added, self.members[0])
+        progress = self.progress()
+        self.assertEqual(self.route.checkpoint_slots[3:], sorted([added.id, self.members[0].id]))
+        self.assertEqual(progress['visited'], [self.members[1].id])
+        self.scan(added)
+        self.assertEqual(self.progress()['visited_count'], 2)
+
+    def test_checkpoint_on_two_routes_is_visited_on_both(self):
+        from django.utils import timezone
+        from .models import Route
+        from .route_progress import route_progress
+
+        other = Route.objects.create(name='Second Loop', assigned_security_guard=self.guard)
+        other.checkpoints.add(self.members[1])
+        self.scan(self.members[1])
+
+        other.refresh_from_db()
+        self.assertEqual(route_progress(self.guard.id, other, timezone.localdate())['visited'], [self.members[1].id])
+        self.assertEqual(self.progress()['visited'], [self.members[1].id])
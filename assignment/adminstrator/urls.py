@@ -6,10 +6,12 @@ app_name = 'adminstrator'
 urlpatterns = [
     path('login/', views.administrator_login, name='administrator_login'),
     path('dashboard/', views.administrator_dashboard, name='administrator_dashboard'),
+    path('dashboard/list/<str:kind>/', views.dashboard_list, name='dashboard_list'),
     path('logout/', views.administrator_logout, name='administrator_logout'),
     path('approve/<int:security_id>/', views.approve_security, name='approve_security'),
     path('reject/<int:security_id>/', views.reject_security, name='reject_security'),
     path('subscription-statistics/', views.subscription_statistics, name='subscription_statistics'),
+    path('api/subscriptions/timeseries/', views.subscription_timeseries, name='subscription_timeseries'),
     path('security-compliance/', views.security_compliance_dashboard, name='security_compliance'),
     path('user-management/', views.user_management, name='user_management'),
     path('user/<int:user_id>/activate/', views.activate_user, name='activate_user'),
@@ -19,6 +21,7 @@ urlpatterns = [
     path('approve-member/<int:member_id>/', views.approve_member, name='approve_member'),
     path('reject-member/<int:member_id>/', views.reject_member, name='reject_member'),
     path('user/<int:user_id>/print-qr/', views.print_qr_code, name='print_qr_code'),
+    path('user/<int:user_id>/qr.png', views.qr_code_image, name='qr_code_image'),
     path('routes/', views.route_list, name='route_list'),
     path('routes/create/', views.route_create, name='route_create'),
     path('routes/<int:route_id>/edit/', views.route_edit, name='route_edit'),
@@ -1,15 +1,26 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+from django.urls import reverse
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.contrib.auth.models import User
-from django.db.models import Count, Avg, Sum, Q
+from django.db.models import Q
 from django.utils import timezone
 from django.core.paginator import Paginator
-from security.models import SecurityProfile
+from datetime import date, timedelta
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from security.models import SecurityProfile, ScanLog
+from security.replicas import replica_reads
 from members.models import UserProfile
-from .models import House, Subscription, SecurityCompliance, Route
+from .models import Subscription, Route
 from .forms import AdministratorSignupForm, AdministratorLoginForm, CreateAdministratorForm, RouteForm
+from . import compliance_summary, route_progress, subscription_analytics
+from .dashboard_summary import dashboard_summary
+from members.qr import DEFAULT_RENDER_PARAMS, qr_cache_key, qr_image_cache
 
 def administrator_signup(request):
     """Handle administrator registration"""
@@ -44,47 +55,42 @@ def administrator_login(request):
         form = AdministratorLoginForm()
     return render(request, 'adminstrator/login.html', {'form': form})
 
+@replica_reads
 @login_required
 def administrator_dashboard(request):
     """Administrator dashboard view"""
-    # Get all security profiles
-    pending_security = SecurityProfile.objects.filter(status='pending')
-    approved_security = SecurityProfile.objects.filter(status='approved')
-    rejected_security = SecurityProfile.objects.filter(status='rejected')
-
-    # Get all member profiles
-    pending_members = UserProfile.objects.filter(status='pending')
-    approved_members = UserProfile.objects.filter(status='approved')
-    rejected_members = UserProfile.objects.filter(status='rejected')
-
-    # Get subscription statistics
-    subscriptions = Subscription.objects.all()
-    total_subscriptions = subscriptions.count()
-    active_subscriptions = subscriptions.filter(status='active').count()
-    monthly_revenue = subscriptions.filter(status='active').aggregate(
-        total=Sum('monthly_fee')
-    )['total'] or 0
+    # Counters come from the cached summary; the lists are loaded page by page from dashboard_list
+    context = dashboard_summary.get()
+    return render(request, 'adminstrator/dashboard.html', context)
 
+# kind: (model, status, empty message)
+DASHBOARD_LISTS = {
+    'pending_security': (SecurityProfile, 'pending', 'No pending security applications.'),
+    'pending_members': (UserProfile, 'pending', 'No pending member applications.'),
+    'approved_members': (UserProfile, 'approved', 'No approved members.'),
+    'approved_security': (SecurityProfile, 'approved', 'No approved security guards.'),
+    'rejected_security': (SecurityProfile, 'rejected', 'No rejected security applications.'),
+    'rejected_members': (UserProfile, 'rejected', 'No rejected member applications.'),
+}
+DASHBOARD_PAGE_SIZE = 20
+
+@replica_reads
+@login_required
+def dashboard_list(request, kind):
+    """One page of a dashboard list, as an HTML fragment loaded by the dashboard"""
+    if kind not in DASHBOARD_LISTS:
+        raise Http404('Unknown dashboard list.')
+    model, profile_status, empty_message = DASHBOARD_LISTS[kind]
+    profiles = model.objects.filter(status=profile_status).select_related('user').order_by('-id')
+    page_obj = Paginator(profiles, DASHBOARD_PAGE_SIZE).get_page(request.GET.get('page'))
     context = {
-        'pending_security': pending_security,
-        'approved_security': approved_security,
-        'rejected_security': rejected_security,
-        'pending_members': pending_members,
-        'approved_members': approved_members,
-        'rejected_members': rejected_members,
-        'not_members': pending_members,
-        'pending_security_count': pending_security.count(),
-        'approved_security_count': approved_security.count(),
-        'rejected_security_count': rejected_security.count(),
-        'pending_members_count': pending_members.count(),
-        'approved_members_count': approved_members.count(),
-        'rejected_members_count': rejected_members.count(),
-        'not_members_count': pending_members.count(),
-        'total_subscriptions': total_subscriptions,
-        'active_subscriptions': active_subscriptions,
-        'monthly_revenue': monthly_revenue,
+        'kind': kind,
+        'is_security': model is SecurityProfile,
+        'status': profile_status,
+        'empty_message': empty_message,
+        'page_obj': page_obj,
     }
-    return render(request, 'adminstrator/dashboard.html', context)
+    return render(request, 'adminstrator/dashboard_list.html', context)
 
 @login_required
 def approve_security(request, security_id):
@@ -104,66 +110,77 @@ def reject_security(request, security_id):
     messages.success(request, f'Security guard {security_profile.user.get_full_name() or security_profile.user.username} has been rejected.')
     return redirect('adminstrator:administrator_dashboard')
 
+@replica_reads
 @login_required
 def subscription_statistics(request):
     """Subscription statistics dashboard"""
-    subscriptions = Subscription.objects.all()
-    
-    # Calculate statistics
-    total_subscriptions = subscriptions.count()
-    active_subscriptions = subscriptions.filter(status='active').count()
-    
-    # Revenue calculations
-    monthly_revenue = subscriptions.filter(status='active').aggregate(
-        total=Sum('monthly_fee')
-    )['total'] or 0
-    annual_revenue = monthly_revenue * 12
-    
-    # Subscription type distribution
-    sub_types = subscriptions.values('subscription_type').annotate(
-        count=Count('id')
-    ).order_by('subscription_type')
-    
-    subscription_types = {}
-    for sub_type in sub_types:
-        percentage = (sub_type['count'] / total_subscriptions * 100) if total_subscriptions > 0 else 0
-        subscription_types[sub_type['subscription_type']] = {
-            'count': sub_type['count'],
-            'percentage': round(percentage, 1)
-        }
-    
-    # Status distribution
-    subscription_status = dict(subscriptions.values('status').annotate(count=Count('id')).values_list('status', 'count'))
-    
-    # Recent subscriptions
-    recent_subscriptions = subscriptions.order_by('-created_at')[:15]
-    
-    context = {
-        'total_subscriptions': total_subscriptions,
-        'active_subscriptions': active_subscriptions,
-        'monthly_revenue': monthly_revenue,
-        'annual_revenue': annual_revenue,
-        'subscription_types': subscription_types,
-        'subscription_status': subscription_status,
-        'recent_subscriptions': recent_subscriptions,
-    }
+    # Totals and distributions come from the incremental rollups (see subscription_analytics.py)
+    context = subscription_analytics.current_statistics()
+    context['annual_revenue'] = subscription_analytics.trailing_revenue()
+    context['recent_subscriptions'] = Subscription.objects.select_related('user', 'house').order_by('-created_at')[:15]
     return render(request, 'adminstrator/subscription_statistics.html', context)
 
+@replica_reads
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def subscription_timeseries(request):
+    """Subscription movements, active count, MRR and churn per day, week or month.
+
+    Query parameters: start, end (ISO dates, default the last 30 days), interval (day, week, month),
+    type (subscription type) and property_type (house property type, empty for subscriptions without a house).
+    """
+    params = request.query_params
+    today = timezone.localdate()
+    try:
+        end = date.fromisoformat(params['end']) if params.get('end') else today
+        start = date.fromisoformat(params['start']) if params.get('start') else end - timedelta(days=29)
+    except ValueError:
+        return Response({'error': 'start and end must be ISO dates (YYYY-MM-DD)'}, status=status.HTTP_400_BAD_REQUEST)
+    interval = params.get('interval', 'day')
+    if interval not in subscription_analytics.INTERVALS:
+        return Response({'error': f"interval must be one of {', '.join(subscription_analytics.INTERVALS)}"},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if start > end or (end - start).days >= subscription_analytics.MAX_SERIES_DAYS:
+        return Response({'error': f'start must be on or before end, at most {subscription_analytics.MAX_SERIES_DAYS} days apart'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    points = subscription_analytics.time_series(
+        start, end, subscription_type=params.get('type'), property_type=params.get('property_type'), today=today
+    )
+    series = subscription_analytics.group_series(points, interval)
+    for point in series:
+        point['date'] = point['date'].isoformat()
+        for field in ('new_mrr', 'churned_mrr', 'mrr'):
+            point[field] = f'{point[field]:.2f}'
+    return Response({'start': start.isoformat(), 'end': end.isoformat(), 'interval': interval, 'series': series})
+
+@replica_reads
 @login_required
 def security_compliance_dashboard(request):
     """Security guard compliance dashboard"""
     # Get all security guards
-    all_guards = SecurityProfile.objects.filter(status='approved')
+    all_guards = list(SecurityProfile.objects.filter(status='approved').select_related('user'))
+    guard_ids = [guard.id for guard in all_guards]
+
+    # Per-guard latest compliance record and route in a fixed number of queries
+    today = timezone.localdate()
+    if compliance_summary.summary_enabled():
+        guard_facts = compliance_summary.load_guard_facts(guard_ids)
+    else:
+        guard_facts = compliance_summary.collect_guard_facts(guard_ids)
+    # Distinct checkpoints visited today, from the route visit bitmaps in one query
+    visited_today = route_progress.visited_counts(guard_ids, today)
 
-    # Get latest compliance record for each guard
     compliance_records = []
     compliant_count = 0
     total_compliance_scores = []
+    route_completion_data = []
 
     for guard in all_guards:
-        latest_record = SecurityCompliance.objects.filter(security_guard=guard).order_by('-date').first()
+        facts = guard_facts[guard.id]
+        latest_record = facts['latest']
         if latest_record:
-            compliance_score = latest_record.compliance_score
+            compliance_score = facts['score']  # Computed in SQL by with_score()
             total_compliance_scores.append(compliance_score)
             is_compliant = compliance_score >= 80
             if is_compliant:
@@ -195,6 +212,18 @@ def security_compliance_dashboard(request):
                 'notes': latest_record.notes,
             })
 
+        # Route completion data
+        if facts['has_route']:
+            total_checkpoints = facts['total_checkpoints']
+            visited = visited_today.get((guard.id, facts['route_id']), 0)
+            route_completion_data.append({
+                'guard': guard,
+                'route_name': facts['route_name'],
+                'total_checkpoints': total_checkpoints,
+                'scanned_today': visited,
+                'completion_percentage': min(100.0, visited / total_checkpoints * 100) if total_checkpoints > 0 else 0,
+            })
+
     total_guards = len(all_guards)
     non_compliant_count = total_guards - compliant_count
 
@@ -216,9 +245,8 @@ def security_compliance_dashboard(request):
     compliance_records.sort(key=lambda x: x['compliance_score'])
 
     # Get recent scan logs (QR codes scanned by security guards)
-    from security.models import ScanLog
     recent_scans = ScanLog.objects.filter(
-        security_guard__in=all_guards
+        security_guard__status='approved'
     ).select_related('security_guard__user').order_by('-scanned_at')[:20]  # Last 20 scans
 
     scanned_qr_codes = []
@@ -231,29 +259,6 @@ def security_compliance_dashboard(request):
             'scanned_at': scan.scanned_at,
         })
 
-    # Get route completion data
-    route_completion_data = []
-    for guard in all_guards:
-        assigned_route = Route.objects.filter(assigned_security_guard=guard).first()
-        if assigned_route:
-            total_checkpoints = assigned_route.checkpoints.count()
-            # Count member checkpoint QR scans for this guard today
-            from datetime import date
-            today = date.today()
-            member_scans_today = ScanLog.objects.filter(
-                security_guard=guard,
-                qr_data__startswith='member:',
-                scanned_at__date=today
-            ).count()
-
-            route_completion_data.append({
-                'guard': guard,
-                'route_name': assigned_route.name,
-                'total_checkpoints': total_checkpoints,
-                'scanned_today': member_scans_today,
-                'completion_percentage': (member_scans_today / total_checkpoints * 100) if total_checkpoints > 0 else 0,
-            })
-
     context = {
         'total_guards': total_guards,
         'compliant_count': compliant_count,
@@ -266,6 +271,7 @@ def security_compliance_dashboard(request):
     }
     return render(request, 'adminstrator/security_compliance.html', context)
 
+@replica_reads
 @login_required
 def user_management(request):
     """User management dashboard with filtering and search"""
@@ -412,19 +418,38 @@ def print_qr_code(request, user_id):
     user = get_object_or_404(User, id=user_id)
     try:
         profile = user.userprofile
-        if not profile.qr_code:
+        if not profile.qr_code_data and not profile.qr_code:
             messages.error(request, 'No QR code found for this user.')
             return redirect('adminstrator:user_management')
         context = {
             'user': user,
             'profile': profile,
-            'qr_code_url': profile.qr_code.url,
+            # Served from the shared QR cache; profiles from before qr_code_data keep their file
+            'qr_code_url': reverse('adminstrator:qr_code_image', args=[user.id]) if profile.qr_code_data else profile.qr_code.url,
         }
         return render(request, 'adminstrator/print_qr.html', context)
     except UserProfile.DoesNotExist:
         messages.error(request, 'User profile not found.')
         return redirect('adminstrator:user_management')
 
+@login_required
+def qr_code_image(request, user_id):
+    """Serve a member's QR PNG from the content-addressed cache with a strong ETag"""
+    profile = get_object_or_404(UserProfile.objects.only('qr_code_data'), user_id=user_id)
+    if not profile.qr_code_data:
+        raise Http404('No QR code found for this user.')
+
+    # The cache key is a hash of the payload and render parameters, so it is a strong validator
+    etag = f'"{qr_cache_key(profile.qr_code_data, **DEFAULT_RENDER_PARAMS)}"'
+    if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+        response = HttpResponseNotModified()
+    else:
+        _, png = qr_image_cache.get(profile.qr_code_data)
+        response = HttpResponse(png, content_type='image/png')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, max-age=86400'
+    return response
+
 def administrator_logout(request):
     """Handle administrator logout"""
     logout(request)
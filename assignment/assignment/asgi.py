@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'assignment.settings')
 
 application = get_asgi_application()
+
+# Optional in-process schedule for the scan retention job (SCAN_RETENTION_INTERVAL_HOURS)
+from security.retention import start_scheduler  # noqa: E402
+
+start_scheduler()
@@ -0,0 +1,121 @@
+"""
+Environment-driven database profiles.
+
+DB_PROFILE=sqlite (the default) keeps the project database in BASE_DIR but
+tunes every new connection for concurrent guard scans: WAL journaling lets
+readers run alongside a writer, synchronous=NORMAL drops the fsync per commit
+(safe under WAL), busy_timeout makes a writer wait for the lock instead of
+failing with "database is locked", and mmap speeds up reads. The pragmas are
+applied from the connection_created signal (see apply_sqlite_pragmas).
+Connections are kept for DB_CONN_MAX_AGE seconds (60 by default) so requests
+do not pay for the pragmas each time. The journal mode is stored in the
+database file, so it is only switched once per process.
+
+DB_PROFILE=postgres reads DB_NAME, DB_USER, DB_PASSWORD, DB_HOST and DB_PORT
+and keeps connections open for DB_CONN_MAX_AGE seconds with health checks.
+Django 4.2 has no built-in pool, so pooling is done by PgBouncer: set
+DB_PGBOUNCER=1 when DB_HOST points at a transaction-mode PgBouncer, which
+turns off server-side cursors (they do not survive transaction pooling).
+
+Either profile gets a second, read-only 'replica' alias when DB_REPLICA_NAME
+(SQLite file or Postgres database) or DB_REPLICA_HOST is set; it copies the
+primary's settings, and DB_REPLICA_PORT/USER/PASSWORD override them. Tests
+mirror it onto the primary. For local testing a copy of db.sqlite3 can act as
+the replica: DB_REPLICA_NAME=replica.sqlite3 (see security/replicas.py).
+"""
+import os
+import threading
+
+# How long a writer waits for the SQLite lock, used for both the driver timeout and busy_timeout
+SQLITE_LOCK_TIMEOUT_SECONDS = 20
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': SQLITE_LOCK_TIMEOUT_SECONDS * 1000,  # milliseconds
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+
+def _flag(value):
+    return str(value).lower() in ('1', 'true', 'yes', 'on')
+
+
+def database_settings(base_dir, env=None):
+    """Return the DATABASES setting for the profile selected by DB_PROFILE"""
+    env = os.environ if env is None else env
+    profile = env.get('DB_PROFILE', 'sqlite').lower()
+
+    if profile in ('postgres', 'postgresql'):
+        databases = {
+            'default': {
+                'ENGINE': 'django.db.backends.postgresql',
+                'NAME': env.get('DB_NAME', 'assignment'),
+                'USER': env.get('DB_USER', 'assignment'),
+                'PASSWORD': env.get('DB_PASSWORD', ''),
+                'HOST': env.get('DB_HOST', 'localhost'),
+                'PORT': env.get('DB_PORT', '5432'),
+                'CONN_MAX_AGE': int(env.get('DB_CONN_MAX_AGE', 60)),
+                'CONN_HEALTH_CHECKS': True,
+                'DISABLE_SERVER_SIDE_CURSORS': _flag(env.get('DB_PGBOUNCER', '')),
+                'OPTIONS': {
+                    'connect_timeout': int(env.get('DB_CONNECT_TIMEOUT', 5)),
+                },
+            }
+        }
+        return _with_replica(databases, env)
+
+    if profile != 'sqlite':
+        raise ValueError(f"Unknown DB_PROFILE {profile!r}; expected 'sqlite' or 'postgres'")
+
+    databases = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': env.get('DB_NAME', base_dir / 'db.sqlite3'),
+            'CONN_MAX_AGE': int(env.get('DB_CONN_MAX_AGE', 60)),
+            'OPTIONS': {
+                # Seconds the sqlite3 driver waits for a lock before raising
+                'timeout': SQLITE_LOCK_TIMEOUT_SECONDS,
+            },
+        }
+    }
+    return _with_replica(databases, env)
+
+
+def _with_replica(databases, env):
+    overrides = {
+        key: env[f'DB_REPLICA_{key}'] for key in ('NAME', 'HOST', 'PORT', 'USER', 'PASSWORD')
+        if env.get(f'DB_REPLICA_{key}')
+    }
+    if 'NAME' in overrides or 'HOST' in overrides:
+        databases['replica'] = {
+            **databases['default'],
+            **overrides,
+            'OPTIONS': dict(databases['default']['OPTIONS']),
+            'TEST': {'MIRROR': 'default'},
+        }
+    return databases
+
+
+_journal_lock = threading.Lock()
+_journal_modes = {}  # database name -> journal_mode already set on it by this process
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """connection_created receiver that applies settings.SQLITE_PRAGMAS to new SQLite connections"""
+    if connection.vendor != 'sqlite':
+        return
+    from django.conf import settings
+
+    pragmas = dict(getattr(settings, 'SQLITE_PRAGMAS', SQLITE_PRAGMAS))
+    name = str(connection.settings_dict['NAME'])
+    journal_mode = pragmas.pop('journal_mode', None)
+    with connection.cursor() as cursor:
+        # journal_mode persists in the file (in-memory databases are never shared, so always set it there)
+        if journal_mode is not None and (connection.is_in_memory_db() or _journal_modes.get(name) != journal_mode):
+            cursor.execute(f'PRAGMA journal_mode = {journal_mode}')
+            with _journal_lock:
+                _journal_modes[name] = journal_mode
+        for pragma, value in pragmas.items():
+            cursor.execute(f'PRAGMA {pragma} = {value}')
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from . import database
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -43,26 +46,52 @@ INSTALLED_APPS = [
     'members',
     'security',
     'adminstrator',
+    'benchmarks',
 ]
 
+# Logging goes through a queue to a background thread so log I/O never blocks a request
+# (see security/log_pipeline.py): JSON lines in a rotating file plus console output,
+# with only one in LOG_DEBUG_SAMPLE_RATE DEBUG records kept
+LOG_DEBUG_SAMPLE_RATE = 10
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'filters': {
+        'sample_debug': {
+            '()': 'security.log_pipeline.SamplingFilter',
+            'debug_rate': LOG_DEBUG_SAMPLE_RATE,
+        },
+    },
     'handlers': {
         'console': {
             'class': 'logging.StreamHandler',
         },
-        'file': {
-            'class': 'logging.FileHandler',
+        'async': {
+            'class': 'security.log_pipeline.AsyncLogHandler',
             'filename': 'security_debug.log',
+            'max_bytes': 10 * 1024 * 1024,
+            'backup_count': 5,
+            'queue_size': 10000,
             'level': 'DEBUG',
+            'filters': ['sample_debug'],
         },
     },
     'loggers': {
         'security': {
-            'handlers': ['console', 'file'],
+            'handlers': ['async'],
             'level': 'DEBUG',
-            'propagate': True,
+            'propagate': False,
+        },
+        'members': {
+            'handlers': ['async'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'adminstrator': {
+            'handlers': ['async'],
+            'level': 'INFO',
+            'propagate': False,
         },
         'django': {
             'handlers': ['console'],
@@ -74,11 +103,14 @@ LOGGING = {
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'security.instrumentation.InstrumentationMiddleware',
+    'security.replicas.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     # 'django.middleware.csrf.CsrfViewMiddleware',  # CSRF protection disabled
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'security.roles.RequestRoleMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -109,12 +141,18 @@ WSGI_APPLICATION = 'assignment.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
-}
+# Selected with DB_PROFILE=sqlite|postgres (see assignment/database.py)
+DATABASES = database.database_settings(BASE_DIR)
+
+# Reporting views read from this alias when it is configured (see security/replicas.py)
+DATABASE_REPLICA_ALIAS = 'replica' if 'replica' in DATABASES else None
+DATABASE_ROUTERS = ['security.replicas.ReplicaRouter']
+
+# Seconds a client that wrote keeps reading from the primary
+REPLICA_PIN_SECONDS = 5
+
+# Applied to every new SQLite connection
+SQLITE_PRAGMAS = dict(database.SQLITE_PRAGMAS)
 
 
 # Password validation
@@ -165,10 +203,80 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'security.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
 }
+
+# Seconds a cached guard route membership entry stays valid (see security/route_index.py)
+ROUTE_INDEX_TTL = 300
+
+# Seconds the in-memory map of patrol location names stays valid (see security/qr_payloads.py)
+LOCATION_INDEX_TTL = 300
+
+# Keep GuardComplianceSummary rows current so the compliance dashboard reads one table
+COMPLIANCE_SUMMARY_ENABLED = True
+
+# Member QR images are rendered off the request path (see members/qr.py)
+QR_RENDER_ASYNC = True
+QR_RENDER_WORKERS = 2
+QR_RENDER_MAX_ATTEMPTS = 3
+
+# Content-addressed QR image store (under MEDIA_ROOT) and in-memory LRU size
+QR_CACHE_DIR = 'qr_cache'
+QR_CACHE_MAX_ENTRIES = 1024
+
+# ScanLog retention (see security/retention.py): raw scans older than this many days are
+# rolled up and archived; set SCAN_RETENTION_INTERVAL_HOURS to archive from the web process
+SCAN_RETENTION_DAYS = 90
+SCAN_ARCHIVE_DIR = BASE_DIR / 'scan_archive'
+SCAN_RETENTION_INTERVAL_HOURS = None
+
+# Seconds an authenticated token (with its user and profiles) is served from the in-process auth cache
+TOKEN_AUTH_CACHE_TTL = 60
+TOKEN_AUTH_CACHE_SIZE = 10000
+
+# Coalesce scan-time compliance increments in memory and flush them every COMPLIANCE_FLUSH_SECONDS
+# (see adminstrator/compliance_counters.py); off by default so records are updated per scan
+COMPLIANCE_WRITE_BEHIND = False
+COMPLIANCE_FLUSH_SECONDS = 5
+
+# Per-view request/query metrics served at security/metrics/ (see security/instrumentation.py);
+# a request repeating one SQL statement INSTRUMENTATION_DUPLICATE_THRESHOLD times counts as N+1
+INSTRUMENTATION_ENABLED = False
+INSTRUMENTATION_DUPLICATE_THRESHOLD = 3
+INSTRUMENTATION_DUMP_SECONDS = None
+
+# Seconds the administrator dashboard counters are cached; writes in this process invalidate them sooner
+DASHBOARD_SUMMARY_TTL = 60
+
+# Keyring for signed QR payloads (see security/qr_signing.py). Codes are signed with the first key
+# without a 'retired' date (YYYY-MM-DD); retired keys are accepted for QR_KEY_GRACE_DAYS after it
+QR_SIGNING_KEYS = [
+    {'id': 'k1', 'secret': os.environ.get('QR_SIGNING_SECRET', SECRET_KEY)},
+]
+QR_KEY_GRACE_DAYS = 30
+# Reject signed codes older than this many days; None lets them live as long as their key
+QR_PAYLOAD_MAX_AGE_DAYS = None
+# Accept legacy unsigned member:<id> and house:<id> codes until every printed code is re-issued
+QR_ACCEPT_UNSIGNED = True
+
+# Scan geofencing (see security/geo_index.py): scans further than GEOFENCE_RADIUS_METERS from their
+# checkpoint are flagged, or rejected when GEOFENCE_ENFORCE is on
+GEOFENCE_RADIUS_METERS = 75
+GEOFENCE_ENFORCE = False
+GEO_GRID_CELL_METERS = 250
+GEO_NEAREST_MAX_METERS = 1000
+# Seconds between full reloads of the checkpoint grid; saves in this process update it immediately
+GEO_INDEX_TTL = 900
+
+# Walking speed used for the estimated patrol time of a planned route (see adminstrator/route_planner.py)
+ROUTE_WALKING_SPEED_MPS = 1.3
+
+# Offline scan replays (security/scan-qr/batch/) dated more than OFFLINE_SCAN_MAX_AGE_HOURS ago, or further
+# ahead than OFFLINE_SCAN_CLOCK_SKEW_SECONDS, are rejected instead of being credited to that day
+OFFLINE_SCAN_MAX_AGE_HOURS = 72
+OFFLINE_SCAN_CLOCK_SKEW_SECONDS = 300
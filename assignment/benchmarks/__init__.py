@@ -0,0 +1,9 @@
+"""
+Load and query-count benchmarks for the guard, member and administrator endpoints.
+
+data.generate_dataset() fills a throwaway database with guards, members,
+routes and months of ScanLog/SecurityCompliance history; scenarios.SCENARIOS
+describes the requests to time together with their query and p95 budgets; and
+runner drives them through the Django test client or a local WSGI/ASGI server
+and writes a JSON report. Run everything with `python manage.py benchmark`.
+"""
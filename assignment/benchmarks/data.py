@@ -0,0 +1,166 @@
+"""
+Synthetic data for benchmarks.
+
+Everything is written with bulk_create, so model signals do not run; the
+derived caches (route index, compliance summaries, token cache) are reset at
+the end instead.
+"""
+import random
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from adminstrator.compliance_counters import COMPLIANCE_DEFAULTS
+from adminstrator.compliance_summary import rebuild_summaries
+from adminstrator.dashboard_summary import dashboard_summary
+from adminstrator.subscription_analytics import rebuild_rollups
+from adminstrator.models import House, Route, SecurityCompliance, Subscription
+from members.models import PanicAlert, UserProfile
+from security.authentication import token_cache
+from security.models import ScanLog, SecurityProfile
+from security.qr_signing import sign_payload
+from security.route_index import route_index
+
+BENCHMARK_PASSWORD = 'benchmark-pass'
+
+Dataset = namedtuple('Dataset', ['admin', 'guards', 'members', 'routes', 'guard_tokens', 'member_tokens', 'counts'])
+
+BATCH_SIZE = 2000
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """Let bulk_create keep the given auto_now_add values instead of stamping now()"""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def _create_users(prefix, count, password):
+    users = [
+        User(username=f'{prefix}{index}@bench.test', email=f'{prefix}{index}@bench.test',
+             first_name=prefix.title(), last_name=str(index), password=password)
+        for index in range(count)
+    ]
+    return User.objects.bulk_create(users, batch_size=BATCH_SIZE)
+
+
+def generate_dataset(guards=10, members=200, checkpoints_per_route=20, months=3,
+                     scans_per_guard_day=20, active_alerts=10, seed=1):
+    """Create a complete neighbourhood and return a Dataset describing it"""
+    rng = random.Random(seed)
+    password = make_password(BENCHMARK_PASSWORD)  # Hash once, not per user
+    admin = User.objects.create_superuser('bench-admin', 'bench-admin@bench.test', BENCHMARK_PASSWORD)
+
+    guard_users = _create_users('guard', guards, password)
+    guard_profiles = SecurityProfile.objects.bulk_create([
+        SecurityProfile(user=user, employee_id=f'BENCH{index:05d}', status='approved')
+        for index, user in enumerate(guard_users)
+    ])
+
+    member_users = _create_users('member', members, password)
+    member_profiles = UserProfile.objects.bulk_create([
+        UserProfile(user=user, full_name=f'Member {index}', phone=f'555{index:07d}',
+                    address=f'{index} Bench Street', status='approved', qr_status='ready')
+        for index, user in enumerate(member_users)
+    ], batch_size=BATCH_SIZE)
+    for profile in member_profiles:
+        profile.qr_code_data = sign_payload('member', profile.id)
+    UserProfile.objects.bulk_update(member_profiles, ['qr_code_data'], batch_size=BATCH_SIZE)
+
+    guard_tokens = Token.objects.bulk_create([Token(key=Token.generate_key(), user=user) for user in guard_users])
+    member_tokens = Token.objects.bulk_create([Token(key=Token.generate_key(), user=user) for user in member_users])
+
+    routes = Route.objects.bulk_create([
+        Route(name=f'Route {index}', assigned_security_guard=guard)
+        for index, guard in enumerate(guard_profiles)
+    ])
+    memberships = []
+    route_members = {}
+    for route in routes:
+        sample = rng.sample(member_profiles, min(checkpoints_per_route, len(member_profiles)))
+        route_members[route.assigned_security_guard_id] = [profile.id for profile in sample]
+        memberships.extend(Route.checkpoints.through(route_id=route.id, userprofile_id=profile.id) for profile in sample)
+    Route.checkpoints.through.objects.bulk_create(memberships, batch_size=BATCH_SIZE)
+
+    today = date.today()
+    days = [today - timedelta(days=offset) for offset in range(months * 30)]
+    scan_count = 0
+    with explicit_timestamps(ScanLog._meta.get_field('scanned_at')):
+        batch = []
+        for guard in guard_profiles:
+            checkpoint_ids = route_members[guard.id] or [member_profiles[0].id]
+            for day in days:
+                start = timezone.make_aware(datetime.combine(day, time(18, 0)))
+                for number in range(scans_per_guard_day):
+                    member_id = rng.choice(checkpoint_ids)
+                    batch.append(ScanLog(
+                        security_guard=guard, qr_data=f'member:{member_id}', location=f'{member_id} Bench Street',
+                        scanned_at=start + timedelta(minutes=number * 30 + rng.randint(0, 29)),
+                    ))
+                if len(batch) >= BATCH_SIZE:
+                    ScanLog.objects.bulk_create(batch)
+                    scan_count += len(batch)
+                    batch = []
+        ScanLog.objects.bulk_create(batch)
+        scan_count += len(batch)
+
+    SecurityCompliance.objects.bulk_create([
+        SecurityCompliance(**{
+            **COMPLIANCE_DEFAULTS,
+            'security_guard': guard, 'date': day,
+            'patrols_completed': scans_per_guard_day, 'tasks_completed': rng.randint(0, 5),
+            'on_time': rng.random() > 0.2,
+        })
+        for guard in guard_profiles for day in days
+    ], batch_size=BATCH_SIZE)
+
+    houses = House.objects.bulk_create([
+        House(address=profile.address, owner_id=profile.user_id, house_number=f'BENCH{index}', square_footage=1000,
+              property_type='house')
+        for index, profile in enumerate(member_profiles)
+    ], batch_size=BATCH_SIZE)
+    Subscription.objects.bulk_create([
+        Subscription(
+            user_id=house.owner_id, house=house, subscription_type=rng.choice(['basic', 'premium', 'enterprise']),
+            status=rng.choice(['active', 'active', 'active', 'cancelled', 'expired']),
+            start_date=today - timedelta(days=rng.randint(0, months * 30)), end_date=today + timedelta(days=30),
+            monthly_fee=Decimal(rng.choice([0, 100, 500])),
+        )
+        for house in houses
+    ], batch_size=BATCH_SIZE)
+
+    PanicAlert.objects.bulk_create([
+        PanicAlert(member=user, address=f'{index} Bench Street')
+        for index, user in enumerate(member_users[:active_alerts])
+    ])
+
+    route_index.clear()
+    token_cache.clear()
+    rebuild_summaries()
+    dashboard_summary.invalidate()
+    rebuild_rollups()
+
+    return Dataset(
+        admin=admin,
+        guards=guard_profiles,
+        members=member_profiles,
+        routes=route_members,
+        guard_tokens=[token.key for token in guard_tokens],
+        member_tokens=[token.key for token in member_tokens],
+        counts={
+            'guards': guards, 'members': members, 'routes': len(routes),
+            'checkpoints_per_route': checkpoints_per_route, 'days': len(days),
+            'scans': scan_count, 'compliance_records': guards * len(days),
+        },
+    )
@@ -0,0 +1,86 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import get_runner, setup_test_environment, teardown_test_environment
+from django.conf import settings
+
+from benchmarks.data import generate_dataset
+from benchmarks.runner import build_report, run_http, run_in_process, serve, write_report
+from benchmarks.scenarios import SCENARIOS, SCENARIOS_BY_NAME
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a synthetic dataset in a throwaway test database, time the guard, member and '
+        'administrator endpoints, and write a JSON report. Exits non-zero when a query or p95 '
+        'budget (or the --baseline report) is exceeded.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--guards', type=int, default=10)
+        parser.add_argument('--members', type=int, default=200)
+        parser.add_argument('--checkpoints', type=int, default=20, help='Checkpoints per route')
+        parser.add_argument('--months', type=int, default=3, help='Months of scan and compliance history')
+        parser.add_argument('--scans-per-day', type=int, default=20, help='Scans per guard per day of history')
+        parser.add_argument('--iterations', type=int, default=100, help='Timed requests per scenario')
+        parser.add_argument('--mode', choices=['client', 'wsgi', 'asgi'], default='client',
+                            help='Django test client (with query counts) or a local WSGI/ASGI server')
+        parser.add_argument('--concurrency', type=int, default=8, help='Parallel clients in wsgi/asgi mode')
+        parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS_BY_NAME), help='Run only these scenarios')
+        parser.add_argument('--output', default='benchmark_report.json')
+        parser.add_argument('--baseline', help='Earlier report to compare query counts and p95 against')
+        parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed p95 regression against --baseline')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as baseline_file:
+                    baseline = json.load(baseline_file)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read baseline {options['baseline']}: {e}")
+
+        scenarios = [SCENARIOS_BY_NAME[name] for name in options['scenario']] if options['scenario'] else SCENARIOS
+
+        setup_test_environment()
+        test_runner = get_runner(settings)(verbosity=0, interactive=False)
+        old_config = test_runner.setup_databases()
+        try:
+            self.stdout.write('Generating dataset...')
+            dataset = generate_dataset(
+                guards=options['guards'], members=options['members'], checkpoints_per_route=options['checkpoints'],
+                months=options['months'], scans_per_guard_day=options['scans_per_day'],
+            )
+            self.stdout.write(f"Dataset: {dataset.counts}")
+
+            stop = None
+            if options['mode'] != 'client':
+                base_url, stop = serve(options['mode'])
+            try:
+                results = []
+                for scenario in scenarios:
+                    if stop:
+                        result = run_http(scenario, dataset, base_url, options['iterations'], options['concurrency'])
+                    else:
+                        result = run_in_process(scenario, dataset, options['iterations'])
+                    results.append(result)
+                    queries = result.get('queries', {}).get('max', '-')
+                    self.stdout.write(
+                        f"{scenario.name:32} p50 {result['latency_ms']['p50']:>8}ms  p95 {result['latency_ms']['p95']:>8}ms  "
+                        f"{result['throughput_rps']:>8} req/s  queries {queries}"
+                    )
+            finally:
+                if stop:
+                    stop()
+        finally:
+            test_runner.teardown_databases(old_config)
+            teardown_test_environment()
+
+        report = build_report(results, SCENARIOS_BY_NAME, dataset.counts, baseline, options['tolerance'])
+        write_report(report, options['output'])
+        self.stdout.write(f"Report written to {options['output']}")
+
+        failures = [f"{result['name']}: {failure}" for result in report['scenarios'] for failure in result['failures']]
+        if failures:
+            raise CommandError('Benchmark budgets exceeded:\n  ' + '\n  '.join(failures))
+        self.stdout.write(self.style.SUCCESS('All benchmark budgets met!'))
@@ -0,0 +1,78 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import get_runner, override_settings, setup_test_environment, teardown_test_environment
+
+from benchmarks.data import generate_dataset
+from benchmarks.runner import write_report
+from benchmarks.writes import SQLITE_MODES, run_scan_writes
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure concurrent scan write throughput (ScanLog row plus compliance increment per scan) '
+        'against a throwaway test database. On SQLite the stock and tuned connection settings are '
+        'compared on a file database; with DB_PROFILE=postgres the configured server is used.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Guards scanning at the same time')
+        parser.add_argument('--scans', type=int, default=200, help='Scans per thread')
+        parser.add_argument('--sqlite-mode', action='append', choices=sorted(SQLITE_MODES),
+                            help='SQLite settings to compare (default: all)')
+        parser.add_argument('--output', default='benchmark_writes.json')
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            modes = options['sqlite_mode'] or list(SQLITE_MODES)
+        else:
+            modes = [connection.vendor]
+
+        results = []
+        setup_test_environment()
+        try:
+            for mode in modes:
+                result = self._run_mode(mode, options['threads'], options['scans'])
+                results.append(result)
+                self.stdout.write(
+                    f"{mode:10} {result['throughput_scans_per_s']:>8} scans/s  p95 {result['commit_latency_ms']['p95']}ms  "
+                    f"locked {result['locked']}  errors {result['errors']}  lost increments {result['lost_increments']}"
+                )
+        finally:
+            teardown_test_environment()
+
+        write_report({'threads': options['threads'], 'scans_per_thread': options['scans'], 'modes': results},
+                     options['output'])
+        self.stdout.write(f"Report written to {options['output']}")
+
+        broken = [result['mode'] for result in results if result['lost_increments']]
+        if broken:
+            raise CommandError(f"Compliance increments were lost under: {', '.join(broken)}")
+
+    def _run_mode(self, mode, threads, scans):
+        overrides = {}
+        workdir = None
+        if connection.vendor == 'sqlite':
+            # In-memory test databases share one connection, so use a real file
+            workdir = tempfile.mkdtemp(prefix='benchmark-writes-')
+            connection.settings_dict['TEST']['NAME'] = os.path.join(workdir, 'writes.sqlite3')
+            overrides['SQLITE_PRAGMAS'] = SQLITE_MODES[mode] or settings.SQLITE_PRAGMAS
+
+        with override_settings(**overrides):
+            test_runner = get_runner(settings)(verbosity=0, interactive=False)
+            old_config = test_runner.setup_databases()
+            try:
+                dataset = generate_dataset(guards=threads, members=max(50, threads * 5), checkpoints_per_route=5,
+                                           months=0, scans_per_guard_day=0, active_alerts=0)
+                result = run_scan_writes(dataset, threads, scans)
+            finally:
+                test_runner.teardown_databases(old_config)
+                if workdir:
+                    connection.settings_dict['TEST']['NAME'] = None
+                    for name in os.listdir(workdir):
+                        os.remove(os.path.join(workdir, name))
+                    os.rmdir(workdir)
+        return {'mode': mode, **result}
@@ -0,0 +1,220 @@
+"""
+Scenario execution and reporting.
+
+run_in_process() times a scenario through the Django test client and captures
+every request's SQL, so query budgets can be enforced; run_http() drives it
+with concurrent clients against a local WSGI/ASGI server started by serve().
+build_report() adds the budget and baseline checks, and write_report() saves
+the result as JSON.
+"""
+import json
+import statistics
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone as dt_timezone
+from socketserver import ThreadingMixIn
+from urllib import request as urllib_request
+from urllib.error import HTTPError
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(name, mode, durations, statuses, elapsed, queries=None):
+    ms = [duration * 1000 for duration in durations]
+    result = {
+        'name': name,
+        'mode': mode,
+        'requests': len(durations),
+        'errors': sum(count for code, count in statuses.items() if code >= 400),
+        'status_codes': {str(code): count for code, count in sorted(statuses.items())},
+        'throughput_rps': round(len(durations) / elapsed, 1) if elapsed else None,
+        'latency_ms': {
+            'mean': round(statistics.fmean(ms), 3) if ms else None,
+            'p50': round(percentile(ms, 0.50), 3) if ms else None,
+            'p95': round(percentile(ms, 0.95), 3) if ms else None,
+            'p99': round(percentile(ms, 0.99), 3) if ms else None,
+            'max': round(max(ms), 3) if ms else None,
+        },
+    }
+    if queries is not None:
+        result['queries'] = {'max': max(queries, default=0), 'mean': round(statistics.fmean(queries), 2) if queries else 0}
+    return result
+
+
+def _client_for(scenario, dataset, index):
+    client = Client()
+    if scenario.role == 'admin':
+        client.force_login(dataset.admin)
+    else:
+        tokens = dataset.guard_tokens if scenario.role == 'guard' else dataset.member_tokens
+        client.defaults['HTTP_AUTHORIZATION'] = f'Token {tokens[index % len(tokens)]}'
+    return client
+
+
+def _send(client, scenario, dataset, index):
+    payload = scenario.payload(dataset, index) if scenario.payload else None
+    if scenario.method == 'post':
+        return client.post(scenario.path, payload, content_type='application/json')
+    return client.get(scenario.path)
+
+
+def run_in_process(scenario, dataset, iterations=100):
+    """Time warm requests through the test client, capturing queries for every request"""
+    # One client per identity, created and warmed up front so logins and cold caches are not timed
+    clients = [_client_for(scenario, dataset, index) for index in range(len(dataset.guards))]
+    for index, client in enumerate(clients):
+        _send(client, scenario, dataset, index)
+
+    durations, queries, statuses = [], [], Counter()
+    started = time.perf_counter()
+    for index in range(iterations):
+        with CaptureQueriesContext(connection) as captured:
+            request_started = time.perf_counter()
+            response = _send(clients[index % len(clients)], scenario, dataset, index)
+            durations.append(time.perf_counter() - request_started)
+        queries.append(len(captured))
+        statuses[response.status_code] += 1
+    return summarize(scenario.name, 'client', durations, statuses, time.perf_counter() - started, queries)
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def serve(kind='wsgi', host='127.0.0.1', port=0):
+    """Start a local server on a background thread; return (base_url, stop)"""
+    if kind == 'asgi':
+        try:
+            import uvicorn
+        except ImportError:
+            raise RuntimeError('ASGI mode needs uvicorn (pip install uvicorn)')
+        from assignment.asgi import application
+
+        import socket
+        sock = socket.socket()
+        sock.bind((host, port))
+        server = uvicorn.Server(uvicorn.Config(application, log_level='warning', lifespan='off'))
+        thread = threading.Thread(target=server.run, kwargs={'sockets': [sock]}, daemon=True)
+        thread.start()
+        while not server.started:
+            time.sleep(0.05)
+
+        def stop():
+            server.should_exit = True
+            thread.join(timeout=5)
+        return f'http://{host}:{sock.getsockname()[1]}', stop
+
+    from django.core.wsgi import get_wsgi_application
+
+    httpd = make_server(host, port, get_wsgi_application(), server_class=_ThreadingWSGIServer, handler_class=_QuietHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+
+    def stop():
+        httpd.shutdown()
+        httpd.server_close()
+    return f'http://{host}:{httpd.server_port}', stop
+
+
+def _http_headers(scenario, dataset, index, session_cookie):
+    headers = {'Content-Type': 'application/json'}
+    if scenario.role == 'admin':
+        headers['Cookie'] = session_cookie
+    else:
+        tokens = dataset.guard_tokens if scenario.role == 'guard' else dataset.member_tokens
+        headers['Authorization'] = f'Token {tokens[index % len(tokens)]}'
+    return headers
+
+
+def run_http(scenario, dataset, base_url, iterations=100, concurrency=8, warmup=5):
+    """Time scenario over HTTP with `concurrency` parallel clients"""
+    session_client = Client()
+    session_client.force_login(dataset.admin)
+    session_cookie = f"sessionid={session_client.cookies['sessionid'].value}"
+
+    def send(index):
+        payload = scenario.payload(dataset, index) if scenario.payload else None
+        data = json.dumps(payload).encode() if payload is not None else None
+        http_request = urllib_request.Request(
+            base_url + scenario.path, data=data, method=scenario.method.upper(),
+            headers=_http_headers(scenario, dataset, index, session_cookie),
+        )
+        request_started = time.perf_counter()
+        try:
+            with urllib_request.urlopen(http_request, timeout=30) as response:
+                response.read()
+                code = response.status
+        except HTTPError as e:
+            code = e.code
+        return time.perf_counter() - request_started, code
+
+    for index in range(warmup):
+        send(index)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(send, range(iterations)))
+    elapsed = time.perf_counter() - started
+    statuses = Counter(code for _, code in outcomes)
+    return summarize(scenario.name, f'http-{concurrency}', [duration for duration, _ in outcomes], statuses, elapsed)
+
+
+def check_result(result, scenario, baseline=None, tolerance=0.25):
+    """Return a list of budget/baseline violations for one scenario result"""
+    failures = []
+    if result['errors']:
+        failures.append(f"{result['errors']} requests failed: {result['status_codes']}")
+    queries = result.get('queries', {}).get('max')
+    p95 = result['latency_ms']['p95']
+    if queries is not None and scenario.max_queries is not None and queries > scenario.max_queries:
+        failures.append(f'{queries} queries per request exceeds budget of {scenario.max_queries}')
+    if result['mode'] == 'client' and scenario.p95_ms is not None and p95 is not None and p95 > scenario.p95_ms:
+        failures.append(f'p95 {p95}ms exceeds budget of {scenario.p95_ms}ms')
+    if baseline:
+        previous_queries = baseline.get('queries', {}).get('max')
+        if queries is not None and previous_queries is not None and queries > previous_queries:
+            failures.append(f'{queries} queries per request, baseline had {previous_queries}')
+        previous_p95 = baseline.get('latency_ms', {}).get('p95')
+        if p95 is not None and previous_p95 and p95 > previous_p95 * (1 + tolerance):
+            failures.append(f'p95 {p95}ms regressed more than {tolerance:.0%} from baseline {previous_p95}ms')
+    return failures
+
+
+def build_report(results, scenarios, dataset_counts, baseline_report=None, tolerance=0.25):
+    baseline = {
+        (entry['name'], entry['mode']): entry for entry in (baseline_report or {}).get('scenarios', [])
+    }
+    for result in results:
+        result['budget'] = {'max_queries': scenarios[result['name']].max_queries, 'p95_ms': scenarios[result['name']].p95_ms}
+        result['failures'] = check_result(
+            result, scenarios[result['name']], baseline.get((result['name'], result['mode'])), tolerance
+        )
+    return {
+        'generated_at': datetime.now(dt_timezone.utc).isoformat(),
+        'database': connection.vendor,
+        'dataset': dataset_counts,
+        'scenarios': results,
+        'passed': not any(result['failures'] for result in results),
+    }
+
+
+def write_report(report, path):
+    with open(path, 'w') as output:
+        json.dump(report, output, indent=2)
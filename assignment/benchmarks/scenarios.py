@@ -0,0 +1,40 @@
+"""
+Benchmark scenarios: one entry per endpoint, with its budgets.
+
+max_queries is the most SQL queries a single warm request may run; p95_ms is
+the in-process p95 latency budget. Either may be None to only record the
+value. Keep the budgets tight: the point is that a change which adds a query
+to a hot endpoint fails `manage.py benchmark`.
+"""
+from collections import namedtuple
+
+from security.qr_signing import sign_payload
+
+Scenario = namedtuple('Scenario', ['name', 'method', 'path', 'role', 'payload', 'max_queries', 'p95_ms'])
+
+
+def _guard_checkpoint(dataset, index):
+    """A signed member QR code on the route of the guard used for request index"""
+    guard = dataset.guards[index % len(dataset.guards)]
+    checkpoints = dataset.routes[guard.id]
+    return {'qr_data': sign_payload('member', checkpoints[index % len(checkpoints)])}
+
+
+SCENARIOS = [
+    Scenario('security_scan_qr', 'post', '/security/scan-qr/', 'guard', _guard_checkpoint, max_queries=3, p95_ms=50),
+    Scenario('security_validate_qr', 'post', '/security/validate-qr/', 'guard', _guard_checkpoint, max_queries=2, p95_ms=50),
+    Scenario('get_panic_alerts', 'get', '/security/panic-alerts/', 'guard', None, max_queries=1, p95_ms=50),
+    Scenario('security_scan_history', 'get', '/security/scans/', 'guard', None, max_queries=1, p95_ms=100),
+    Scenario('security_route', 'get', '/security/route/', 'guard', None, max_queries=3, p95_ms=150),
+    Scenario('member_profile', 'get', '/members/profile/', 'member', None, max_queries=0, p95_ms=30),
+    Scenario('administrator_dashboard', 'get', '/adminstrator/dashboard/', 'admin', None, max_queries=3, p95_ms=30),
+    Scenario('administrator_dashboard_list', 'get', '/adminstrator/dashboard/list/approved_members/?page=2', 'admin', None,
+             max_queries=4, p95_ms=50),
+    Scenario('subscription_statistics', 'get', '/adminstrator/subscription-statistics/', 'admin', None,
+             max_queries=6, p95_ms=60),
+    Scenario('subscription_timeseries', 'get', '/adminstrator/api/subscriptions/timeseries/?interval=week',
+             'admin', None, max_queries=4, p95_ms=30),
+    Scenario('security_compliance_dashboard', 'get', '/adminstrator/security-compliance/', 'admin', None, max_queries=6, p95_ms=200),
+]
+
+SCENARIOS_BY_NAME = {scenario.name: scenario for scenario in SCENARIOS}
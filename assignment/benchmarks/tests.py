@@ -0,0 +1,21 @@
+from django.test import TestCase
+
+from .data import generate_dataset
+from .runner import build_report, run_in_process
+from .scenarios import SCENARIOS, SCENARIOS_BY_NAME
+
+
+class BenchmarkQueryBudgetTest(TestCase):
+    """Runs every scenario on a small dataset so query-count regressions fail the test suite"""
+
+    def test_scenarios_stay_within_query_budgets(self):
+        dataset = generate_dataset(guards=3, members=20, checkpoints_per_route=5, months=1, scans_per_guard_day=2)
+        results = [run_in_process(scenario, dataset, iterations=6) for scenario in SCENARIOS]
+        report = build_report(results, SCENARIOS_BY_NAME, dataset.counts)
+
+        for result in report['scenarios']:
+            with self.subTest(scenario=result['name']):
+                self.assertEqual(result['errors'], 0, result['status_codes'])
+                budget = result['budget']['max_queries']
+                if budget is not None:
+                    self.assertLessEqual(result['queries']['max'], budget)
@@ -0,0 +1,92 @@
+"""
+Concurrent scan write throughput.
+
+run_scan_writes() has `threads` guards post checkpoint scans at the same time,
+each scan being what security_scan_qr writes: a ScanLog row plus the compliance
+increment, in one transaction. It reports committed scans per second, commit
+latency, and how many transactions failed with "database is locked", and
+checks that no compliance increment was lost.
+
+SQLITE_MODES are the SQLite connection settings the `benchmark_writes` command
+compares: Django's stock rollback journal against the tuned pragmas in
+assignment/database.py.
+"""
+import threading
+import time
+from datetime import date
+
+from django.db import OperationalError, connection, transaction
+from django.db.models import Sum
+
+from adminstrator.compliance_counters import record_checkpoint_scans
+from adminstrator.models import SecurityCompliance
+from security.models import ScanLog
+
+from .runner import percentile
+
+SQLITE_MODES = {
+    # What an untuned connection from Python's sqlite3 module does: rollback
+    # journal, fsync per commit, and the module's stock 5 second lock wait
+    # (this project's connections wait SQLITE_LOCK_TIMEOUT_SECONDS)
+    'default': {'journal_mode': 'DELETE', 'synchronous': 'FULL', 'busy_timeout': 5000},
+    'tuned': None,  # settings.SQLITE_PRAGMAS
+}
+
+
+def run_scan_writes(dataset, threads=8, scans_per_thread=200):
+    """Write scans from `threads` guards concurrently; return a result dict"""
+    today = date.today()
+    guards = [dataset.guards[index % len(dataset.guards)] for index in range(threads)]
+    before = SecurityCompliance.objects.filter(date=today).aggregate(total=Sum('patrols_completed'))['total'] or 0
+    lock = threading.Lock()
+    durations, counts = [], {'committed': 0, 'locked': 0, 'errors': 0}
+    barrier = threading.Barrier(threads)
+
+    def worker(guard):
+        checkpoints = dataset.routes[guard.id]
+        local_durations, local = [], {'committed': 0, 'locked': 0, 'errors': 0}
+        try:
+            barrier.wait()
+            for number in range(scans_per_thread):
+                member_id = checkpoints[number % len(checkpoints)]
+                started = time.perf_counter()
+                try:
+                    with transaction.atomic():
+                        ScanLog.objects.create(security_guard_id=guard.id, qr_data=f'member:{member_id}',
+                                               location=f'{member_id} Bench Street')
+                        record_checkpoint_scans(guard.id, today)
+                except OperationalError as e:
+                    local['locked' if 'locked' in str(e) else 'errors'] += 1
+                    continue
+                local_durations.append(time.perf_counter() - started)
+                local['committed'] += 1
+        finally:
+            connection.close()
+            with lock:
+                durations.extend(local_durations)
+                for key, value in local.items():
+                    counts[key] += value
+
+    workers = [threading.Thread(target=worker, args=(guard,)) for guard in guards]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    after = SecurityCompliance.objects.filter(date=today).aggregate(total=Sum('patrols_completed'))['total'] or 0
+    ms = [duration * 1000 for duration in durations]
+    return {
+        'database': connection.vendor,
+        'threads': threads,
+        'attempted': threads * scans_per_thread,
+        **counts,
+        'lost_increments': counts['committed'] - (after - before),
+        'throughput_scans_per_s': round(counts['committed'] / elapsed, 1) if elapsed else None,
+        'commit_latency_ms': {
+            'p50': round(percentile(ms, 0.50), 3) if ms else None,
+            'p95': round(percentile(ms, 0.95), 3) if ms else None,
+            'max': round(max(ms), 3) if ms else None,
+        },
+    }
@@ -1,55 +1,43 @@
-import qrcode
-import os
-from io import BytesIO
 from django.core.management.base import BaseCommand
-from django.core.files.base import ContentFile
-from django.conf import settings
 from members.models import UserProfile
+from members.qr import bulk_generate_qr_codes
+from security.qr_signing import active_key
 
 
 class Command(BaseCommand):
-    help = 'Generate QR codes for approved members that don\'t have them'
+    help = 'Generate QR codes for approved members that don\'t have them, or re-sign them with --reissue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help='Processes used to render PNGs (default: 1, no pool)')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Members rendered and saved per bulk update')
+        parser.add_argument('--reissue', action='store_true',
+                            help='Also re-sign codes not signed with the active QR key, e.g. after a key rotation')
 
     def handle(self, *args, **options):
-        approved_members_without_qr = UserProfile.objects.filter(
-            status='approved',
-            qr_code_data__exact=''
+        members = UserProfile.objects.filter(status='approved')
+        if options['reissue']:
+            members = members.exclude(qr_code_data__contains=f'.{active_key().id}.')
+        else:
+            members = members.filter(qr_code_data__exact='')
+
+        def report(done, total, elapsed):
+            rate = done / elapsed if elapsed else 0
+            remaining = (total - done) / rate if rate else 0
+            self.stdout.write(f'{done}/{total} members ({rate:.1f}/s, ~{remaining:.0f}s remaining)')
+
+        total = bulk_generate_qr_codes(
+            members,
+            payload_prefix='member',
+            extra_fields={'qr_status': 'ready'},
+            workers=options['workers'],
+            chunk_size=options['chunk_size'],
+            progress=report,
         )
 
-        if not approved_members_without_qr.exists():
+        if not total:
             self.stdout.write(self.style.SUCCESS('All approved members already have QR codes!'))
             return
 
-        self.stdout.write(f'Generating QR codes for {approved_members_without_qr.count()} approved members...')
-
-        for member in approved_members_without_qr:
-            # Generate QR code data
-            qr_data = f"member:{member.id}"
-
-            # Create QR code
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.ERROR_CORRECT_L,
-                box_size=10,
-                border=4,
-            )
-            qr.add_data(qr_data)
-            qr.make(fit=True)
-
-            # Create QR code image
-            img = qr.make_image(fill_color="black", back_color="white")
-
-            # Save to BytesIO
-            buffer = BytesIO()
-            img.save(buffer, 'PNG')
-            buffer.seek(0)
-
-            # Save to model
-            filename = f'qr_member_{member.id}.png'
-            member.qr_code.save(filename, ContentFile(buffer.getvalue()), save=False)
-            member.qr_code_data = qr_data
-            member.save()
-
-            self.stdout.write(f'Generated QR code for member {member.full_name} - {member.address}')
-
-        self.stdout.write(self.style.SUCCESS(f'Successfully generated QR codes for {approved_members_without_qr.count()} approved members!'))
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS(f'Successfully generated QR codes for {total} approved members!'))
+        if options['reissue']:
+            self.stdout.write('Run prune_qr_images to delete the images the re-signed codes replaced.')
@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from members.qr import prune_qr_images
+
+
+class Command(BaseCommand):
+    help = 'Delete cached QR images that no member or house uses any more, e.g. after --reissue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age-hours', type=float, default=24,
+                            help='Keep unused images newer than this, in case a render is still saving (default: 24)')
+        parser.add_argument('--dry-run', action='store_true', help='List the images that would be deleted')
+
+    def handle(self, *args, **options):
+        removed = prune_qr_images(timedelta(hours=options['min_age_hours']), dry_run=options['dry_run'])
+        if options['dry_run']:
+            for name in removed:
+                self.stdout.write(name)
+            self.stdout.write(self.style.SUCCESS(f'{len(removed)} unused QR images would be deleted'))
+            return
+        self.stdout.write(self.style.SUCCESS(f'Deleted {len(removed)} unused QR images!'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from members.models import UserProfile
+from members.qr import render_member_qr
+
+
+class Command(BaseCommand):
+    help = 'Re-render member QR images whose background render failed'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--include-pending',
+            action='store_true',
+            help='Also render profiles still marked pending (e.g. after a worker restart)',
+        )
+
+    def handle(self, *args, **options):
+        statuses = ['failed', 'pending'] if options['include_pending'] else ['failed']
+        profile_ids = list(
+            UserProfile.objects.filter(qr_status__in=statuses).exclude(qr_code_data='').values_list('id', flat=True)
+        )
+
+        if not profile_ids:
+            self.stdout.write(self.style.SUCCESS('No member QR codes need rendering!'))
+            return
+
+        self.stdout.write(f'Rendering QR codes for {len(profile_ids)} members...')
+        rendered = sum(1 for profile_id in profile_ids if render_member_qr(profile_id))
+        self.stdout.write(self.style.SUCCESS(f'Rendered {rendered} of {len(profile_ids)} member QR codes!'))
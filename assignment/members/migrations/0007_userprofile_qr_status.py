@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:16
+
+from django.db import migrations, models
+
+
+def mark_existing_qr_codes_ready(apps, schema_editor):
+    UserProfile = apps.get_model('members', 'UserProfile')
+    UserProfile.objects.exclude(qr_code='').exclude(qr_code__isnull=True).update(qr_status='ready')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0006_add_qr_code_data'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='qr_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='qr_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', help_text='State of the background QR image render', max_length=10),
+        ),
+        migrations.RunPython(mark_existing_qr_codes_ready, migrations.RunPython.noop),
+    ]
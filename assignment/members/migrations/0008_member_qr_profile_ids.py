@@ -0,0 +1,43 @@
+from django.db import migrations
+from django.db.models import Q
+
+
+def _signed_for(profile_id, payload):
+    from security.qr_signing import is_signed
+
+    return payload.startswith(f'member:{profile_id}.') and is_signed(payload.split(':', 1)[1])
+
+
+def use_profile_ids(apps, schema_editor):
+    """Re-issue member codes from before scans resolved signed member:<profile id> payloads.
+
+    Signup used to render member:<user id> into qr_<user id>.png and leave
+    qr_code_data empty (migration 0007 then marked those images ready), and
+    later rows may hold unsigned member:<id> data. Every profile with an image
+    or data that is not its own signed payload gets one, and its image is
+    cleared and set back to pending so the old code is no longer shown.
+    """
+    from security.qr_signing import sign_payload
+
+    UserProfile = apps.get_model('members', 'UserProfile')
+    candidates = UserProfile.objects.filter(
+        (Q(qr_code__isnull=False) & ~Q(qr_code='')) | ~Q(qr_code_data='')
+    ).only('id', 'qr_code', 'qr_code_data')
+    stale = [profile for profile in candidates if not _signed_for(profile.id, profile.qr_code_data)]
+    for profile in stale:
+        profile.qr_code_data = sign_payload('member', profile.id)
+        profile.qr_code = ''
+        # Re-rendered by `manage.py retry_member_qr --include-pending`
+        profile.qr_status = 'pending'
+    UserProfile.objects.bulk_update(stale, ['qr_code_data', 'qr_code', 'qr_status'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0007_userprofile_qr_status'),
+    ]
+
+    operations = [
+        migrations.RunPython(use_profile_ids, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0008_member_qr_profile_ids'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='latitude',
+            field=models.FloatField(blank=True, help_text='Checkpoint position used for scan geofencing', null=True),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -30,6 +30,12 @@ class UserProfile(models.Model):
         ('rejected', 'Rejected'),
     ]
 
+    QR_STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     full_name = models.CharField(max_length=100)
     phone = models.CharField(max_length=15)
@@ -38,6 +44,10 @@ class UserProfile(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     qr_code = models.ImageField(upload_to='qr_codes/', blank=True, null=True)
     qr_code_data = models.TextField(blank=True, help_text="QR code data string for scanning")
+    qr_status = models.CharField(max_length=10, choices=QR_STATUS_CHOICES, default='pending', help_text="State of the background QR image render")
+    qr_attempts = models.PositiveSmallIntegerField(default=0)
+    latitude = models.FloatField(null=True, blank=True, help_text="Checkpoint position used for scan geofencing")
+    longitude = models.FloatField(null=True, blank=True)
     
     def __str__(self):
         return f"{self.full_name} ({self.user.email})"
\ No newline at end of file
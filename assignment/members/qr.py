@@ -0,0 +1,301 @@
+"""
+QR code rendering for member and house checkpoints.
+
+Member signup no longer renders its QR image inside the request: the profile is
+saved with qr_code_data and qr_status='pending', and render_member_qr runs on a
+bounded background thread pool once the signup transaction commits. Failed
+renders are retried up to QR_RENDER_MAX_ATTEMPTS times and can be re-queued
+with the retry_member_qr management command.
+
+bulk_generate_qr_codes backs the generate_member_qr and generate_house_qr
+management commands. Payloads are signed with the active QR key (see
+security/qr_signing.py).
+
+QR payloads are deterministic, so images are content-addressed: qr_cache_key()
+hashes the payload with the render parameters, each image is written once to
+QR_CACHE_DIR/<key[:2]>/<key>.png in the default storage, and recently used
+images are kept in an in-memory LRU. Profiles and houses point their qr_code
+field at the shared file instead of storing their own copy, so re-signing a code
+leaves its old image behind; prune_qr_images (the prune_qr_images management
+command) deletes the images no row uses any more.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from io import BytesIO
+
+import qrcode
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# Bump when the rendering code changes output for the same parameters
+QR_RENDER_VERSION = 1
+DEFAULT_RENDER_PARAMS = {'box_size': 10, 'border': 4}
+
+
+def render_qr_png(data, box_size=10, border=4):
+    """Render QR data to PNG bytes"""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=box_size,
+        border=border,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+
+    img = qr.make_image(fill_color='black', back_color='white')
+    buffer = BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def qr_cache_key(payload, box_size=10, border=4):
+    """Content address of the PNG rendered for payload with the given parameters"""
+    material = f"v{QR_RENDER_VERSION}|{box_size}|{border}|{payload}"
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def qr_cache_name(key):
+    cache_dir = getattr(settings, 'QR_CACHE_DIR', 'qr_cache')
+    return f"{cache_dir}/{key[:2]}/{key}.png"
+
+
+class QRImageCache:
+    """Bounded LRU of rendered PNG bytes in front of the on-disk content-addressed store"""
+
+    def __init__(self, max_entries=None):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.renders = 0
+
+    @property
+    def max_entries(self):
+        return self._max_entries or getattr(settings, 'QR_CACHE_MAX_ENTRIES', 1024)
+
+    def _remember(self, key, png):
+        with self._lock:
+            self._entries[key] = png
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, payload, **params):
+        """Return (key, png bytes) for payload, rendering and storing it only if never seen"""
+        params = {**DEFAULT_RENDER_PARAMS, **params}
+        key = qr_cache_key(payload, **params)
+        with self._lock:
+            png = self._entries.get(key)
+            if png is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return key, png
+            self.misses += 1
+
+        name = qr_cache_name(key)
+        if default_storage.exists(name):
+            with default_storage.open(name, 'rb') as stored:
+                png = stored.read()
+        else:
+            png = render_qr_png(payload, **params)
+            self.renders += 1
+            store_png(key, png)
+        self._remember(key, png)
+        return key, png
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.renders = 0
+
+
+qr_image_cache = QRImageCache()
+
+
+def store_png(key, png):
+    """Write PNG bytes to the content-addressed store unless already present; return the storage name"""
+    name = qr_cache_name(key)
+    if not default_storage.exists(name):
+        saved = default_storage.save(name, ContentFile(png))
+        if saved != name:
+            # Another writer stored the same content concurrently; keep the canonical file
+            default_storage.delete(saved)
+    return name
+
+
+def qr_image_name(payload, **params):
+    """Storage name of the cached image for payload, rendering it on first use"""
+    key, _ = qr_image_cache.get(payload, **params)
+    return qr_cache_name(key)
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'QR_RENDER_WORKERS', 2),
+                thread_name_prefix='qr-render',
+            )
+        return _executor
+
+
+def render_member_qr(profile_id):
+    """Render and store the QR image for a UserProfile, recording the outcome in qr_status"""
+    from .models import UserProfile
+
+    try:
+        profile = UserProfile.objects.get(id=profile_id)
+        profile.qr_code.name = qr_image_name(profile.qr_code_data)
+        profile.qr_status = 'ready'
+        profile.save(update_fields=['qr_code', 'qr_status'])
+        logger.debug("QR code generated for profile %s", profile_id)
+        return True
+    except UserProfile.DoesNotExist:
+        logger.warning("QR render skipped, profile %s no longer exists", profile_id)
+        return False
+    except Exception:
+        logger.exception("QR render failed for profile %s", profile_id)
+        UserProfile.objects.filter(id=profile_id).update(qr_status='failed')
+        return False
+
+
+def _render_in_background(profile_id):
+    from django.db.models import F
+    from .models import UserProfile
+
+    close_old_connections()
+    try:
+        UserProfile.objects.filter(id=profile_id).update(qr_attempts=F('qr_attempts') + 1)
+        if not render_member_qr(profile_id):
+            attempts = UserProfile.objects.filter(id=profile_id, qr_status='failed').values_list('qr_attempts', flat=True).first()
+            if attempts is not None and attempts < getattr(settings, 'QR_RENDER_MAX_ATTEMPTS', 3):
+                get_executor().submit(_render_in_background, profile_id)
+    finally:
+        close_old_connections()
+
+
+def enqueue_member_qr(profile_id):
+    """Render a member's QR image after the current transaction commits"""
+    if getattr(settings, 'QR_RENDER_ASYNC', True):
+        transaction.on_commit(lambda: get_executor().submit(_render_in_background, profile_id))
+    else:
+        transaction.on_commit(lambda: render_member_qr(profile_id))
+
+
+def bulk_generate_qr_codes(queryset, payload_prefix, extra_fields=None,
+                           workers=1, chunk_size=500, progress=None):
+    """Point every row in queryset at its cached QR image, one chunk at a time.
+
+    Images missing from the content-addressed store are rendered in a process
+    pool of `workers` processes and written with the same number of threads;
+    each chunk is persisted with a single bulk_update. queryset should select
+    rows still missing qr_code_data, or for a key rotation rows not yet signed
+    with the active key, so a re-run after an interruption resumes with the
+    chunks that never committed. progress(done, total, elapsed) is called
+    after each chunk.
+    """
+    from security.qr_signing import active_key, sign_payload
+
+    model = queryset.model
+    extra_fields = extra_fields or {}
+    update_fields = ['qr_code', 'qr_code_data', *extra_fields]
+    ids = list(queryset.order_by('id').values_list('id', flat=True))
+    total = len(ids)
+    started = time.monotonic()
+    key, issued_at = active_key(), int(time.time())
+
+    render_pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    write_pool = ThreadPoolExecutor(max_workers=max(1, workers))
+    try:
+        for start in range(0, total, chunk_size):
+            chunk = ids[start:start + chunk_size]
+            payloads = [sign_payload(payload_prefix, row_id, issued_at, key) for row_id in chunk]
+            keys = [qr_cache_key(payload, **DEFAULT_RENDER_PARAMS) for payload in payloads]
+
+            # Only images that were never rendered before need CPU time
+            missing = [
+                (key, payload) for key, payload, present in zip(
+                    keys, payloads, write_pool.map(default_storage.exists, map(qr_cache_name, keys))
+                ) if not present
+            ]
+            if missing:
+                missing_payloads = [payload for _, payload in missing]
+                if render_pool:
+                    pngs = list(render_pool.map(
+                        render_qr_png, missing_payloads, chunksize=max(1, len(missing) // (workers * 4))
+                    ))
+                else:
+                    pngs = [render_qr_png(payload) for payload in missing_payloads]
+                list(write_pool.map(store_png, [key for key, _ in missing], pngs))
+
+            rows = [
+                model(id=row_id, qr_code=qr_cache_name(key), qr_code_data=payload, **extra_fields)
+                for row_id, payload, key in zip(chunk, payloads, keys)
+            ]
+            model.objects.bulk_update(rows, update_fields)
+
+            if progress:
+                progress(min(start + chunk_size, total), total, time.monotonic() - started)
+    finally:
+        if render_pool:
+            render_pool.shutdown()
+        write_pool.shutdown()
+    return total
+
+
+def _stored_files(directory):
+    """Storage names of every file under directory"""
+    if not default_storage.exists(directory):
+        return
+    subdirectories, files = default_storage.listdir(directory)
+    for name in files:
+        yield f"{directory}/{name}"
+    for subdirectory in subdirectories:
+        yield from _stored_files(f"{directory}/{subdirectory}")
+
+
+def prune_qr_images(min_age=timedelta(hours=24), dry_run=False):
+    """Delete QR images no profile or house points at; return the storage names removed.
+
+    An image also counts as used while a row's qr_code_data would render to it,
+    so pending renders keep theirs. Files newer than min_age are left alone, as
+    a render may have stored one that its row is not yet saved with.
+    """
+    from adminstrator.models import House
+    from .models import UserProfile
+
+    used = set()
+    for model in (UserProfile, House):
+        for name, payload in model.objects.values_list('qr_code', 'qr_code_data').iterator():
+            if name:
+                used.add(name)
+            if payload:
+                used.add(qr_cache_name(qr_cache_key(payload, **DEFAULT_RENDER_PARAMS)))
+
+    cutoff = timezone.now() - min_age
+    removed = []
+    # Content-addressed images, plus per-row images written before the shared store existed
+    for directory in (getattr(settings, 'QR_CACHE_DIR', 'qr_cache'), 'qr_codes'):
+        for name in list(_stored_files(directory)):
+            if name in used or default_storage.get_modified_time(name) > cutoff:
+                continue
+            if not dry_run:
+                default_storage.delete(name)
+            removed.append(name)
+    return removed
@@ -1,8 +1,10 @@
-from django.test import TestCase
+import tempfile
+from django.test import TestCase, override_settings
 from django.contrib.auth.models import User
 from rest_framework.test import APITestCase
 from rest_framework import status
 from .models import UserProfile
+from security.qr_signing import verify_payload
 
 class MemberAPITestCase(APITestCase):
     def test_signup_success(self):
@@ -20,6 +22,30 @@ class MemberAPITestCase(APITestCase):
         user = User.objects.get(email='test@example.com')
         self.assertTrue(UserProfile.objects.filter(user=user).exists())
 
+    @override_settings(QR_RENDER_ASYNC=False, MEDIA_ROOT=tempfile.mkdtemp())
+    def test_signup_renders_qr_after_commit(self):
+        data = {
+            'email': 'qr@example.com',
+            'password': 'testpass123',
+            'full_name': 'QR User',
+            'phone': '1234567890',
+            'address': '123 Test St'
+        }
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            response = self.client.post('/members/signup/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['qr_status'], 'pending')
+
+        profile = UserProfile.objects.get(user__email='qr@example.com')
+        self.assertEqual(verify_payload('member', profile.qr_code_data.split(':', 1)[1]), str(profile.id))
+        self.assertFalse(profile.qr_code)
+
+        for callback in callbacks:
+            callback()
+        profile.refresh_from_db()
+        self.assertEqual(profile.qr_status, 'ready')
+        self.assertTrue(profile.qr_code.name.endswith('.png'))
+
     def test_signup_duplicate_email(self):
         User.objects.create_user(username='test@example.com', email='test@example.com', password='pass')
         data = {
@@ -49,3 +75,33 @@ class MemberAPITestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertTrue(response.data['success'])
         self.assertIn('token', response.data)
+
+
+class MemberQRProfileIdMigrationTest(TestCase):
+    def test_signup_era_codes_are_reissued_for_the_profile(self):
+        from importlib import import_module
+        from django.apps import apps
+        from security.qr_signing import sign_payload
+
+        migration = import_module('members.migrations.0008_member_qr_profile_ids')
+        # Signup-era rows: an image holding member:<user id> and no qr_code_data
+        users = [User.objects.create_user(username=f'legacy{index}@test.com', password='pass') for index in range(3)]
+        legacy = [
+            UserProfile.objects.create(user=user, full_name=f'Legacy {index}', phone='1', address='1 Rd',
+                                       qr_code=f'qr_codes/qr_{user.id}.png', qr_status='ready')
+            for index, user in enumerate(users[:2])
+        ]
+        current = UserProfile.objects.create(user=users[2], full_name='Current', phone='1', address='1 Rd')
+        UserProfile.objects.filter(id=current.id).update(
+            qr_code='qr_cache/ab/current.png', qr_code_data=sign_payload('member', current.id), qr_status='ready'
+        )
+        current.refresh_from_db()
+
+        migration.use_profile_ids(apps, None)
+
+        for profile in legacy:
+            profile.refresh_from_db()
+            self.assertEqual(verify_payload('member', profile.qr_code_data.split(':', 1)[1]), str(profile.id))
+            self.assertEqual((profile.qr_code.name, profile.qr_status), ('', 'pending'))
+        unchanged = UserProfile.objects.get(id=current.id)
+        self.assertEqual((unchanged.qr_code_data, unchanged.qr_status), (current.qr_code_data, 'ready'))
@@ -6,6 +6,7 @@ app_name = 'members'
 urlpatterns = [
     path('signup/', views.signup, name='signup'),
     path('login/', views.login, name='login'),
+    path('logout/', views.logout, name='logout'),
     path('profile/', views.get_profile, name='get_profile'),
     path('forum/', views.forum, name='forum'),
     path('patrol-stats/', views.patrol_stats, name='patrol_stats'),
@@ -1,16 +1,23 @@
 import logging
-import qrcode
-from io import BytesIO
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.authtoken.models import Token
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
-from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
 from datetime import date, timedelta
 from .models import UserProfile, PanicAlert
+from .qr import enqueue_member_qr
 from adminstrator.models import Subscription, House
+from adminstrator import subscription_analytics
+from adminstrator.dashboard_summary import dashboard_summary
+from security.alert_hub import alert_hub, alert_payload
+from security.permissions import IsApprovedMember
+from security.qr_signing import sign_payload
+from security.replicas import replica_reads
 
 # --- Setup logger ---
 logger = logging.getLogger(__name__)
@@ -21,16 +28,16 @@ def signup(request):
     logger.info("Signup attempt received.")
     try:
         data = request.data
-        logger.debug(f"Signup data received: {data}")
+        logger.debug("Signup fields received: %s", sorted(data))
 
         required_fields = ['email', 'password', 'full_name', 'phone', 'address']
         for field in required_fields:
             if field not in data or not data[field]:
-                logger.warning(f"Missing required field: {field}")
+                logger.warning("Missing required field: %s", field)
                 return Response({'errors': f'{field} is required'}, status=status.HTTP_400_BAD_REQUEST)
         
         if User.objects.filter(email=data['email']).exists():
-            logger.warning(f"Duplicate signup attempt for email: {data['email']}")
+            logger.warning("Duplicate signup attempt for email: %s", data['email'])
             return Response({'errors': 'Email already exists'}, status=status.HTTP_400_BAD_REQUEST)
         
         user = User.objects.create_user(
@@ -38,39 +45,29 @@ def signup(request):
             email=data['email'],
             password=data['password']
         )
-        logger.info(f"User created successfully: {user.email}")
+        logger.info("User created successfully: %s", user.email)
 
         profile = UserProfile.objects.create(
             user=user,
             full_name=data['full_name'],
             phone=data['phone'],
-            address=data['address']
+            address=data['address'],
+            qr_status='pending'
         )
-        logger.debug(f"Profile created for {user.email}")
-
-        # Generate QR code
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(f"member:{user.id}")
-        qr.make(fit=True)
-
-        img = qr.make_image(fill='black', back_color='white')
-        buffer = BytesIO()
-        img.save(buffer, format='PNG')
-        buffer.seek(0)
+        # Member QR payloads carry the signed profile id, which the scan endpoints resolve
+        profile.qr_code_data = sign_payload('member', profile.id)
+        profile.save(update_fields=['qr_code_data'])
+        logger.debug("Profile created for %s", user.email)
 
-        profile.qr_code.save(f"qr_{user.id}.png", File(buffer), save=True)
-        logger.debug(f"QR code generated for {user.email}")
+        # QR image is rendered in the background once the signup commits
+        enqueue_member_qr(profile.id)
 
         return Response({
             'success': True,
             'message': 'User registered successfully. Awaiting admin approval.',
             'user_id': user.id,
-            'qr_code_url': profile.qr_code.url if profile.qr_code else None
+            'qr_code_url': None,
+            'qr_status': profile.qr_status
         }, status=status.HTTP_201_CREATED)
     except Exception as e:
         logger.exception("Error during signup")
@@ -84,7 +81,7 @@ def login(request):
     try:
         email = request.data.get('email')
         password = request.data.get('password')
-        logger.debug(f"Login credentials: {email}")
+        logger.debug("Login credentials: %s", email)
 
         if not email or not password:
             logger.warning("Missing email or password")
@@ -93,16 +90,16 @@ def login(request):
         try:
             user = User.objects.get(email=email)
         except User.DoesNotExist:
-            logger.warning(f"Invalid login attempt for email: {email}")
+            logger.warning("Invalid login attempt for email: %s", email)
             return Response({'errors': 'Invalid email or password'}, status=status.HTTP_401_UNAUTHORIZED)
         
         user = authenticate(username=user.username, password=password)
         if user is not None:
-            logger.info(f"User authenticated: {email}")
+            logger.info("User authenticated: %s", email)
             try:
                 profile = user.userprofile
                 if profile.status != 'approved':
-                    logger.warning(f"User {email} account status: {profile.status}")
+                    logger.warning("User %s account status: %s", email, profile.status)
                     if profile.status == 'pending':
                         return Response({'errors': 'Account pending admin approval'}, status=status.HTTP_403_FORBIDDEN)
                     elif profile.status == 'rejected':
@@ -112,7 +109,7 @@ def login(request):
                 
                 from rest_framework.authtoken.models import Token
                 token, created = Token.objects.get_or_create(user=user)
-                logger.debug(f"Token generated for {email}")
+                logger.debug("Token generated for %s", email)
 
                 return Response({
                     'success': True,
@@ -123,20 +120,30 @@ def login(request):
                     }
                 })
             except UserProfile.DoesNotExist:
-                logger.error(f"UserProfile not found for {email}")
+                logger.error("UserProfile not found for %s", email)
                 return Response({'errors': 'User profile not found'}, status=status.HTTP_404_NOT_FOUND)
         else:
-            logger.warning(f"Authentication failed for {email}")
+            logger.warning("Authentication failed for %s", email)
             return Response({'errors': 'Invalid email or password'}, status=status.HTTP_401_UNAUTHORIZED)
     except Exception as e:
         logger.exception("Error during login")
         return Response({'errors': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def logout(request):
+    """Revoke the caller's token; deleting it also evicts it from the auth cache"""
+    logger.info("Logout requested by %s", request.user.email)
+    if isinstance(request.auth, Token):
+        request.auth.delete()
+    return Response({'success': True})
+
+
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
 def forum(request):
-    logger.info(f"Forum endpoint hit with {request.method} by {request.user.email}")
+    logger.info("Forum endpoint hit with %s by %s", request.method, request.user.email)
     if request.method == 'GET':
         posts = [
             {'id': 1, 'user': {'email': 'user1@example.com'}, 'content': 'Welcome to the community forum!', 'likes': 5, 'time': '2 hours ago'},
@@ -149,32 +156,33 @@ def forum(request):
             logger.warning("Post creation attempted with no content")
             return Response({'errors': 'Content is required'}, status=status.HTTP_400_BAD_REQUEST)
         new_post = {'id': 3, 'user': {'email': request.user.email}, 'content': content, 'likes': 0, 'time': 'Just now'}
-        logger.debug(f"New forum post created: {new_post}")
+        logger.debug("New forum post created: %s", new_post)
         return Response(new_post, status=status.HTTP_201_CREATED)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def patrol_stats(request):
-    logger.info(f"Patrol stats requested by {request.user.email}")
+    logger.info("Patrol stats requested by %s", request.user.email)
     stats = {'completed': 12, 'response_time': '4.2 min', 'coverage': 85, 'incidents': 2}
     return Response(stats, status=200)
 
 
 @api_view(['POST'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsApprovedMember])
 def panic(request):
-    logger.warning(f"Emergency alert triggered by {request.user.email}")
+    logger.warning("Emergency alert triggered by %s", request.user.email)
     try:
         # Create panic alert
         alert = PanicAlert.objects.create(
             member=request.user,
-            address=request.user.userprofile.address
+            address=request.role.member_profile.address
         )
-        logger.info(f"Panic alert created: {alert.id}")
+        logger.info("Panic alert created: %s", alert.id)
 
-        # TODO: Implement notification to security members
-        # For now, just log and return success
+        # Push to guards connected to security/panic-alerts/stream/ once the alert is committed
+        payload = alert_payload(alert, member=request.user)
+        transaction.on_commit(lambda: alert_hub.publish('panic_created', payload))
 
         return Response({
             'success': True,
@@ -182,13 +190,13 @@ def panic(request):
             'alert_id': alert.id
         }, status=200)
     except Exception as e:
-        logger.exception(f"Error creating panic alert for {request.user.email}")
+        logger.exception("Error creating panic alert for %s", request.user.email)
         return Response({'errors': 'Failed to trigger emergency alert'}, status=500)
 
 
 @api_view(['POST'])
 def pay_subscription(request):
-    logger.info(f"Subscription payment attempt by {request.user.email}")
+    logger.info("Subscription payment attempt received.")
     try:
         data = request.data
         subscription_type = data.get('subscription_type', 'premium')
@@ -209,7 +217,7 @@ def pay_subscription(request):
 
         # Validate subscription type
         if subscription_type not in ['basic', 'premium', 'enterprise']:
-            logger.warning(f"Invalid subscription type: {subscription_type}")
+            logger.warning("Invalid subscription type: %s", subscription_type)
             return Response({'errors': 'Invalid subscription type'}, status=status.HTTP_400_BAD_REQUEST)
 
         # Check if user already has an active subscription
@@ -219,7 +227,7 @@ def pay_subscription(request):
         ).first()
 
         if existing_subscription:
-            logger.warning(f"User {user.email} already has an active subscription")
+            logger.warning("User %s already has an active subscription", user.email)
             return Response({'errors': 'You already have an active subscription'}, status=status.HTTP_400_BAD_REQUEST)
 
         # Get user's house (assuming they have one, or create a default)
@@ -236,38 +244,9 @@ def pay_subscription(request):
                     square_footage=1000,
                     property_type='house'
                 )
-                logger.info(f"Created default house for {user.email}")
+                logger.info("Created default house for %s", user.email)
         except Exception as e:
-            logger.error(f"Error getting/creating house for {user.email}: {e}")
-            return Response({'errors': 'Unable to process subscription'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-        # Create subscription
-        subscription = Subscription.objects.create(
-            user=user,
-            status__in=['active', 'pending']
-        ).first()
-
-        if existing_subscription:
-            logger.warning(f"User {request.user.email} already has an active subscription")
-            return Response({'errors': 'You already have an active subscription'}, status=status.HTTP_400_BAD_REQUEST)
-
-        # Get user's house (assuming they have one, or create a default)
-        try:
-            house = House.objects.filter(owner=request.user).first()
-            if not house:
-                # Create a default house if none exists
-                house = House.objects.create(
-                    address=request.user.userprofile.address,
-                    owner=request.user,
-                    house_number=f"USER_{request.user.id}",
-                    bedrooms=1,
-                    bathrooms=1,
-                    square_footage=1000,
-                    property_type='house'
-                )
-                logger.info(f"Created default house for {request.user.email}")
-        except Exception as e:
-            logger.error(f"Error getting/creating house for {request.user.email}: {e}")
+            logger.error("Error getting/creating house for %s: %s", user.email, e)
             return Response({'errors': 'Unable to process subscription'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         # Calculate subscription dates
@@ -283,17 +262,19 @@ def pay_subscription(request):
             monthly_fee = 500
 
         # Create subscription
-        subscription = Subscription.objects.create(
-            user=request.user,
-            house=house,
-            subscription_type=subscription_type,
-            status='active',
-            start_date=start_date,
-            end_date=end_date,
-            monthly_fee=monthly_fee
-        )
-
-        logger.info(f"Subscription created for {request.user.email}: {subscription_type}")
+        with transaction.atomic():
+            subscription = Subscription.objects.create(
+                user=user,
+                house=house,
+                subscription_type=subscription_type,
+                status='active',
+                start_date=start_date,
+                end_date=end_date,
+                monthly_fee=monthly_fee
+            )
+            subscription_analytics.record_new(subscription)
+
+        logger.info("Subscription created for %s: %s", user.email, subscription_type)
         return Response({
             'success': True,
             'message': 'Subscription activated successfully',
@@ -308,36 +289,34 @@ def pay_subscription(request):
         }, status=status.HTTP_201_CREATED)
 
     except Exception as e:
-        logger.exception(f"Error processing subscription payment for {request.user.email}")
+        logger.exception("Error processing subscription payment for %s", request.data.get('email'))
         return Response({'errors': f'Payment processing failed: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
 @api_view(['GET'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsApprovedMember])
 def get_profile(request):
-    logger.info(f"Profile requested by {request.user.email}")
-    try:
-        profile = request.user.userprofile
-        return Response({
-            'user': {
-                'id': request.user.id,
-                'email': request.user.email,
-                'full_name': profile.full_name,
-                'phone': profile.phone,
-                'address': profile.address,
-                'status': profile.status,
-                'qr_code_url': profile.qr_code.url if profile.qr_code else None
-            }
-        })
-    except UserProfile.DoesNotExist:
-        logger.error(f"Profile not found for {request.user.email}")
-        return Response({'errors': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
-
-
+    logger.info("Profile requested by %s", request.user.email)
+    profile = request.role.member_profile
+    return Response({
+        'user': {
+            'id': request.user.id,
+            'email': request.user.email,
+            'full_name': profile.full_name,
+            'phone': profile.phone,
+            'address': profile.address,
+            'status': profile.status,
+            'qr_code_url': profile.qr_code.url if profile.qr_code else None,
+            'qr_status': profile.qr_status
+        }
+    })
+
+
+@replica_reads
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_subscription(request):
-    logger.info(f"Subscription status requested by {request.user.email}")
+    logger.info("Subscription status requested by %s", request.user.email)
     try:
         subscription = Subscription.objects.filter(user=request.user).order_by('-created_at').first()
 
@@ -362,30 +341,39 @@ def get_subscription(request):
         }, status=status.HTTP_200_OK)
 
     except Exception as e:
-        logger.exception(f"Error getting subscription for {request.user.email}")
+        logger.exception("Error getting subscription for %s", request.user.email)
         return Response({'errors': f'Failed to get subscription: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def cancel_subscription(request):
-    logger.info(f"Subscription cancellation attempt by {request.user.email}")
+    logger.info("Subscription cancellation attempt by %s", request.user.email)
     try:
         # Find active subscription
         subscription = Subscription.objects.filter(
             user=request.user,
             status='active'
-        ).first()
+        ).select_related('house').first()
 
         if not subscription:
-            logger.warning(f"No active subscription found for {request.user.email}")
+            logger.warning("No active subscription found for %s", request.user.email)
             return Response({'errors': 'No active subscription found'}, status=status.HTTP_404_NOT_FOUND)
 
-        # Cancel the subscription
-        subscription.status = 'cancelled'
-        subscription.save()
+        # Cancel only if it is still active, so a racing cancel or the expiry sweep can't adjust the rollups twice
+        with transaction.atomic():
+            cancelled = Subscription.objects.filter(pk=subscription.pk, status='active').update(
+                status='cancelled', updated_at=timezone.now()
+            )
+            if cancelled:
+                subscription.status = 'cancelled'
+                subscription_analytics.record_status_change(subscription, 'active')
+                transaction.on_commit(dashboard_summary.invalidate)
+        if not cancelled:
+            logger.warning("Subscription %s for %s was no longer active", subscription.id, request.user.email)
+            return Response({'errors': 'No active subscription found'}, status=status.HTTP_404_NOT_FOUND)
 
-        logger.info(f"Subscription cancelled for {request.user.email}")
+        logger.info("Subscription cancelled for %s", request.user.email)
         return Response({
             'success': True,
             'message': 'Subscription cancelled successfully',
@@ -397,5 +385,5 @@ def cancel_subscription(request):
         }, status=status.HTTP_200_OK)
 
     except Exception as e:
-        logger.exception(f"Error cancelling subscription for {request.user.email}")
+        logger.exception("Error cancelling subscription for %s", request.user.email)
         return Response({'errors': f'Cancellation failed: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -0,0 +1,121 @@
+# security/alert_hub.py
+"""
+In-process broadcast hub for panic alert events.
+
+members.views.panic and security.views.resolve_panic_alert publish events here
+and security.views.panic_alert_stream pushes them to connected guards as
+Server-Sent Events. Events carry increasing ids that clients send back as a
+resume cursor (Last-Event-ID); the last HUB_HISTORY events are kept for replay
+and a client whose cursor is older than that gets a fresh snapshot instead.
+
+The hub lives in process memory, so it needs no external broker. When running
+several worker processes each one has its own hub and only sees the alerts
+written through it; the stream covers the rest by re-reading PanicAlert on
+every heartbeat, so an alert raised through another worker arrives within
+STREAM_HEARTBEAT_SECONDS.
+"""
+import asyncio
+import json
+import threading
+from collections import deque, namedtuple
+
+AlertEvent = namedtuple('AlertEvent', ['id', 'type', 'data'])
+
+HUB_HISTORY = 500
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+
+def alert_payload(alert, member=None):
+    """Serialize a PanicAlert; pass member to avoid loading alert.member"""
+    member = member or alert.member
+    return {
+        'id': alert.id,
+        'member_name': member.get_full_name(),
+        'member_email': member.email,
+        'address': alert.address,
+        'timestamp': alert.timestamp.isoformat(),
+        'status': alert.status,
+        'resolved_at': alert.resolved_at.isoformat() if alert.resolved_at else None,
+    }
+
+
+def format_sse(event_type, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event_type}')
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+class Subscription:
+    """Queue of events for one connected client, fed from any thread"""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Client can't keep up; it will be resynced from a snapshot
+            self.overflowed = True
+
+    def deliver(self, event):
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class AlertHub:
+    def __init__(self, history=HUB_HISTORY):
+        self._lock = threading.Lock()
+        self._events = deque(maxlen=history)
+        self._last_id = 0
+        self._subscribers = set()
+
+    @property
+    def last_id(self):
+        return self._last_id
+
+    def publish(self, event_type, data):
+        with self._lock:
+            self._last_id += 1
+            event = AlertEvent(self._last_id, event_type, data)
+            self._events.append(event)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.deliver(event)
+            except RuntimeError:
+                # Event loop already closed; the stream's finally block will unsubscribe
+                pass
+        return event
+
+    def events_after(self, cursor):
+        """Return (events newer than cursor, complete) where complete is False if some were dropped"""
+        with self._lock:
+            events = [event for event in self._events if event.id > cursor]
+            oldest = self._events[0].id if self._events else self._last_id + 1
+            complete = cursor >= oldest - 1 and cursor <= self._last_id
+        return events, complete
+
+    def subscribe(self, loop=None):
+        subscription = Subscription(loop or asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+
+alert_hub = AlertHub()
@@ -35,7 +35,7 @@ const ScanScreen = () => {
       if (token && token !== 'demo-token') {
         const route = await api.getRoute();
         setRouteData(route.route);
-        setScannedCheckpoints(route.recent_scans || []);
+        setScannedCheckpoints(route.route?.progress?.visited || []);
       } else {
         // Demo route data
         setRouteData({
@@ -102,7 +102,8 @@ const ScanScreen = () => {
 
           // Update scanned checkpoints for demo mode
           if (scanResult.type === 'member') {
-            setScannedCheckpoints(prev => [...prev, data]);
+            const memberId = Number(scanResult.member.id);
+            setScannedCheckpoints(prev => (prev.includes(memberId) ? prev : [...prev, memberId]));
           }
 
           const message = scanResult.type === 'member'
@@ -149,7 +150,8 @@ const ScanScreen = () => {
 
         // Update scanned checkpoints if it's a member checkpoint QR
         if (scanResult.validation?.type === 'member_checkpoint') {
-          setScannedCheckpoints(prev => [...prev, data]);
+          const memberId = scanResult.validation.member.id;
+          setScannedCheckpoints(prev => (prev.includes(memberId) ? prev : [...prev, memberId]));
         }
 
         showAlert(
@@ -341,7 +343,7 @@ const ScanScreen = () => {
 
           <View style={styles.locationInfo}>
             {routeData.checkpoints.map((checkpoint, index) => {
-              const isScanned = scannedCheckpoints.includes(checkpoint.qr_code_data);
+              const isScanned = scannedCheckpoints.includes(checkpoint.id);
               return (
                 <View key={checkpoint.id} style={styles.locationItem}>
                   <Text style={styles.locationLabel}>
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class SecurityConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'security'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from assignment.database import apply_sqlite_pragmas
+        from . import signals  # noqa: F401
+
+        connection_created.connect(apply_sqlite_pragmas, dispatch_uid='apply_sqlite_pragmas')
@@ -0,0 +1,114 @@
+# security/authentication.py
+"""
+Token authentication with an in-process cache.
+
+CachedTokenAuthentication resolves a token together with its user and the
+user's security/member profile in one query, then keeps the result for
+TOKEN_AUTH_CACHE_TTL seconds in a bounded LRU. A warm request therefore needs
+no auth-related queries, and request.user.security_profile / .userprofile are
+already loaded. Entries are dropped by the receivers in security/signals.py
+when a token is deleted (logout), the user is saved (e.g. deactivate_user) or
+either profile changes.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+
+class TokenAuthCache:
+    """Bounded LRU of token key -> (expires_at, user, token)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'TOKEN_AUTH_CACHE_TTL', 60)
+
+    @property
+    def max_entries(self):
+        return getattr(settings, 'TOKEN_AUTH_CACHE_SIZE', 10000)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1], entry[2]
+            if entry:
+                self._drop(key)
+            self.misses += 1
+            return None
+
+    def set(self, key, user, token):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, user, token)
+            self._entries.move_to_end(key)
+            self._keys_by_user.setdefault(user.pk, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry:
+            keys = self._keys_by_user.get(entry[1].pk)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_user[entry[1].pk]
+
+    def invalidate_key(self, key):
+        with self._lock:
+            self._drop(key)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
+
+
+token_cache = TokenAuthCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Drop-in replacement for rest_framework's TokenAuthentication backed by token_cache"""
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached:
+            return cached
+
+        model = self.get_model()
+        try:
+            token = model.objects.select_related(
+                'user', 'user__security_profile', 'user__userprofile'
+            ).get(key=key)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        token_cache.set(key, token.user, token)
+        return token.user, token
@@ -0,0 +1,237 @@
+# security/geo_index.py
+"""
+In-process spatial grid of checkpoint positions for scan geofencing.
+
+Member (UserProfile) and house checkpoints with coordinates are bucketed into
+square cells of GEO_GRID_CELL_METERS. A scan is checked against its
+checkpoint's geofence with one dict lookup and a haversine distance.
+nearest() searches rings of cells outwards from a point, so it only looks at
+checkpoints in the neighbourhood, which is how misread codes are matched to
+the checkpoint the guard is standing at.
+
+The grid is loaded with one query per model on first use. After that the
+receivers in security/signals.py move or drop single entries as checkpoints
+are saved or deleted. A full reload happens only every GEO_INDEX_TTL seconds,
+as a backstop for changes made by other processes. It is built outside the
+lock by one thread while the others keep answering from the old grid, and
+swapped in at the end.
+"""
+import math
+import threading
+import time
+
+from django.conf import settings
+
+EARTH_RADIUS_M = 6371000.0
+METERS_PER_DEGREE = 111320.0
+
+
+def distance_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in metres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def scan_position(data):
+    """(latitude, longitude) sent with a scan, or None; raises ValueError if they are malformed"""
+    latitude, longitude = data.get('latitude'), data.get('longitude')
+    if latitude in (None, '') and longitude in (None, ''):
+        return None
+    try:
+        latitude, longitude = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        raise ValueError('latitude and longitude must both be numbers')
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError('latitude or longitude is out of range')
+    return latitude, longitude
+
+
+def checkpoint_of(validation_result):
+    """(kind, id) of the checkpoint a qr_registry result refers to, or None"""
+    if validation_result.get('type') in ('member', 'member_checkpoint'):
+        return ('member', validation_result['member']['id'])
+    if validation_result.get('type') == 'house':
+        return ('house', validation_result['house']['id'])
+    return None
+
+
+class CheckpointGridIndex:
+    """Thread-safe (kind, id) -> (lat, lon) map bucketed into a grid of cells"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._positions = {}  # (kind, id) -> (lat, lon)
+        self._cells = {}      # (row, column) -> set of (kind, id)
+        self._bounds = None   # [min row, max row, min column, max column] of occupied cells
+        self._loaded_at = None
+        self._reloading = False
+        self._generation = 0  # Bumped on every change so a reload that raced one is not stored
+
+    @property
+    def cell_meters(self):
+        return getattr(settings, 'GEO_GRID_CELL_METERS', 250)
+
+    def _cell(self, lat, lon):
+        size = self.cell_meters / METERS_PER_DEGREE
+        return (math.floor(lat / size), math.floor(lon / size))
+
+    def _ensure_loaded(self):
+        # Called without the lock; a stale grid keeps serving while a single thread rebuilds it
+        ttl = getattr(settings, 'GEO_INDEX_TTL', 900)
+        with self._lock:
+            if self._loaded_at is not None and (self._reloading or time.monotonic() - self._loaded_at < ttl):
+                return
+            self._reloading = True
+            generation = self._generation
+        from adminstrator.models import House
+        from members.models import UserProfile
+
+        try:
+            grid = CheckpointGridIndex()
+            for kind, model in (('member', UserProfile), ('house', House)):
+                rows = model.objects.filter(latitude__isnull=False, longitude__isnull=False).values_list(
+                    'id', 'latitude', 'longitude'
+                )
+                for object_id, lat, lon in rows:
+                    grid._place((kind, object_id), lat, lon)
+        finally:
+            with self._lock:
+                self._reloading = False
+        with self._lock:
+            if generation == self._generation:
+                self._positions, self._cells, self._bounds = grid._positions, grid._cells, grid._bounds
+                self._loaded_at = time.monotonic()
+            elif self._loaded_at is None:
+                # Answer from it, but load again on the next lookup to pick up the change it raced
+                self._positions, self._cells, self._bounds = grid._positions, grid._cells, grid._bounds
+
+    def _place(self, key, lat, lon):
+        row, column = cell = self._cell(lat, lon)
+        self._positions[key] = (lat, lon)
+        self._cells.setdefault(cell, set()).add(key)
+        if self._bounds is None:
+            self._bounds = [row, row, column, column]
+        else:
+            # Bounds only grow between reloads; they just limit how far nearest() searches
+            bounds = self._bounds
+            bounds[:] = [min(bounds[0], row), max(bounds[1], row), min(bounds[2], column), max(bounds[3], column)]
+
+    def _drop(self, key):
+        position = self._positions.pop(key, None)
+        if position is None:
+            return
+        cell = self._cell(*position)
+        members = self._cells.get(cell)
+        if members is not None:
+            members.discard(key)
+            if not members:
+                del self._cells[cell]
+
+    def update(self, kind, object_id, lat, lon):
+        """Move one checkpoint, or drop it when its coordinates were cleared"""
+        with self._lock:
+            self._generation += 1
+            if self._loaded_at is None:
+                return  # Picked up by the first load
+            key = (kind, object_id)
+            self._drop(key)
+            if lat is not None and lon is not None:
+                self._place(key, lat, lon)
+
+    def remove(self, kind, object_id):
+        with self._lock:
+            self._generation += 1
+            self._drop((kind, object_id))
+
+    def position(self, kind, object_id):
+        self._ensure_loaded()
+        with self._lock:
+            return self._positions.get((kind, object_id))
+
+    def check(self, kind, object_id, lat, lon):
+        """{'distance_m', 'within', 'radius_m'} for a scan at (lat, lon), or None if the checkpoint has no position"""
+        position = self.position(kind, object_id)
+        if position is None:
+            return None
+        radius = getattr(settings, 'GEOFENCE_RADIUS_METERS', 75)
+        distance = distance_m(lat, lon, *position)
+        return {'distance_m': round(distance, 1), 'within': distance <= radius, 'radius_m': radius}
+
+    def nearest(self, lat, lon, limit=5, max_distance_m=None, include=None):
+        """Up to `limit` (distance_m, kind, id) tuples closest to (lat, lon), nearest first.
+
+        include(kind, id) can restrict the candidates, e.g. to a guard's route.
+        """
+        self._ensure_loaded()
+        with self._lock:
+            if not self._cells:
+                return []
+            row, column = self._cell(lat, lon)
+            # Every cell is at least this many metres across, even where lines of longitude converge
+            span = self.cell_meters * max(math.cos(math.radians(lat)), 0.01)
+            min_row, max_row, min_column, max_column = self._bounds
+            reach = max(row - min_row, max_row - row, column - min_column, max_column - column)
+
+            found = []
+            ring = visited = 0
+            while ring <= reach:
+                if visited > 4 * len(self._cells):
+                    # Far from every checkpoint: checking them all is cheaper than walking empty cells
+                    found = [
+                        (distance_m(lat, lon, *position), *key) for key, position in self._positions.items()
+                        if include is None or include(*key)
+                    ]
+                    break
+                for cell in self._ring(row, column, ring):
+                    for key in self._cells.get(cell, ()):
+                        if include is None or include(*key):
+                            found.append((distance_m(lat, lon, *self._positions[key]), *key))
+                visited += max(1, 8 * ring)
+                # Points closer than this lie in the rings searched so far
+                covered = ring * span
+                if max_distance_m is not None and covered >= max_distance_m:
+                    break
+                if len(found) >= limit and sorted(found)[limit - 1][0] <= covered:
+                    break
+                ring += 1
+
+        found.sort()
+        if max_distance_m is not None:
+            found = [entry for entry in found if entry[0] <= max_distance_m]
+        return [(round(distance, 1), kind, object_id) for distance, kind, object_id in found[:limit]]
+
+    @staticmethod
+    def _ring(row, column, ring):
+        if ring == 0:
+            yield (row, column)
+            return
+        for offset in range(-ring, ring + 1):
+            yield (row - ring, column + offset)
+            yield (row + ring, column + offset)
+        for offset in range(-ring + 1, ring):
+            yield (row + offset, column - ring)
+            yield (row + offset, column + ring)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._positions, self._cells, self._bounds = {}, {}, None
+            self._loaded_at = None
+
+    def stats(self):
+        with self._lock:
+            return {'checkpoints': len(self._positions), 'cells': len(self._cells), 'loaded': self._loaded_at is not None}
+
+
+geo_index = CheckpointGridIndex()
+
+
+def scan_geofence(validation_result, position):
+    """Geofence check for a resolved scan taken at position, or None if either has no coordinates"""
+    checkpoint = checkpoint_of(validation_result)
+    if position is None or checkpoint is None:
+        return None
+    return geo_index.check(*checkpoint, *position)
@@ -0,0 +1,223 @@
+# security/instrumentation.py
+"""
+Opt-in per-view request instrumentation.
+
+With INSTRUMENTATION_ENABLED, InstrumentationMiddleware records for every URL
+name: request count by status class, a latency histogram, DB query count and
+time, requests that repeated the same SQL at least
+INSTRUMENTATION_DUPLICATE_THRESHOLD times (the usual N+1 shape), and response
+size. The totals are served in Prometheus text format by security.views.metrics
+and, when INSTRUMENTATION_DUMP_SECONDS is set, logged as a summary on a daemon
+thread. When disabled the middleware raises MiddlewareNotUsed, so Django drops
+it from the chain and requests pay nothing.
+
+Metrics are kept per process, like the other in-process caches in this app.
+"""
+import bisect
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Prometheus' default latency buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class ViewStats:
+    __slots__ = ('requests', 'statuses', 'buckets', 'latency_sum', 'queries', 'query_time',
+                 'max_queries', 'duplicate_requests', 'duplicate_sql', 'response_bytes')
+
+    def __init__(self):
+        self.requests = 0
+        self.statuses = Counter()
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.queries = 0
+        self.query_time = 0.0
+        self.max_queries = 0
+        self.duplicate_requests = 0
+        self.duplicate_sql = ''
+        self.response_bytes = 0
+
+
+class QueryCollector:
+    """execute_wrapper that counts and times every query run during one request"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.statements[sql] += 1
+
+    def most_repeated(self):
+        return self.statements.most_common(1)[0] if self.statements else ('', 0)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view, status_code, duration, collector, response_bytes):
+        sql, repeats = collector.most_repeated()
+        threshold = getattr(settings, 'INSTRUMENTATION_DUPLICATE_THRESHOLD', 3)
+        with self._lock:
+            stats = self._views.get(view)
+            if stats is None:
+                stats = self._views[view] = ViewStats()
+            stats.requests += 1
+            stats.statuses[f'{status_code // 100}xx'] += 1
+            stats.buckets[bisect.bisect_left(LATENCY_BUCKETS, duration)] += 1
+            stats.latency_sum += duration
+            stats.queries += collector.count
+            stats.query_time += collector.duration
+            stats.max_queries = max(stats.max_queries, collector.count)
+            if repeats >= threshold:
+                stats.duplicate_requests += 1
+                stats.duplicate_sql = sql[:300]
+            if response_bytes is not None:
+                stats.response_bytes += response_bytes
+
+    def summary(self):
+        """Per-view totals, most expensive (total latency) first"""
+        with self._lock:
+            rows = [
+                {
+                    'view': view,
+                    'requests': stats.requests,
+                    'statuses': dict(stats.statuses),
+                    'mean_ms': round(stats.latency_sum / stats.requests * 1000, 2),
+                    'queries_per_request': round(stats.queries / stats.requests, 2),
+                    'max_queries': stats.max_queries,
+                    'query_ms': round(stats.query_time * 1000, 2),
+                    'duplicate_query_requests': stats.duplicate_requests,
+                    'duplicate_sql': stats.duplicate_sql,
+                    'response_bytes': stats.response_bytes,
+                    'total_ms': stats.latency_sum * 1000,
+                }
+                for view, stats in self._views.items()
+            ]
+        rows.sort(key=lambda row: row.pop('total_ms'), reverse=True)
+        return rows
+
+    def prometheus(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        with self._lock:
+            views = dict(self._views)
+            lines = [
+                '# HELP http_requests_total Requests handled, by view and status class.',
+                '# TYPE http_requests_total counter',
+            ]
+            for view, stats in views.items():
+                for status_class, count in sorted(stats.statuses.items()):
+                    lines.append(f'http_requests_total{{view="{view}",status="{status_class}"}} {count}')
+
+            lines += [
+                '# HELP http_request_duration_seconds Request latency, by view.',
+                '# TYPE http_request_duration_seconds histogram',
+            ]
+            for view, stats in views.items():
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), stats.buckets):
+                    cumulative += count
+                    lines.append(f'http_request_duration_seconds_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+                lines.append(f'http_request_duration_seconds_sum{{view="{view}"}} {stats.latency_sum:.6f}')
+                lines.append(f'http_request_duration_seconds_count{{view="{view}"}} {stats.requests}')
+
+            for name, kind, description, value in (
+                ('db_queries_total', 'counter', 'SQL queries run, by view.', lambda s: s.queries),
+                ('db_query_duration_seconds_total', 'counter', 'Time spent in SQL, by view.', lambda s: f'{s.query_time:.6f}'),
+                ('db_queries_per_request_max', 'gauge', 'Most SQL queries run by one request, by view.', lambda s: s.max_queries),
+                ('db_duplicate_query_requests_total', 'counter',
+                 'Requests that repeated one SQL statement past the N+1 threshold, by view.', lambda s: s.duplicate_requests),
+                ('http_response_size_bytes_total', 'counter', 'Response body bytes, by view.', lambda s: s.response_bytes),
+            ):
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} {kind}')
+                for view, stats in views.items():
+                    lines.append(f'{name}{{view="{view}"}} {value(stats)}')
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        with self._lock:
+            self._views.clear()
+
+
+metrics = MetricsRegistry()
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'unresolved'
+
+
+class InstrumentationMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'INSTRUMENTATION_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        start_summary_dump()
+
+    def __call__(self, request):
+        collector = QueryCollector()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(collector))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        response_bytes = None if response.streaming else len(response.content)
+        metrics.record(_view_name(request), response.status_code, duration, collector, response_bytes)
+        return response
+
+
+_dump_started = False
+_dump_lock = threading.Lock()
+
+
+def log_summary():
+    for row in metrics.summary():
+        logger.info(
+            "view=%(view)s requests=%(requests)s mean_ms=%(mean_ms)s queries_per_request=%(queries_per_request)s "
+            "max_queries=%(max_queries)s query_ms=%(query_ms)s duplicate_query_requests=%(duplicate_query_requests)s "
+            "response_bytes=%(response_bytes)s", row
+        )
+
+
+def start_summary_dump():
+    """Log the per-view summary every INSTRUMENTATION_DUMP_SECONDS on a daemon thread (disabled when unset)"""
+    global _dump_started
+    interval = getattr(settings, 'INSTRUMENTATION_DUMP_SECONDS', None)
+    if not interval:
+        return False
+    with _dump_lock:
+        if _dump_started:
+            return False
+        _dump_started = True
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                log_summary()
+            except Exception:
+                logger.exception("Instrumentation summary dump failed")
+
+    threading.Thread(target=run, name='instrumentation-dump', daemon=True).start()
+    return True
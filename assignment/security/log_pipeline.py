@@ -0,0 +1,155 @@
+# security/log_pipeline.py
+"""
+Non-blocking logging for the API apps.
+
+AsyncLogHandler is a QueueHandler that owns a QueueListener: request threads
+only put the LogRecord on a bounded queue, and a background thread formats it
+(JSON lines to a rotating file, plain text to the console). As with the stock
+QueueHandler, the message and traceback are rendered before queueing and the
+args and exc_info are cleared, so the listener never reads objects the caller
+may have changed since. A full queue drops the record instead of blocking and
+counts it, and
+SamplingFilter keeps only one in N DEBUG records before they are queued.
+pipeline_stats() reports both counters; security.views.metrics exports them.
+
+Configured from settings.LOGGING; this module must not import Django models.
+"""
+import atexit
+import copy
+import json
+import logging
+import queue
+import sys
+import threading
+import weakref
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# LogRecord attributes that are not user-supplied `extra` fields
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_traceback_formatter = logging.Formatter()
+_handlers = weakref.WeakSet()
+_sampling_filters = weakref.WeakSet()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, location, extras and exception"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'module': record.module,
+            'line': record.lineno,
+            'thread': record.threadName,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text  # Rendered by AsyncLogHandler.prepare
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Pass every record at INFO and above, but only one in debug_rate DEBUG records"""
+
+    def __init__(self, debug_rate=1):
+        super().__init__()
+        self.debug_rate = max(1, int(debug_rate))
+        self._seen = 0
+        self.sampled_out = 0
+        self._lock = threading.Lock()
+        _sampling_filters.add(self)
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.debug_rate == 1:
+            return True
+        with self._lock:
+            self._seen += 1
+            if self._seen % self.debug_rate == 1:
+                return True
+            self.sampled_out += 1
+            return False
+
+
+class AsyncLogHandler(QueueHandler):
+    """Queue records for a background listener that writes a rotating JSON file and the console"""
+
+    def __init__(self, filename=None, max_bytes=10 * 1024 * 1024, backup_count=5, console=True, queue_size=10000):
+        super().__init__(queue.Queue(maxsize=queue_size))
+        self.dropped = 0
+        targets = []
+        if filename:
+            file_handler = RotatingFileHandler(filename, maxBytes=max_bytes, backupCount=backup_count, delay=True)
+            file_handler.setFormatter(JsonFormatter())
+            targets.append(file_handler)
+        if console:
+            console_handler = logging.StreamHandler(sys.stderr)
+            console_handler.setFormatter(logging.Formatter('%(levelname)s %(name)s: %(message)s'))
+            targets.append(console_handler)
+        self.targets = targets
+        self.listener = QueueListener(self.queue, *targets, respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.stop)
+        _handlers.add(self)
+
+    def prepare(self, record):
+        """Render the message and traceback now, like QueueHandler.prepare, but keep them apart for the JSON file"""
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self):
+        """Drain the queue and stop the listener; safe to call twice"""
+        if self.listener._thread is not None:
+            self.listener.stop()
+            for target in self.targets:
+                target.close()
+            if self.dropped:
+                sys.stderr.write(f"{self.dropped} log records were dropped because the log queue was full\n")
+
+    def close(self):
+        self.stop()
+        super().close()
+
+
+def pipeline_stats():
+    """Counters across every AsyncLogHandler and SamplingFilter in this process"""
+    handlers = list(_handlers)
+    return {
+        'dropped': sum(handler.dropped for handler in handlers),
+        'queued': sum(handler.queue.qsize() for handler in handlers),
+        'sampled_out': sum(log_filter.sampled_out for log_filter in list(_sampling_filters)),
+    }
+
+
+def prometheus_lines():
+    stats = pipeline_stats()
+    return (
+        '# HELP log_records_dropped_total Log records dropped because the log queue was full.\n'
+        '# TYPE log_records_dropped_total counter\n'
+        f"log_records_dropped_total {stats['dropped']}\n"
+        '# HELP log_records_sampled_out_total DEBUG log records skipped by sampling.\n'
+        '# TYPE log_records_sampled_out_total counter\n'
+        f"log_records_sampled_out_total {stats['sampled_out']}\n"
+        '# HELP log_queue_depth Log records waiting for the listener thread.\n'
+        '# TYPE log_queue_depth gauge\n'
+        f"log_queue_depth {stats['queued']}\n"
+    )
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from security.retention import archive_scans, archive_dir, retention_cutoff
+
+
+class Command(BaseCommand):
+    help = (
+        'Roll up scans older than the retention window into daily summaries and move them '
+        'to compressed monthly archives. Schedule daily, e.g. "15 2 * * * python manage.py archive_scans".'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Retention window in days (default: SCAN_RETENTION_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Scans archived per transaction')
+
+    def handle(self, *args, **options):
+        cutoff = retention_cutoff(days=options['days'])
+        self.stdout.write(f'Archiving scans older than {cutoff.date()} to {archive_dir()}...')
+        moved = archive_scans(cutoff, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Archived {moved} scans!'))
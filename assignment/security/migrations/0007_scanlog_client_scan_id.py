@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('security', '0006_add_scan_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scanlog',
+            name='client_scan_id',
+            field=models.UUIDField(blank=True, help_text='Client-supplied scan UUID used to de-duplicate offline replays', null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='scanlog',
+            name='client_scanned_at',
+            field=models.DateTimeField(blank=True, help_text='Time the scan was taken on the device', null=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('security', '0007_scanlog_client_scan_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScanDailySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('qr_data', models.TextField()),
+                ('location', models.CharField(blank=True, max_length=255)),
+                ('scan_count', models.PositiveIntegerField(default=0)),
+                ('first_scanned_at', models.DateTimeField()),
+                ('last_scanned_at', models.DateTimeField()),
+                ('security_guard', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scan_summaries', to='security.securityprofile')),
+            ],
+            options={
+                'verbose_name': 'Scan Daily Summary',
+                'verbose_name_plural': 'Scan Daily Summaries',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['security_guard', 'date'], name='security_sc_securit_5aac42_idx'), models.Index(fields=['date'], name='security_sc_date_b0eb30_idx')],
+            },
+        ),
+    ]
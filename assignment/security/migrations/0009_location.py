@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:49
+
+from django.db import migrations, models
+
+# Locations the validate endpoint used to hard-code; their printed QR codes carry just the name
+INITIAL_LOCATIONS = [
+    'Building A - Lobby',
+    'Building B - North Entrance',
+    'Building C - Server Room',
+    'Parking Garage - Level 2',
+    'Main Gate - Security Booth',
+    'Building D - Roof Access',
+    'Warehouse - Loading Bay',
+    'Admin Building - Rear Entrance',
+]
+
+
+def seed_locations(apps, schema_editor):
+    Location = apps.get_model('security', 'Location')
+    Location.objects.bulk_create([Location(name=name) for name in INITIAL_LOCATIONS], ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('security', '0008_scandailysummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Location',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('description', models.TextField(blank=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Location',
+                'verbose_name_plural': 'Locations',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.RunPython(seed_locations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('security', '0009_location'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scanlog',
+            name='geofence_distance_m',
+            field=models.FloatField(blank=True, help_text='Metres between the device and the scanned checkpoint', null=True),
+        ),
+        migrations.AddField(
+            model_name='scanlog',
+            name='latitude',
+            field=models.FloatField(blank=True, help_text='Device position when the scan was taken', null=True),
+        ),
+        migrations.AddField(
+            model_name='scanlog',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='scanlog',
+            name='within_geofence',
+            field=models.BooleanField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('security', '0010_scanlog_coordinates'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='scanlog',
+            name='client_scan_id',
+            field=models.UUIDField(blank=True, help_text='Client-supplied scan UUID used to de-duplicate offline replays', null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='scanlog',
+            constraint=models.UniqueConstraint(fields=('security_guard', 'client_scan_id'), name='unique_guard_client_scan'),
+        ),
+    ]
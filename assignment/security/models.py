@@ -35,11 +35,20 @@ class ScanLog(models.Model):
     comment = models.TextField(blank=True)
     location = models.CharField(max_length=255, blank=True)
     scanned_at = models.DateTimeField(auto_now_add=True)
+    client_scan_id = models.UUIDField(null=True, blank=True, help_text="Client-supplied scan UUID used to de-duplicate offline replays")
+    client_scanned_at = models.DateTimeField(null=True, blank=True, help_text="Time the scan was taken on the device")
+    latitude = models.FloatField(null=True, blank=True, help_text="Device position when the scan was taken")
+    longitude = models.FloatField(null=True, blank=True)
+    geofence_distance_m = models.FloatField(null=True, blank=True, help_text="Metres between the device and the scanned checkpoint")
+    within_geofence = models.BooleanField(null=True, blank=True)
 
     class Meta:
         verbose_name = 'Scan Log'
         verbose_name_plural = 'Scan Logs'
         ordering = ['-scanned_at']
+        constraints = [
+            models.UniqueConstraint(fields=['security_guard', 'client_scan_id'], name='unique_guard_client_scan'),
+        ]
         indexes = [
             models.Index(fields=['security_guard', 'scanned_at']),
             models.Index(fields=['scanned_at']),
@@ -48,3 +57,42 @@ class ScanLog(models.Model):
     def __str__(self):
         return f"Scan by {self.security_guard.user.get_full_name()} at {self.scanned_at}"
 
+
+
+class ScanDailySummary(models.Model):
+    """Per guard, per checkpoint, per day rollup of scans moved out of ScanLog by the retention job"""
+    security_guard = models.ForeignKey(SecurityProfile, on_delete=models.CASCADE, related_name='scan_summaries')
+    date = models.DateField()
+    qr_data = models.TextField()
+    location = models.CharField(max_length=255, blank=True)
+    scan_count = models.PositiveIntegerField(default=0)
+    first_scanned_at = models.DateTimeField()
+    last_scanned_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'Scan Daily Summary'
+        verbose_name_plural = 'Scan Daily Summaries'
+        ordering = ['-date']
+        indexes = [
+            models.Index(fields=['security_guard', 'date']),
+            models.Index(fields=['date']),
+        ]
+
+    def __str__(self):
+        return f"{self.scan_count} scans of {self.qr_data} on {self.date}"
+
+
+class Location(models.Model):
+    """Fixed patrol location whose QR payload is its name"""
+    name = models.CharField(max_length=255, unique=True)
+    description = models.TextField(blank=True)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Location'
+        verbose_name_plural = 'Locations'
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,31 @@
+# security/permissions.py
+from rest_framework.permissions import BasePermission
+
+from .roles import request_role
+
+
+class _RolePermission(BasePermission):
+    """Allow callers whose RequestRole has any of the `roles` properties set"""
+    roles = ()
+
+    def has_permission(self, request, view):
+        role = request_role(request)
+        request.role = role
+        return any(getattr(role, name) for name in self.roles)
+
+
+class IsApprovedGuard(_RolePermission):
+    """Caller has an approved SecurityProfile; available to the view as request.role.security_profile"""
+    message = 'Approved security profile required.'
+    roles = ('is_approved_guard',)
+
+
+class IsApprovedMember(_RolePermission):
+    """Caller has an approved UserProfile; available to the view as request.role.member_profile"""
+    message = 'Approved member profile required.'
+    roles = ('is_approved_member',)
+
+
+class IsApprovedGuardOrStaff(_RolePermission):
+    message = 'Approved security profile or staff account required.'
+    roles = ('is_approved_guard', 'is_staff')
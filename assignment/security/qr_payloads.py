@@ -0,0 +1,208 @@
+# security/qr_payloads.py
+"""
+Resolution of scanned QR payloads.
+
+Printed codes carry "<type>:<value>" payloads, except the fixed patrol
+locations whose codes hold just the location name. qr_registry maps each type
+prefix to a resolver and sends anything without a registered prefix to the
+default resolver, so every payload is dispatched with one dict lookup. Types
+registered with signed=True have their value checked by
+security/qr_signing.py first, so forged or expired codes never reach the
+database. The built-in types are:
+
+* member:<UserProfile id> (signed) - for a guard, checked against their
+  patrol routes in route_index (no query once warm); otherwise the member is
+  loaded with one query.
+* house:<House id> (signed) - as written by generate_house_qr, loaded with
+  one query.
+* location:<name>, or a bare name - looked up in location_index, an
+  in-memory map of the active Location rows loaded with one query. It is
+  cleared by security/signals.py when a Location is written and expires after
+  LOCATION_INDEX_TTL seconds for changes made by other processes.
+
+Resolvers take (value, security_profile) and return the result dict the scan
+endpoints send back: 'success', 'message' and, on success, 'type' and
+'location'.
+"""
+import threading
+import time
+
+from django.conf import settings
+
+from .qr_signing import InvalidQRSignature, verify_payload
+from .route_index import route_index
+
+INVALID_MESSAGE = 'Invalid QR code - not a recognized member, house, or location'
+
+
+def _failure(message):
+    return {'success': False, 'message': message}
+
+
+def member_checkpoint_result(member, route_name):
+    """Build the validation result for a successfully scanned member checkpoint"""
+    return {
+        'success': True,
+        'type': 'member_checkpoint',
+        'member': {
+            'id': member.id,
+            'full_name': member.full_name,
+            'address': member.address,
+            'route_name': route_name,
+        },
+        'location': member.address,
+        'message': f'Member checkpoint {member.full_name} validated successfully for route {route_name}'
+    }
+
+
+class QRPayloadRegistry:
+    """Prefix -> resolver map with a fallback for payloads that carry no known prefix"""
+
+    def __init__(self):
+        self._resolvers = {}
+        self._signed = set()
+        self._default = None
+
+    def register(self, prefix, resolver, default=False, signed=False):
+        self._resolvers[prefix] = resolver
+        if signed:
+            self._signed.add(prefix)
+        if default:
+            self._default = resolver
+
+    def resolve(self, qr_data, security_profile=None):
+        if qr_data is not None and not isinstance(qr_data, str):
+            return _failure(INVALID_MESSAGE)
+        payload = (qr_data or '').strip()
+        prefix, separator, value = payload.partition(':')
+        resolver = self._resolvers.get(prefix) if separator else None
+        if resolver is None:
+            resolver, value = self._default, payload
+        elif prefix in self._signed:
+            try:
+                value = verify_payload(prefix, value.strip())
+            except InvalidQRSignature as e:
+                return _failure(str(e))
+        if resolver is None:
+            return _failure(INVALID_MESSAGE)
+        return resolver(value.strip(), security_profile)
+
+
+def _parse_id(kind, value):
+    try:
+        return int(value), None
+    except ValueError as e:
+        return None, _failure(f'Invalid {kind} QR code format: {str(e)}')
+
+
+def resolve_member(value, security_profile=None):
+    member_id, error = _parse_id('member', value)
+    if error:
+        return error
+
+    if security_profile is None:
+        from members.models import UserProfile
+
+        profile = UserProfile.objects.select_related('user').filter(id=member_id).first()
+        if profile is None:
+            return _failure(f'Member not found for ID {member_id}')
+        if profile.status != 'approved':
+            return _failure(f'Member {profile.full_name} is not approved')
+        return {
+            'success': True,
+            'type': 'member',
+            'member': {
+                'id': profile.id,
+                'full_name': profile.full_name,
+                'email': profile.user.email,
+                'phone': profile.phone,
+                'address': profile.address,
+            },
+            'location': profile.address,
+            'message': f'Member {profile.full_name} verified successfully'
+        }
+
+    # Loading the guard's routes also warms the member entries they reference
+    route_name = route_index.checkpoints_for(security_profile.id).get(member_id)
+    if route_name is None:
+        return _failure(f'Member ID {member_id} is not part of your assigned patrol route')
+    member = route_index.get_member(member_id)
+    if member is None:
+        return _failure(f'Member not found for ID {member_id}')
+    if member.status != 'approved':
+        return _failure(f'Member {member.full_name} is not approved')
+    return member_checkpoint_result(member, route_name)
+
+
+def resolve_house(value, security_profile=None):
+    from adminstrator.models import House
+
+    house_id, error = _parse_id('house', value)
+    if error:
+        return error
+    house = House.objects.filter(id=house_id).values(
+        'id', 'house_number', 'address', 'property_type', 'is_occupied'
+    ).first()
+    if house is None:
+        return _failure(f'House not found for ID {house_id}')
+    return {
+        'success': True,
+        'type': 'house',
+        'house': house,
+        'location': house['address'],
+        'message': f"House {house['house_number']} verified successfully"
+    }
+
+
+class LocationIndex:
+    """Thread-safe map of active location names to Location ids"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._names = None
+        self._expires = 0.0
+        self._generation = 0
+
+    def get(self, name):
+        """Return the Location id for an active location name, or None"""
+        with self._lock:
+            if self._names is not None and time.monotonic() < self._expires:
+                return self._names.get(name)
+            generation = self._generation
+        return self._load(generation).get(name)
+
+    def _load(self, generation):
+        from .models import Location
+
+        names = dict(Location.objects.filter(is_active=True).values_list('name', 'id'))
+        with self._lock:
+            # Keep it only if no Location was written while it was loading
+            if generation == self._generation:
+                self._names = names
+                self._expires = time.monotonic() + getattr(settings, 'LOCATION_INDEX_TTL', 300)
+        return names
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._names = None
+
+
+location_index = LocationIndex()
+
+
+def resolve_location(value, security_profile=None):
+    if location_index.get(value) is None:
+        return _failure(INVALID_MESSAGE)
+    return {
+        'success': True,
+        'type': 'location',
+        'location': value,
+        'message': 'Location QR code validated successfully'
+    }
+
+
+qr_registry = QRPayloadRegistry()
+qr_registry.register('member', resolve_member, signed=True)
+qr_registry.register('house', resolve_house, signed=True)
+qr_registry.register('location', resolve_location, default=True)
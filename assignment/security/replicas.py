@@ -0,0 +1,153 @@
+# security/replicas.py
+"""
+Read-replica routing for reporting views.
+
+Views decorated with @replica_reads (the admin dashboards and read-only GET
+APIs) run their reads against settings.DATABASE_REPLICA_ALIAS when it is
+configured; everything else, and every write, uses the primary. A client that
+wrote is pinned to the primary for REPLICA_PIN_SECONDS so it reads its own
+writes despite replication lag: API clients by their Authorization header in
+an in-process registry, browsers additionally by a short-lived cookie that
+works across processes. A write in the middle of a request also sends the rest
+of that request's reads to the primary.
+
+ReplicaRouter only acts inside a request marked by ReplicaRoutingMiddleware,
+so management commands, signals run outside requests and tests always use the
+primary. Without a replica alias the middleware removes itself.
+"""
+import contextvars
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE = 'primary_pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Credentials are always checked on the primary, so a lagging replica cannot revive a logout
+PRIMARY_ONLY_APPS = {'sessions', 'authtoken'}
+
+
+class _RequestState:
+    __slots__ = ('client', 'read_alias', 'wrote')
+
+    def __init__(self, client):
+        self.client = client
+        self.read_alias = None
+        self.wrote = False
+
+
+_request_state = contextvars.ContextVar('replica_request_state', default=None)
+
+
+def replica_alias():
+    return getattr(settings, 'DATABASE_REPLICA_ALIAS', None)
+
+
+def pin_seconds():
+    return getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+
+
+class PrimaryPins:
+    """Clients that wrote recently, with the time their pin expires"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._expires = {}
+
+    def pin(self, client, seconds):
+        now = time.monotonic()
+        with self._lock:
+            self._expires[client] = now + seconds
+            if len(self._expires) > 10000:
+                self._expires = {key: expiry for key, expiry in self._expires.items() if expiry > now}
+
+    def is_pinned(self, client):
+        with self._lock:
+            expiry = self._expires.get(client)
+            if expiry is None:
+                return False
+            if expiry <= time.monotonic():
+                del self._expires[client]
+                return False
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._expires.clear()
+
+
+primary_pins = PrimaryPins()
+
+
+def client_key(request):
+    """Identify the caller by its token or session, without keeping the raw credential"""
+    credential = request.META.get('HTTP_AUTHORIZATION') or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not credential:
+        return None
+    return hashlib.sha256(credential.encode()).hexdigest()[:32]
+
+
+def replica_reads(view):
+    """Mark a read-only view whose GET requests may be served from the replica"""
+    view.replica_reads = True
+    return view
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _request_state.get()
+        if state is None or model._meta.app_label in PRIMARY_ONLY_APPS:
+            return None
+        return state.read_alias
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None and not state.wrote:
+            state.wrote = True
+            state.read_alias = None
+            if state.client:
+                primary_pins.pin(state.client, pin_seconds())
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        aliases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """Route reads of @replica_reads views to the replica unless the caller is pinned to the primary"""
+
+    def __init__(self, get_response):
+        if not replica_alias():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = _RequestState(client_key(request))
+        request._replica_state = state
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        if state.wrote:
+            response.set_cookie(PIN_COOKIE, '1', max_age=pin_seconds(), httponly=True, samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = request._replica_state
+        if (
+            getattr(view_func, 'replica_reads', False)
+            and request.method in SAFE_METHODS
+            and not state.wrote
+            and PIN_COOKIE not in request.COOKIES
+            and not (state.client and primary_pins.is_pinned(state.client))
+        ):
+            state.read_alias = replica_alias()
+        return None
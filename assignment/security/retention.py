@@ -0,0 +1,243 @@
+# security/retention.py
+"""
+ScanLog retention: daily rollups plus compressed monthly archives.
+
+archive_scans() moves raw scans older than SCAN_RETENTION_DAYS out of ScanLog.
+Each batch is rolled up into ScanDailySummary (per guard, per checkpoint, per
+day) and written to SCAN_ARCHIVE_DIR as gzip JSON lines, one file per month and
+batch (scans-YYYY-MM-<first id>-<last id>.jsonl.gz), before the rows are
+deleted. A batch that is written but not deleted is simply written again on the
+next run; readers de-duplicate by id. Batches are locked while they are moved,
+so several runs at once split the work instead of repeating it.
+
+archived_scan_rows() reads those files back for scan history requests whose
+range reaches past the live table. Run the archive_scans management command
+from cron, or set SCAN_RETENTION_INTERVAL_HOURS to run it on a background
+thread of the web process (see start_scheduler).
+"""
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import ScanDailySummary, ScanLog
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FIELDS = ['id', 'security_guard_id', 'qr_data', 'comment', 'location', 'scanned_at', 'client_scanned_at', 'client_scan_id',
+                  'latitude', 'longitude', 'geofence_distance_m', 'within_geofence']
+DATETIME_FIELDS = ('scanned_at', 'client_scanned_at')
+
+
+def archive_dir():
+    return Path(getattr(settings, 'SCAN_ARCHIVE_DIR', settings.BASE_DIR / 'scan_archive'))
+
+
+def retention_cutoff(now=None, days=None):
+    """Start of the oldest day kept in ScanLog"""
+    days = getattr(settings, 'SCAN_RETENTION_DAYS', 90) if days is None else days
+    today = timezone.localdate(now or timezone.now())
+    return timezone.make_aware(datetime.combine(today - timedelta(days=days), datetime.min.time()))
+
+
+def _encode(row):
+    encoded = {}
+    for field in ARCHIVE_FIELDS:
+        value = row[field]
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        elif isinstance(value, uuid.UUID):
+            value = str(value)
+        encoded[field] = value
+    return encoded
+
+
+def _write_month(month, rows):
+    directory = archive_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"scans-{month}-{rows[0]['id']}-{rows[-1]['id']}.jsonl.gz"
+    partial = path.with_suffix('.part')
+    with gzip.open(partial, 'wt', encoding='utf-8') as archive:
+        for row in rows:
+            archive.write(json.dumps(_encode(row)) + '\n')
+    os.replace(partial, path)  # Readers never see a half-written file
+    return path
+
+
+def _roll_up(rows):
+    groups = defaultdict(lambda: {'count': 0, 'first': None, 'last': None, 'location': ''})
+    for row in rows:
+        key = (row['security_guard_id'], timezone.localdate(row['scanned_at']), row['qr_data'])
+        group = groups[key]
+        group['count'] += 1
+        group['first'] = min(filter(None, [group['first'], row['scanned_at']]))
+        group['last'] = max(filter(None, [group['last'], row['scanned_at']]))
+        group['location'] = row['location'] or group['location']
+
+    guard_ids = {guard_id for guard_id, _, _ in groups}
+    days = [day for _, day, _ in groups]
+    existing = {
+        (summary.security_guard_id, summary.date, summary.qr_data): summary
+        for summary in ScanDailySummary.objects.filter(
+            security_guard_id__in=guard_ids, date__gte=min(days), date__lte=max(days)
+        )
+    }
+    to_create, to_update = [], []
+    for (guard_id, day, qr_data), group in groups.items():
+        summary = existing.get((guard_id, day, qr_data))
+        if summary is None:
+            to_create.append(ScanDailySummary(
+                security_guard_id=guard_id, date=day, qr_data=qr_data, location=group['location'],
+                scan_count=group['count'], first_scanned_at=group['first'], last_scanned_at=group['last'],
+            ))
+        else:
+            summary.scan_count += group['count']
+            summary.first_scanned_at = min(summary.first_scanned_at, group['first'])
+            summary.last_scanned_at = max(summary.last_scanned_at, group['last'])
+            to_update.append(summary)
+    ScanDailySummary.objects.bulk_create(to_create)
+    ScanDailySummary.objects.bulk_update(to_update, ['scan_count', 'first_scanned_at', 'last_scanned_at'])
+
+
+def archive_scans(cutoff=None, batch_size=5000):
+    """Roll up, archive and delete scans older than cutoff; return the number of rows moved"""
+    cutoff = cutoff or retention_cutoff()
+    moved = 0
+    while True:
+        with transaction.atomic():
+            # Each run locks its batch and skips rows another run holds, so overlapping runs (every web
+            # worker's scheduler, or cron) never roll the same scans up twice
+            rows = list(
+                ScanLog.objects.select_for_update(skip_locked=True).filter(scanned_at__lt=cutoff)
+                .order_by('scanned_at', 'id').values(*ARCHIVE_FIELDS)[:batch_size]
+            )
+            if not rows:
+                break
+
+            by_month = defaultdict(list)
+            for row in rows:
+                by_month[timezone.localtime(row['scanned_at']).strftime('%Y-%m')].append(row)
+            for month, month_rows in by_month.items():
+                _write_month(month, month_rows)
+
+            _roll_up(rows)
+            ScanLog.objects.filter(id__in=[row['id'] for row in rows]).delete()
+        moved += len(rows)
+        logger.info("Archived %s scans older than %s", len(rows), cutoff.date())
+    _read_archive_file.cache_clear()
+    return moved
+
+
+@lru_cache(maxsize=8)
+def _read_archive_file(path, mtime):
+    rows = []
+    with gzip.open(path, 'rt', encoding='utf-8') as archive:
+        for line in archive:
+            row = json.loads(line)
+            for field in DATETIME_FIELDS:
+                if row.get(field):
+                    row[field] = parse_datetime(row[field])
+            rows.append(row)
+    return rows
+
+
+def _archive_months():
+    """{'YYYY-MM': [paths]} for every archive file on disk"""
+    months = defaultdict(list)
+    directory = archive_dir()
+    if directory.is_dir():
+        for path in directory.glob('scans-*.jsonl.gz'):
+            months[path.name[len('scans-'):len('scans-YYYY-MM')]].append(path)
+    return months
+
+
+def _matches(row, guard_id, start, end, location, qr_type, before):
+    if guard_id is not None and str(row['security_guard_id']) != str(guard_id):
+        return False
+    if start and row['scanned_at'] < start:
+        return False
+    if end and row['scanned_at'] > end:
+        return False
+    if location and location.lower() not in (row['location'] or '').lower():
+        return False
+    if qr_type:
+        if qr_type == 'location':
+            if ':' in row['qr_data']:
+                return False
+        elif not row['qr_data'].startswith(f'{qr_type}:'):
+            return False
+    if before and (row['scanned_at'], row['id']) >= before:
+        return False
+    return True
+
+
+def archived_scan_rows(guard_id=None, start=None, end=None, location=None, qr_type=None, before=None, limit=50):
+    """Up to limit archived scans matching the scan history filters, newest first.
+
+    before is an exclusive (scanned_at, id) keyset bound, as in the live query.
+    """
+    months = _archive_months()
+    # Months after the end bound or the cursor cannot hold a match, nor can those before start
+    newest = min([timezone.localtime(bound).strftime('%Y-%m') for bound in (end, before and before[0]) if bound],
+                 default=None)
+    oldest = timezone.localtime(start).strftime('%Y-%m') if start else None
+    results = []
+    for month in sorted(months, reverse=True):
+        if newest and month > newest:
+            continue
+        if oldest and month < oldest:
+            break
+        seen = {}
+        for path in months[month]:
+            for row in _read_archive_file(str(path), path.stat().st_mtime):
+                if _matches(row, guard_id, start, end, location, qr_type, before):
+                    seen[row['id']] = row
+        results.extend(sorted(seen.values(), key=lambda row: (row['scanned_at'], row['id']), reverse=True))
+        if len(results) >= limit:
+            break
+    return results[:limit]
+
+
+_scheduler_started = False
+_scheduler_lock = threading.Lock()
+
+
+def start_scheduler():
+    """Run archive_scans every SCAN_RETENTION_INTERVAL_HOURS on a daemon thread (disabled when unset)
+
+    Every worker process starts its own thread; archive_scans() locks its batches, so they do not overlap.
+    """
+    global _scheduler_started
+    interval_hours = getattr(settings, 'SCAN_RETENTION_INTERVAL_HOURS', None)
+    if not interval_hours:
+        return False
+    with _scheduler_lock:
+        if _scheduler_started:
+            return False
+        _scheduler_started = True
+
+    def run():
+        while True:
+            time.sleep(interval_hours * 3600)
+            close_old_connections()
+            try:
+                archive_scans()
+            except Exception:
+                logger.exception("Scheduled scan archival failed")
+            finally:
+                close_old_connections()
+
+    threading.Thread(target=run, name='scan-retention', daemon=True).start()
+    return True
@@ -0,0 +1,103 @@
+# security/roles.py
+"""
+Request-scoped role resolution.
+
+request_role(request) works out once per request whether the caller is a guard,
+a member or staff, and keeps the matching profiles on the underlying
+HttpRequest. Users authenticated by CachedTokenAuthentication already carry
+both profiles, so this costs no queries; session users are resolved with a
+single select_related query. RequestRoleMiddleware exposes the same object as a
+lazy request.role for plain Django views, and the permission classes in
+security/permissions.py set it on DRF requests.
+"""
+from collections import namedtuple
+
+from django.contrib.auth.models import User
+from django.utils.functional import SimpleLazyObject
+
+_ROLE_ATTR = '_cached_request_role'
+
+
+class RequestRole(namedtuple('RequestRole', ['user', 'security_profile', 'member_profile'])):
+    __slots__ = ()
+
+    @property
+    def is_guard(self):
+        return self.security_profile is not None
+
+    @property
+    def is_member(self):
+        return self.member_profile is not None
+
+    @property
+    def is_approved_guard(self):
+        return self.is_guard and self.security_profile.status == 'approved'
+
+    @property
+    def is_approved_member(self):
+        return self.is_member and self.member_profile.status == 'approved'
+
+    @property
+    def is_staff(self):
+        return bool(self.user and self.user.is_staff)
+
+    @property
+    def name(self):
+        if self.user is None or not self.user.is_authenticated:
+            return 'anonymous'
+        if self.is_guard:
+            return 'guard'
+        if self.is_member:
+            return 'member'
+        return 'staff' if self.user.is_staff else 'user'
+
+
+def _related(user, field):
+    # Only read relations that are already loaded, so this never queries
+    descriptor = getattr(User, field)
+    if not descriptor.related.is_cached(user):
+        return None, False
+    try:
+        return getattr(user, field), True
+    except descriptor.RelatedObjectDoesNotExist:
+        return None, True
+
+
+def resolve_role(user):
+    """Build a RequestRole for user, with at most one query"""
+    if user is None or not user.is_authenticated:
+        return RequestRole(user, None, None)
+
+    security_profile, guard_known = _related(user, 'security_profile')
+    member_profile, member_known = _related(user, 'userprofile')
+    if not (guard_known and member_known):
+        loaded = User.objects.select_related('security_profile', 'userprofile').get(pk=user.pk)
+        security_profile, _ = _related(loaded, 'security_profile')
+        member_profile, _ = _related(loaded, 'userprofile')
+        # Keep later request.user.security_profile / .userprofile lookups query-free
+        User.security_profile.related.set_cached_value(user, security_profile)
+        User.userprofile.related.set_cached_value(user, member_profile)
+    return RequestRole(user, security_profile, member_profile)
+
+
+def request_role(request):
+    """Resolve and memoize the caller's role for this request (DRF or Django request)"""
+    http_request = getattr(request, '_request', request)
+    user = request.user
+    role = http_request.__dict__.get(_ROLE_ATTR)
+    if role is None or role.user is not user:
+        role = resolve_role(user)
+        http_request.__dict__[_ROLE_ATTR] = role
+    return role
+
+
+class RequestRoleMiddleware:
+    """Attach a lazily resolved request.role to every request"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # DRF copies the token user onto the HttpRequest, so this resolves the right user in API views
+        request.role = SimpleLazyObject(lambda: request_role(request))
+        return self.get_response(request)
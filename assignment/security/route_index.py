@@ -0,0 +1,163 @@
+# security/route_index.py
+"""
+In-process index of patrol route membership used to validate checkpoint scans.
+
+Maps each guard to the checkpoint members on their assigned routes and keeps a
+per-member status map, so a warm scan is validated without touching the
+database. Each guard entry also records the route id and visit bitmap slot of
+its checkpoints on every route they are on (see adminstrator/route_progress.py). Entries are invalidated
+by the receivers in security/signals.py and expire after ROUTE_INDEX_TTL
+seconds as a backstop for changes made by other processes.
+"""
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+
+CheckpointMember = namedtuple('CheckpointMember', ['id', 'full_name', 'address', 'status'])
+
+# Sentinel cached for member IDs that do not exist
+MISSING = object()
+
+
+class RouteMembershipIndex:
+    """Thread-safe guard -> {member_id: route_name} and member_id -> CheckpointMember maps"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._guards = {}   # guard_id -> (loaded_at, {member_id: route_name}, {member_id: ((route_id, slot), ...)})
+        self._members = {}  # member_id -> (loaded_at, CheckpointMember or MISSING)
+        self._generation = 0  # Bumped on invalidation so in-flight loads don't store stale rows
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'ROUTE_INDEX_TTL', 300)
+
+    def _fresh(self, loaded_at):
+        return time.monotonic() - loaded_at < self.ttl
+
+    def checkpoints_for(self, guard_id):
+        """Return {member_id: route_name} for every checkpoint on the guard's routes"""
+        with self._lock:
+            entry = self._guards.get(guard_id)
+            if entry and self._fresh(entry[0]):
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        return self._load_guard(guard_id)
+
+    def visit_slots(self, guard_id, member_id):
+        """Return the (route_id, slot) pairs of a checkpoint on each of the guard's routes that include it"""
+        with self._lock:
+            entry = self._guards.get(guard_id)
+            if entry and self._fresh(entry[0]):
+                self.hits += 1
+                return entry[2].get(member_id, ())
+            self.misses += 1
+        self._load_guard(guard_id)
+        with self._lock:
+            entry = self._guards.get(guard_id)
+        # Not stored when invalidated while loading; the next scan reloads it
+        return entry[2].get(member_id, ()) if entry else ()
+
+    def get_member(self, member_id):
+        """Return the CheckpointMember for a UserProfile id, or None if it does not exist"""
+        with self._lock:
+            entry = self._members.get(member_id)
+            if entry and self._fresh(entry[0]):
+                self.hits += 1
+                return None if entry[1] is MISSING else entry[1]
+            self.misses += 1
+        return self._load_member(member_id)
+
+    def _load_guard(self, guard_id):
+        from adminstrator.models import Route
+
+        generation = self._generation
+        # One query fetches route names together with the checkpoint members they include
+        rows = Route.objects.filter(assigned_security_guard_id=guard_id).order_by('name').values_list(
+            'id', 'name', 'checkpoint_slots',
+            'checkpoints__id', 'checkpoints__full_name', 'checkpoints__address', 'checkpoints__status'
+        )
+        checkpoints = {}
+        members = {}
+        visit_slots = {}
+        route_slots = {}
+        for route_id, route_name, slots, member_id, full_name, address, member_status in rows:
+            if member_id is None:
+                continue  # Route without checkpoints
+            checkpoints.setdefault(member_id, route_name)
+            members[member_id] = CheckpointMember(member_id, full_name, address, member_status)
+            if route_id not in route_slots:
+                route_slots[route_id] = {slot_member: slot for slot, slot_member in enumerate(slots) if slot_member}
+            slot = route_slots[route_id].get(member_id)
+            if slot is not None:
+                visit_slots[member_id] = visit_slots.get(member_id, ()) + ((route_id, slot),)
+
+        now = time.monotonic()
+        with self._lock:
+            if generation == self._generation:
+                self._guards[guard_id] = (now, checkpoints, visit_slots)
+                for member_id, member in members.items():
+                    self._members[member_id] = (now, member)
+        return checkpoints
+
+    def _load_member(self, member_id):
+        from members.models import UserProfile
+
+        generation = self._generation
+        row = UserProfile.objects.filter(id=member_id).values_list('full_name', 'address', 'status').first()
+        member = CheckpointMember(member_id, *row) if row else MISSING
+        with self._lock:
+            if generation == self._generation:
+                self._members[member_id] = (time.monotonic(), member)
+        return None if member is MISSING else member
+
+    def update_member(self, profile):
+        """Refresh a member entry from a saved UserProfile instance"""
+        with self._lock:
+            self._generation += 1
+            self._members[profile.id] = (
+                time.monotonic(),
+                CheckpointMember(profile.id, profile.full_name, profile.address, profile.status),
+            )
+
+    def forget_member(self, member_id):
+        with self._lock:
+            self._generation += 1
+            self._members.pop(member_id, None)
+
+    def invalidate_guard(self, guard_id):
+        with self._lock:
+            self._generation += 1
+            self._guards.pop(guard_id, None)
+
+    def invalidate_all_guards(self):
+        with self._lock:
+            self._generation += 1
+            self._guards.clear()
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._guards.clear()
+            self._members.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'cached_guards': len(self._guards),
+                'cached_members': len(self._members),
+            }
+
+
+route_index = RouteMembershipIndex()
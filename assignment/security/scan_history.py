@@ -0,0 +1,116 @@
+# security/scan_history.py
+"""
+Keyset (cursor) pagination over ScanLog for the scan history API.
+
+Pages are ordered by (scanned_at, id) descending and continue from the last
+row of the previous page, so page N costs the same as page 1 and uses the
+(security_guard, scanned_at) index instead of an OFFSET scan. Once the live
+table is exhausted the page is filled from the retention archive (see
+security/retention.py).
+"""
+import base64
+from datetime import datetime, time
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import ScanLog
+from .retention import archived_scan_rows, retention_cutoff
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+SCAN_FIELDS = ['id', 'security_guard_id', 'qr_data', 'comment', 'location', 'scanned_at', 'client_scanned_at',
+               'latitude', 'longitude', 'geofence_distance_m', 'within_geofence']
+COMPACT_FIELDS = ['id', 'qr_data', 'scanned_at']
+
+
+class InvalidScanQuery(ValueError):
+    """Raised for malformed filters or cursors"""
+
+
+def encode_cursor(scanned_at, scan_id):
+    raw = f"{scanned_at.isoformat()}|{scan_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        scanned_at, scan_id = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        parsed = parse_datetime(scanned_at)
+        if parsed is None:
+            raise ValueError(scanned_at)
+        return parsed, int(scan_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidScanQuery(f'Invalid cursor: {e}')
+
+
+def parse_bound(value, end=False):
+    """Accept an ISO date or datetime; a bare date covers the whole day"""
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise InvalidScanQuery(f'Invalid date: {value}')
+        parsed = datetime.combine(day, time.max if end else time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def select_fields(fields_param, compact=False):
+    if compact:
+        return COMPACT_FIELDS
+    if not fields_param:
+        return SCAN_FIELDS
+    fields = [field.strip() for field in fields_param.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in SCAN_FIELDS]
+    if unknown:
+        raise InvalidScanQuery(f"Unknown fields: {', '.join(unknown)}")
+    # The cursor is built from these two, so they are always fetched
+    return list(dict.fromkeys(['id', 'scanned_at', *fields]))
+
+
+def filter_scans(queryset, guard_id=None, start=None, end=None, location=None, qr_type=None):
+    if guard_id is not None:
+        queryset = queryset.filter(security_guard_id=guard_id)
+    if start:
+        queryset = queryset.filter(scanned_at__gte=start)
+    if end:
+        queryset = queryset.filter(scanned_at__lte=end)
+    if location:
+        queryset = queryset.filter(location__icontains=location)
+    if qr_type:
+        if qr_type == 'location':
+            # Location codes are the plain-text checkpoint names without a type prefix
+            queryset = queryset.exclude(qr_data__contains=':')
+        else:
+            queryset = queryset.filter(qr_data__startswith=f'{qr_type}:')
+    return queryset
+
+
+def scan_history_page(guard_id=None, start=None, end=None, location=None, qr_type=None,
+                      cursor=None, limit=DEFAULT_PAGE_SIZE, fields=SCAN_FIELDS):
+    """Return (rows, next_cursor) for one page of scans, newest first"""
+    queryset = filter_scans(ScanLog.objects.all(), guard_id, start, end, location, qr_type)
+    before = decode_cursor(cursor) if cursor else None
+    if before:
+        queryset = queryset.filter(Q(scanned_at__lt=before[0]) | Q(scanned_at=before[0], id__lt=before[1]))
+
+    rows = list(queryset.order_by('-scanned_at', '-id').values(*fields)[:limit + 1])
+
+    # Scans moved out by the retention job are all older than any live row, so they continue the page.
+    # The archive only holds scans from before the retention cutoff, so ranges starting later skip it.
+    if len(rows) <= limit and (start is None or start < retention_cutoff()):
+        archived = archived_scan_rows(guard_id, start, end, location, qr_type, before=before, limit=limit + 1 - len(rows))
+        rows.extend({field: row.get(field) for field in fields} for row in archived)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['scanned_at'], rows[-1]['id'])
+    return rows, next_cursor
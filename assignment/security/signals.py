@@ -0,0 +1,88 @@
+# security/signals.py
+from django.contrib.auth.models import User
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from adminstrator.models import House, Route
+from members.models import UserProfile
+from .authentication import token_cache
+from .geo_index import geo_index
+from .models import Location, SecurityProfile
+from .qr_payloads import location_index
+from .route_index import route_index
+
+
+@receiver(m2m_changed, sender=Route.checkpoints.through)
+def route_checkpoints_changed(sender, instance, action, reverse, **kwargs):
+    """Drop cached route membership when checkpoints are added to or removed from a route"""
+    if not action.startswith('post_'):
+        return
+    if reverse:
+        # instance is a UserProfile; the affected routes may belong to any guard
+        route_index.invalidate_all_guards()
+    elif instance.assigned_security_guard_id:
+        route_index.invalidate_guard(instance.assigned_security_guard_id)
+
+
+@receiver(post_save, sender=Route)
+@receiver(post_delete, sender=Route)
+def route_changed(sender, instance, **kwargs):
+    """A route may have moved between guards, so every guard entry is stale"""
+    route_index.invalidate_all_guards()
+
+
+@receiver(post_save, sender=UserProfile)
+def member_profile_saved(sender, instance, **kwargs):
+    route_index.update_member(instance)
+
+
+@receiver(post_delete, sender=UserProfile)
+def member_profile_deleted(sender, instance, **kwargs):
+    # Cascaded deletes of route membership rows do not send m2m_changed
+    route_index.forget_member(instance.id)
+    route_index.invalidate_all_guards()
+
+
+@receiver(post_save, sender=SecurityProfile)
+@receiver(post_delete, sender=SecurityProfile)
+def security_profile_changed(sender, instance, **kwargs):
+    route_index.invalidate_guard(instance.id)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_save, sender=House)
+def checkpoint_saved(sender, instance, update_fields=None, **kwargs):
+    """Move just this checkpoint in the geofence grid"""
+    if update_fields is not None and not {'latitude', 'longitude'} & set(update_fields):
+        return
+    geo_index.update('member' if sender is UserProfile else 'house', instance.id, instance.latitude, instance.longitude)
+
+
+@receiver(post_delete, sender=UserProfile)
+@receiver(post_delete, sender=House)
+def checkpoint_deleted(sender, instance, **kwargs):
+    geo_index.remove('member' if sender is UserProfile else 'house', instance.id)
+
+
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+def location_changed(sender, instance, **kwargs):
+    location_index.invalidate()
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    """Logout deletes the token; stop accepting it from the auth cache"""
+    token_cache.invalidate_key(instance.key)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=SecurityProfile)
+@receiver(post_delete, sender=SecurityProfile)
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def auth_subject_changed(sender, instance, **kwargs):
+    """Deactivation and profile status changes must reach the next request"""
+    token_cache.invalidate_user(instance.pk if sender is User else instance.user_id)
@@ -1,4 +1,4 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib.auth.models import User
 from rest_framework.test import APITestCase
 from rest_framework import status
@@ -78,4 +78,763 @@ class SecurityAuthTests(APITestCase):
         response = self.client.post('/security/login/', data, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn('token', response.data)
-        self.assertIn('user', response.data)
\ No newline at end of file
+        self.assertIn('user', response.data)
+
+class SecurityBatchScanTests(APITestCase):
+    def setUp(self):
+        from members.models import UserProfile
+        from adminstrator.models import Route
+
+        self.user = User.objects.create_user(
+            username='guard@example.com',
+            email='guard@example.com',
+            password='password123'
+        )
+        self.profile = SecurityProfile.objects.create(
+            user=self.user,
+            employee_id='SEC777777',
+            status='approved'
+        )
+        member_user = User.objects.create_user(username='member@example.com', email='member@example.com', password='pass')
+        self.member = UserProfile.objects.create(
+            user=member_user, full_name='Member One', phone='123', address='1 Patrol Rd', status='approved'
+        )
+        route = Route.objects.create(name='North Loop', assigned_security_guard=self.profile)
+        route.checkpoints.add(self.member)
+        self.client.force_authenticate(user=self.user)
+
+    def test_batch_scan_is_idempotent(self):
+        """Replaying the same scan_ids does not double-count compliance"""
+        from adminstrator.models import SecurityCompliance
+        from .models import ScanLog
+
+        payload = {'scans': [
+            {'scan_id': '2b1f6f4e-6a59-4c3f-9a59-8f3c1e0f0001', 'qr_data': f'member:{self.member.id}'},
+            {'scan_id': '2b1f6f4e-6a59-4c3f-9a59-8f3c1e0f0002', 'qr_data': f'member:{self.member.id}'},
+            {'scan_id': '2b1f6f4e-6a59-4c3f-9a59-8f3c1e0f0003', 'qr_data': 'member:99999'},
+        ]}
+
+        response = self.client.post('/security/scan-qr/batch/', payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['rejected'], 1)
+
+        response = self.client.post('/security/scan-qr/batch/', payload, format='json')
+        self.assertEqual(response.data['created'], 0)
+        self.assertEqual(response.data['duplicates'], 2)
+
+        self.assertEqual(ScanLog.objects.count(), 2)
+        compliance = SecurityCompliance.objects.get(security_guard=self.profile)
+        self.assertEqual(compliance.patrols_completed, 2)
+
+    def test_malformed_items_are_rejected_individually(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import ScanLog
+
+        qr_data = f'member:{self.member.id}'
+        payload = {'scans': [
+            {'scan_id': '2b1f6f4e-6a59-4c3f-9a59-8f3c1e0f0011', 'qr_data': 5},
+            {'scan_id': '2b1f6f4e-6a59-4c3f-9a59-8f3c1e0f0012', 'qr_data': qr_data, 'comment': ['x']},
+            {'scan_id': '2b1f6f4e-6a59-4c3f-9a59-8f3c1e0f0013', 'qr_data': qr_data, 'scanned_at': '2020-01-01T09:00:00Z'},
+            {'scan_id': '2b1f6f4e-6a59-4c3f-9a59-8f3c1e0f0014', 'qr_data': qr_data,
+             'scanned_at': (timezone.now() + timedelta(days=1)).isoformat()},
+            {'scan_id': '2b1f6f4e-6a59-4c3f-9a59-8f3c1e0f0015', 'qr_data': qr_data, 'comment': None},
+        ]}
+        response = self.client.post('/security/scan-qr/batch/', payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([result['status'] for result in response.data['results']],
+                         ['rejected', 'rejected', 'rejected', 'rejected', 'created'])
+        self.assertEqual(ScanLog.objects.get().comment, '')
+
+
+class RouteMembershipIndexTests(TestCase):
+    def setUp(self):
+        from members.models import UserProfile
+        from adminstrator.models import Route
+        from .route_index import route_index
+
+        route_index.clear()
+        guard_user = User.objects.create_user(username='guard2@example.com', email='guard2@example.com', password='pass')
+        self.guard = SecurityProfile.objects.create(user=guard_user, employee_id='SEC888888', status='approved')
+        member_user = User.objects.create_user(username='member2@example.com', email='member2@example.com', password='pass')
+        self.member = UserProfile.objects.create(
+            user=member_user, full_name='Member Two', phone='123', address='2 Patrol Rd', status='approved'
+        )
+        self.route = Route.objects.create(name='South Loop', assigned_security_guard=self.guard)
+        self.route.checkpoints.add(self.member)
+
+    def test_warm_validation_runs_no_queries(self):
+        from .qr_payloads import qr_registry
+
+        validate_qr_data = qr_registry.resolve
+
+        self.assertTrue(validate_qr_data(f'member:{self.member.id}', self.guard)['success'])
+        with self.assertNumQueries(0):
+            result = validate_qr_data(f'member:{self.member.id}', self.guard)
+        self.assertTrue(result['success'])
+        self.assertEqual(result['member']['route_name'], 'South Loop')
+
+    def test_checkpoint_removal_and_status_change_invalidate(self):
+        from .qr_payloads import qr_registry
+
+        validate_qr_data = qr_registry.resolve
+
+        self.assertTrue(validate_qr_data(f'member:{self.member.id}', self.guard)['success'])
+
+        self.member.status = 'rejected'
+        self.member.save()
+        self.assertIn('not approved', validate_qr_data(f'member:{self.member.id}', self.guard)['message'])
+
+        self.member.status = 'approved'
+        self.member.save()
+        self.route.checkpoints.remove(self.member)
+        self.assertIn('not part of your assigned patrol route', validate_qr_data(f'member:{self.member.id}', self.guard)['message'])
+
+
+
+class QRPayloadRegistryTests(APITestCase):
+    def setUp(self):
+        from adminstrator.models import House
+        from .qr_payloads import location_index
+
+        location_index.invalidate()
+        self.user = User.objects.create_user(username='guard3@example.com', email='guard3@example.com', password='pass')
+        self.guard = SecurityProfile.objects.create(user=self.user, employee_id='SEC999999', status='approved')
+        self.house = House.objects.create(
+            address='9 Elm St', owner=self.user, house_number='H-9', square_footage=900, property_type='condo'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_resolves_each_payload_type_with_one_query(self):
+        from .qr_payloads import qr_registry
+
+        with self.assertNumQueries(1):
+            result = qr_registry.resolve(f'house:{self.house.id}', self.guard)
+        self.assertEqual((result['type'], result['location']), ('house', '9 Elm St'))
+
+        with self.assertNumQueries(1):
+            self.assertEqual(qr_registry.resolve('Building A - Lobby')['type'], 'location')
+        with self.assertNumQueries(0):
+            self.assertTrue(qr_registry.resolve('location:Warehouse - Loading Bay')['success'])
+            self.assertFalse(qr_registry.resolve('Building Z - Nowhere')['success'])
+
+        self.assertIn('Invalid house QR code format', qr_registry.resolve('house:abc')['message'])
+
+    def test_deactivated_location_is_rejected(self):
+        from .models import Location
+        from .qr_payloads import qr_registry
+
+        self.assertTrue(qr_registry.resolve('Building C - Server Room')['success'])
+        Location.objects.filter(name='Building C - Server Room').get().delete()
+        self.assertFalse(qr_registry.resolve('Building C - Server Room')['success'])
+
+    def test_scan_logs_house_and_location_payloads(self):
+        from .models import ScanLog
+
+        response = self.client.post('/security/scan-qr/', {'qr_data': f'house:{self.house.id}'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post('/security/validate-qr/', {'qr_data': 'nonsense'}, format='json')
+        self.assertEqual(response.data['message'], 'Invalid QR code - not a recognized member, house, or location')
+        self.assertEqual(list(ScanLog.objects.values_list('location', flat=True)), ['9 Elm St'])
+
+class QRSigningTests(TestCase):
+    KEYS = [
+        {'id': 'k2', 'secret': 'new-secret'},
+        {'id': 'k1', 'secret': 'old-secret', 'retired': '2026-01-01'},
+    ]
+
+    def test_forged_and_tampered_codes_are_rejected_without_queries(self):
+        from .qr_payloads import qr_registry
+        from .qr_signing import sign_payload
+
+        payload = sign_payload('member', 42)
+        tampered = payload.replace('member:42.', 'member:43.')
+        with self.assertNumQueries(0):
+            self.assertEqual(qr_registry.resolve(tampered)['message'], 'QR code signature is invalid')
+            self.assertIn('unknown key', qr_registry.resolve('member:42.tk3c9s.k9.AAAAAAAAAAAAAAAA')['message'])
+        with override_settings(QR_ACCEPT_UNSIGNED=False), self.assertNumQueries(0):
+            self.assertIn('no longer accepted', qr_registry.resolve('member:42')['message'])
+
+    def test_retired_keys_are_accepted_during_the_grace_window(self):
+        from datetime import datetime, timezone
+        from .qr_signing import InvalidQRSignature, keyring, sign_payload, verify_payload
+
+        with override_settings(QR_SIGNING_KEYS=self.KEYS, QR_KEY_GRACE_DAYS=30):
+            self.assertIn('.k2.', sign_payload('house', 7))
+
+            issued = datetime(2025, 12, 1, tzinfo=timezone.utc).timestamp()
+            old = sign_payload('house', 7, issued_at=issued, key=keyring()['k1']).split(':', 1)[1]
+            within = datetime(2026, 1, 20, tzinfo=timezone.utc).timestamp()
+            self.assertEqual(verify_payload('house', old, now=within), '7')
+            after = datetime(2026, 2, 15, tzinfo=timezone.utc).timestamp()
+            with self.assertRaisesMessage(InvalidQRSignature, 'its signing key was retired'):
+                verify_payload('house', old, now=after)
+            with override_settings(QR_PAYLOAD_MAX_AGE_DAYS=30), self.assertRaisesMessage(InvalidQRSignature, 'expired'):
+                verify_payload('house', old, now=within)
+
+
+class GeofenceTests(APITestCase):
+    def setUp(self):
+        from members.models import UserProfile
+        from adminstrator.models import Route
+        from .geo_index import geo_index
+        from .route_index import route_index
+
+        geo_index.clear()
+        route_index.clear()
+        self.user = User.objects.create_user(username='geo@example.com', email='geo@example.com', password='pass')
+        self.guard = SecurityProfile.objects.create(user=self.user, employee_id='SEC555555', status='approved')
+        self.route = Route.objects.create(name='Geo Loop', assigned_security_guard=self.guard)
+        self.members = []
+        for index in range(4):
+            member_user = User.objects.create_user(username=f'geo{index}@example.com', password='pass')
+            member = UserProfile.objects.create(
+                user=member_user, full_name=f'Geo {index}', phone='1', address=f'{index} Geo Rd', status='approved',
+                latitude=51.5 + index * 0.001, longitude=-0.12,
+            )
+            self.route.checkpoints.add(member)
+            self.members.append(member)
+        self.client.force_authenticate(user=self.user)
+
+    def test_grid_updates_incrementally_and_matches_brute_force(self):
+        import random
+        import time
+        from .geo_index import CheckpointGridIndex, distance_m, geo_index
+
+        self.assertEqual(geo_index.position('member', self.members[0].id), (51.5, -0.12))
+        with self.assertNumQueries(1):
+            self.members[0].latitude = 51.51
+            self.members[0].save(update_fields=['latitude'])
+            self.assertEqual(geo_index.position('member', self.members[0].id), (51.51, -0.12))
+
+        grid, rng, points = CheckpointGridIndex(), random.Random(7), {}
+        grid._loaded_at = time.monotonic()  # Start empty instead of loading from the database
+        for object_id in range(300):
+            points[object_id] = (51.4 + rng.random() * 0.2, -0.3 + rng.random() * 0.4)
+            grid.update('member', object_id, *points[object_id])
+        for _ in range(20):
+            lat, lon = 51.4 + rng.random() * 0.2, -0.3 + rng.random() * 0.4
+            expected = sorted(round(distance_m(lat, lon, *point), 1) for point in points.values())[:5]
+            self.assertEqual([distance for distance, _, _ in grid.nearest(lat, lon)], expected)
+
+    def test_stale_grid_serves_lookups_while_reloading(self):
+        from members.models import UserProfile
+        from .geo_index import geo_index
+
+        member = self.members[0]
+        self.assertEqual(geo_index.position('member', member.id), (51.5, -0.12))
+        # Moved by another process, so no receiver here updates the grid
+        UserProfile.objects.filter(id=member.id).update(latitude=51.6)
+        geo_index._loaded_at -= 3600
+
+        geo_index._reloading = True  # Another thread is rebuilding the grid
+        with self.assertNumQueries(0):
+            self.assertEqual(geo_index.position('member', member.id), (51.5, -0.12))
+        geo_index._reloading = False
+        self.assertEqual(geo_index.position('member', member.id), (51.6, -0.12))
+
+    def test_scan_records_geofence_and_misread_offers_nearest(self):
+        from .models import ScanLog
+
+        member = self.members[1]
+        response = self.client.post('/security/scan-qr/', {
+            'qr_data': f'member:{member.id}', 'latitude': 51.501, 'longitude': -0.1201,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(response.data['geofence']['within'])
+
+        response = self.client.post('/security/scan-qr/', {
+            'qr_data': f'member:{member.id}', 'latitude': 51.52, 'longitude': -0.12,
+        }, format='json')
+        self.assertFalse(response.data['geofence']['within'])
+        with override_settings(GEOFENCE_ENFORCE=True):
+            response = self.client.post('/security/scan-qr/', {
+                'qr_data': f'member:{member.id}', 'latitude': 51.52, 'longitude': -0.12,
+            }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(list(ScanLog.objects.order_by('id').values_list('within_geofence', flat=True)), [True, False])
+        history = self.client.get('/security/scans/').data['results']
+        self.assertGreater(history[0]['geofence_distance_m'], 75)
+
+        response = self.client.post('/security/scan-qr/', {
+            'qr_data': 'member:9x', 'latitude': 51.5021, 'longitude': -0.12,
+        }, format='json')
+        self.assertEqual(response.data['nearest_checkpoints'][0]['id'], self.members[2].id)
+
+
+class PanicAlertStreamTests(TestCase):
+    def test_hub_replays_after_cursor(self):
+        from .alert_hub import AlertHub
+
+        hub = AlertHub(history=3)
+        for number in range(5):
+            hub.publish('panic_created', {'id': number})
+
+        events, complete = hub.events_after(3)
+        self.assertTrue(complete)
+        self.assertEqual([event.id for event in events], [4, 5])
+
+        # Cursor older than the replay buffer must trigger a resync
+        events, complete = hub.events_after(1)
+        self.assertFalse(complete)
+
+    def test_stream_delivers_published_events(self):
+        import asyncio
+        from .alert_hub import alert_hub
+        from .views import panic_event_stream
+
+        async def read_next_event():
+            stream = panic_event_stream(alert_hub.last_id)
+            pending = asyncio.ensure_future(stream.__anext__())
+            await asyncio.sleep(0)  # Let the stream subscribe before publishing
+            alert_hub.publish('panic_created', {'id': 42})
+            frame = await asyncio.wait_for(pending, timeout=5)
+            await stream.aclose()
+            return frame
+
+        frame = asyncio.run(read_next_event())
+        self.assertIn('event: panic_created', frame)
+        self.assertIn('"id": 42', frame)
+
+    def test_stream_picks_up_alerts_from_other_workers(self):
+        import asyncio
+        from unittest import mock
+        from asgiref.sync import async_to_sync
+        from django.utils import timezone
+        from members.models import PanicAlert
+        from .alert_hub import alert_hub
+        from .views import panic_event_stream
+
+        member = User.objects.create_user(username='elsewhere@example.com', email='elsewhere@example.com', password='pass')
+
+        async def read_polled_events():
+            stream = panic_event_stream(alert_hub.last_id)
+            pending = asyncio.ensure_future(stream.__anext__())
+            await asyncio.sleep(0)
+            # Written by another process, so this hub never publishes it
+            alert = await PanicAlert.objects.acreate(member=member, address='1 Elsewhere Rd')
+            created = await asyncio.wait_for(pending, timeout=5)
+            alert.status, alert.resolved_at = 'resolved', timezone.now()
+            await alert.asave()
+            resolved = await asyncio.wait_for(stream.__anext__(), timeout=5)
+            await stream.aclose()
+            return created, resolved, alert.id
+
+        with mock.patch('security.views.STREAM_HEARTBEAT_SECONDS', 0.05):
+            created, resolved, alert_id = async_to_sync(read_polled_events)()
+        self.assertIn('event: panic_created', created)
+        self.assertIn(f'"id": {alert_id}', created)
+        self.assertIn('event: panic_resolved', resolved)
+
+    def test_stream_is_refused_under_wsgi(self):
+        response = self.client.get('/security/panic-alerts/stream/')
+        self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+        self.assertEqual(response.json()['poll_url'], '/security/panic-alerts/')
+
+    def test_panic_publishes_event_on_commit(self):
+        from members.models import UserProfile
+        from .alert_hub import alert_hub
+
+        user = User.objects.create_user(username='panic@example.com', email='panic@example.com', password='pass')
+        UserProfile.objects.create(user=user, full_name='Panic User', phone='1', address='9 Alarm St', status='approved')
+        self.client.force_login(user)
+
+        before = alert_hub.last_id
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/members/panic/')
+        self.assertEqual(response.status_code, 200)
+
+        events, _ = alert_hub.events_after(before)
+        self.assertEqual(events[-1].type, 'panic_created')
+        self.assertEqual(events[-1].data['address'], '9 Alarm St')
+
+
+class ScanHistoryTests(APITestCase):
+    def setUp(self):
+        from .models import ScanLog
+
+        self.user = User.objects.create_user(username='history@example.com', email='history@example.com', password='pass')
+        self.profile = SecurityProfile.objects.create(user=self.user, employee_id='SEC999999', status='approved')
+        other_user = User.objects.create_user(username='other@example.com', email='other@example.com', password='pass')
+        self.other = other = SecurityProfile.objects.create(user=other_user, employee_id='SEC999998', status='approved')
+
+        for number in range(5):
+            ScanLog.objects.create(security_guard=self.profile, qr_data=f'member:{number}', location='Gate')
+        ScanLog.objects.create(security_guard=self.profile, qr_data='Building A - Lobby', location='Lobby')
+        ScanLog.objects.create(security_guard=other, qr_data='member:1')
+        self.client.force_authenticate(user=self.user)
+
+    def test_cursor_walks_every_scan_once(self):
+        seen = []
+        cursor = None
+        while True:
+            params = {'limit': 2, 'compact': 1}
+            if cursor:
+                params['cursor'] = cursor
+            response = self.client.get('/security/scans/', params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(row['id'] for row in response.data['results'])
+            self.assertEqual(set(response.data['results'][0]), {'id', 'qr_data', 'scanned_at'})
+            cursor = response.data['next_cursor']
+            if not cursor:
+                break
+
+        self.assertEqual(len(seen), 6)
+        self.assertEqual(len(set(seen)), 6)
+        self.assertEqual(seen, sorted(seen, reverse=True))
+
+    def test_filters(self):
+        response = self.client.get('/security/scans/', {'qr_type': 'location'})
+        self.assertEqual([row['qr_data'] for row in response.data['results']], ['Building A - Lobby'])
+
+        response = self.client.get('/security/scans/', {'qr_type': 'member', 'location': 'gate'})
+        self.assertEqual(len(response.data['results']), 5)
+
+        response = self.client.get('/security/scans/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_staff_guard_filter(self):
+        admin = User.objects.create_superuser(username='scanadmin', email='scanadmin@example.com', password='pass')
+        self.client.force_authenticate(user=admin)
+        response = self.client.get('/security/scans/', {'guard': self.other.id})
+        self.assertEqual([row['qr_data'] for row in response.data['results']], ['member:1'])
+        self.assertEqual(len(self.client.get('/security/scans/').data['results']), 7)
+
+        response = self.client.get('/security/scans/', {'guard': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], 'guard must be an integer')
+
+
+class ScanRetentionTests(APITestCase):
+    def setUp(self):
+        import tempfile
+        from datetime import timedelta
+        from django.test import override_settings
+        from django.utils import timezone
+        from .models import ScanLog
+
+        archive = override_settings(SCAN_ARCHIVE_DIR=tempfile.mkdtemp(), SCAN_RETENTION_DAYS=30)
+        archive.enable()
+        self.addCleanup(archive.disable)
+
+        self.user = User.objects.create_user(username='retention@example.com', email='retention@example.com', password='pass')
+        self.profile = SecurityProfile.objects.create(user=self.user, employee_id='SEC444444', status='approved')
+        for days_ago in (100, 100, 60, 1):
+            scan = ScanLog.objects.create(security_guard=self.profile, qr_data='member:7', location='Gate')
+            ScanLog.objects.filter(id=scan.id).update(scanned_at=timezone.now() - timedelta(days=days_ago))
+        self.client.force_authenticate(user=self.user)
+
+    def test_archive_rolls_up_and_history_reads_archive(self):
+        from .models import ScanDailySummary, ScanLog
+        from .retention import archive_scans
+
+        self.assertEqual(archive_scans(batch_size=2), 3)
+        self.assertEqual(ScanLog.objects.count(), 1)
+        self.assertEqual(sorted(ScanDailySummary.objects.values_list('scan_count', flat=True)), [1, 2])
+
+        response = self.client.get('/security/scans/', {'limit': 2})
+        self.assertEqual(len(response.data['results']), 2)
+        response = self.client.get('/security/scans/', {'limit': 2, 'cursor': response.data['next_cursor']})
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNone(response.data['next_cursor'])
+
+    def test_history_after_cutoff_skips_archive(self):
+        from datetime import timedelta
+        from unittest import mock
+        from django.utils import timezone
+        from .retention import archive_scans
+
+        archive_scans()
+        with mock.patch('security.scan_history.archived_scan_rows') as archived:
+            response = self.client.get('/security/scans/', {'start': (timezone.localdate() - timedelta(days=7)).isoformat()})
+        self.assertEqual(len(response.data['results']), 1)
+        archived.assert_not_called()
+
+        response = self.client.get('/security/scans/', {'end': (timezone.localdate() - timedelta(days=90)).isoformat()})
+        self.assertEqual(len(response.data['results']), 2)
+
+
+class CachedTokenAuthenticationTests(APITestCase):
+    def setUp(self):
+        from rest_framework.authtoken.models import Token
+        from .authentication import token_cache
+
+        token_cache.clear()
+        self.user = User.objects.create_user(username='auth@example.com', email='auth@example.com', password='pass')
+        SecurityProfile.objects.create(user=self.user, employee_id='SEC9001', status='approved')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_warm_request_skips_auth_queries(self):
+        self.assertEqual(self.client.get('/security/panic-alerts/').status_code, status.HTTP_200_OK)
+        # Only the active alerts query remains once the token is cached
+        with self.assertNumQueries(1):
+            response = self.client.get('/security/panic-alerts/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_deactivation_and_logout_invalidate(self):
+        self.assertEqual(self.client.get('/security/panic-alerts/').status_code, status.HTTP_200_OK)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/security/panic-alerts/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.user.is_active = True
+        self.user.save()
+        self.assertEqual(self.client.post('/security/logout/').status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get('/security/panic-alerts/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_profile_status_change_reaches_cached_user(self):
+        self.client.get('/security/profile/')
+        profile = SecurityProfile.objects.get(user=self.user)
+        profile.status = 'rejected'
+        profile.save()
+        response = self.client.get('/security/profile/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class RequestRoleTests(APITestCase):
+    def setUp(self):
+        from members.models import UserProfile
+
+        self.guard_user = User.objects.create_user(username='role-guard@example.com', email='role-guard@example.com', password='pass')
+        SecurityProfile.objects.create(user=self.guard_user, employee_id='SEC9101', status='approved')
+        self.member_user = User.objects.create_user(username='role-member@example.com', email='role-member@example.com', password='pass')
+        UserProfile.objects.create(user=self.member_user, full_name='Role Member', phone='1', address='1 Role St', status='approved')
+
+    def test_session_user_resolved_with_one_query(self):
+        from .roles import resolve_role
+
+        user = User.objects.get(pk=self.guard_user.pk)
+        with self.assertNumQueries(1):
+            role = resolve_role(user)
+            self.assertEqual(user.security_profile, role.security_profile)
+        self.assertTrue(role.is_approved_guard)
+        self.assertIsNone(role.member_profile)
+        self.assertEqual(role.name, 'guard')
+
+    def test_permissions_separate_guards_and_members(self):
+        self.client.force_authenticate(self.member_user)
+        self.assertEqual(self.client.get('/security/panic-alerts/').status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.client.get('/members/profile/').status_code, status.HTTP_200_OK)
+
+        self.client.force_authenticate(self.guard_user)
+        self.assertEqual(self.client.get('/security/panic-alerts/').status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get('/members/profile/').status_code, status.HTTP_403_FORBIDDEN)
+
+
+@override_settings(INSTRUMENTATION_ENABLED=True)
+class InstrumentationTests(APITestCase):
+    def setUp(self):
+        from .instrumentation import metrics
+
+        metrics.clear()
+        self.admin = User.objects.create_superuser('metrics-admin', 'metrics-admin@example.com', 'pass')
+        self.guard_user = User.objects.create_user(username='metrics@example.com', email='metrics@example.com', password='pass')
+        SecurityProfile.objects.create(user=self.guard_user, employee_id='SEC9201', status='approved')
+
+    def test_records_views_and_exports_prometheus(self):
+        from members.models import PanicAlert
+        from .instrumentation import metrics
+
+        for index in range(3):
+            PanicAlert.objects.create(member=self.guard_user, address=f'{index} Metric St')
+        self.client.force_authenticate(self.guard_user)
+        self.client.get('/security/panic-alerts/')
+
+        row = next(row for row in metrics.summary() if row['view'] == 'security:get_panic_alerts')
+        self.assertEqual(row['requests'], 1)
+        self.assertEqual(row['statuses'], {'2xx': 1})
+        self.assertGreater(row['response_bytes'], 0)
+        self.assertEqual(row['duplicate_query_requests'], 0)
+
+        self.assertEqual(self.client.get('/security/metrics/').status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_authenticate(self.admin)
+        response = self.client.get('/security/metrics/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        body = response.content.decode()
+        self.assertIn('http_requests_total{view="security:get_panic_alerts",status="2xx"} 1', body)
+        self.assertIn('http_request_duration_seconds_bucket{view="security:get_panic_alerts",le="+Inf"} 1', body)
+
+    def test_flags_repeated_queries(self):
+        from .instrumentation import MetricsRegistry, QueryCollector
+
+        collector = QueryCollector()
+        for _ in range(4):
+            collector(lambda *args: None, 'SELECT 1 FROM member WHERE id = %s', (1,), False, {})
+        registry = MetricsRegistry()
+        registry.record('members:get_profile', 200, 0.01, collector, 10)
+        self.assertEqual(registry.summary()[0]['duplicate_query_requests'], 1)
+
+
+class LogPipelineTests(TestCase):
+    def setUp(self):
+        import tempfile
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def _logger(self, handler):
+        import logging
+        test_logger = logging.getLogger(f'security.tests.pipeline.{id(handler)}')
+        test_logger.propagate = False
+        test_logger.setLevel(logging.DEBUG)
+        test_logger.addHandler(handler)
+        self.addCleanup(test_logger.removeHandler, handler)
+        return test_logger
+
+    def test_writes_json_lines_off_thread(self):
+        import json
+        import os
+        from .log_pipeline import AsyncLogHandler
+
+        path = os.path.join(self.directory.name, 'pipeline.log')
+        handler = AsyncLogHandler(filename=path, console=False)
+        test_logger = self._logger(handler)
+        handler.listener.stop()  # Hold records in the queue while the argument changes
+        checkpoints = ['north']
+        test_logger.info("Scan completed for %s at %s", 'guard@example.com', checkpoints, extra={'scan_id': 7})
+        checkpoints.append('south')
+        try:
+            raise ValueError('bad scan')
+        except ValueError:
+            test_logger.exception("Scan failed")
+        handler.listener.start()
+        handler.stop()
+
+        with open(path) as log_file:
+            entry, failure = [json.loads(line) for line in log_file]
+        self.assertEqual(entry['message'], "Scan completed for guard@example.com at ['north']")
+        self.assertEqual(entry['scan_id'], 7)
+        self.assertEqual(entry['level'], 'INFO')
+        self.assertIn('ValueError: bad scan', failure['exception'])
+
+    def test_full_queue_drops_and_debug_is_sampled(self):
+        from .log_pipeline import AsyncLogHandler, SamplingFilter, pipeline_stats
+
+        handler = AsyncLogHandler(console=False, queue_size=1)
+        handler.listener.stop()  # Nothing drains the queue now
+        sampler = SamplingFilter(debug_rate=4)
+        handler.addFilter(sampler)
+        test_logger = self._logger(handler)
+
+        for number in range(8):
+            test_logger.debug("debug %s", number)
+        test_logger.warning("warning")
+
+        self.assertEqual(sampler.sampled_out, 6)
+        # Two sampled debug records and the warning reached a queue with room for one
+        self.assertEqual(handler.dropped, 2)
+        self.assertGreaterEqual(pipeline_stats()['dropped'], 2)
+
+
+class DatabaseProfileTests(TestCase):
+    def test_profiles_are_read_from_the_environment(self):
+        from pathlib import Path
+        from assignment.database import database_settings
+
+        sqlite = database_settings(Path('/srv'), env={})['default']
+        self.assertEqual(sqlite['ENGINE'], 'django.db.backends.sqlite3')
+        self.assertEqual(sqlite['NAME'], Path('/srv/db.sqlite3'))
+
+        postgres = database_settings(Path('/srv'), env={
+            'DB_PROFILE': 'postgres', 'DB_NAME': 'estate', 'DB_HOST': 'pgbouncer', 'DB_PGBOUNCER': '1',
+        })['default']
+        self.assertEqual(postgres['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual((postgres['NAME'], postgres['HOST'], postgres['CONN_MAX_AGE']), ('estate', 'pgbouncer', 60))
+        self.assertTrue(postgres['DISABLE_SERVER_SIDE_CURSORS'])
+
+        replicated = database_settings(Path('/srv'), env={'DB_REPLICA_NAME': '/srv/replica.sqlite3'})
+        self.assertEqual(replicated['replica']['NAME'], '/srv/replica.sqlite3')
+        self.assertEqual(replicated['replica']['TEST'], {'MIRROR': 'default'})
+        self.assertNotIn('replica', database_settings(Path('/srv'), env={}))
+
+        with self.assertRaises(ValueError):
+            database_settings(Path('/srv'), env={'DB_PROFILE': 'oracle'})
+
+    def test_sqlite_connections_get_the_configured_pragmas(self):
+        from django.db import connection
+
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 20000)
+
+
+@override_settings(DATABASE_REPLICA_ALIAS='replica', REPLICA_PIN_SECONDS=60)
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        from .replicas import primary_pins
+        primary_pins.clear()
+        self.addCleanup(primary_pins.clear)
+
+    def _call(self, method, view, token='Token abc', write=False, cookies=None, read_model=None):
+        """Run view through the middleware; return (read alias seen by the view, response)"""
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from .models import ScanLog
+        from .replicas import ReplicaRouter, ReplicaRoutingMiddleware
+
+        router = ReplicaRouter()
+        seen = []
+
+        def view_func(request):
+            if write:
+                router.db_for_write(ScanLog)
+            seen.append(router.db_for_read(read_model or ScanLog))
+            return HttpResponse()
+        if view:
+            view_func.replica_reads = True
+
+        request = getattr(RequestFactory(), method)('/report/', HTTP_AUTHORIZATION=token)
+        request.COOKIES.update(cookies or {})
+        middleware = ReplicaRoutingMiddleware(lambda request: middleware.process_view(request, view_func, (), {}) or view_func(request))
+        response = middleware(request)
+        return seen[0], response
+
+    def test_only_marked_read_requests_use_the_replica(self):
+        self.assertEqual(self._call('get', view=True)[0], 'replica')
+        self.assertIsNone(self._call('get', view=False)[0])
+        self.assertIsNone(self._call('post', view=True)[0])
+
+    def test_a_write_pins_the_client_to_the_primary(self):
+        from .replicas import PIN_COOKIE, ReplicaRouter
+        from .models import ScanLog
+
+        alias, response = self._call('get', view=True, write=True)
+        self.assertIsNone(alias)  # Reads after the write stay on the primary
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        self.assertIsNone(self._call('get', view=True)[0])
+        self.assertEqual(self._call('get', view=True, token='Token other')[0], 'replica')
+        self.assertIsNone(self._call('get', view=True, token='', cookies={PIN_COOKIE: '1'})[0])
+        # Outside a request nothing is routed, and credentials never are
+        self.assertIsNone(ReplicaRouter().db_for_read(ScanLog))
+        from rest_framework.authtoken.models import Token
+        self.assertIsNone(self._call('get', view=True, token='Token fresh', read_model=Token)[0])
+
+    def test_cached_summaries_are_computed_on_the_primary(self):
+        from adminstrator.compliance_summary import rebuild_summaries
+        from adminstrator.dashboard_summary import dashboard_summary
+        from adminstrator.models import GuardComplianceSummary
+        from .replicas import _RequestState, _request_state
+
+        user = User.objects.create_user(username='lag@example.com', email='lag@example.com', password='pass')
+        guard = SecurityProfile.objects.create(user=user, employee_id='SEC-LAG', status='approved')
+        dashboard_summary.invalidate()
+        state = _RequestState(None)
+        state.read_alias = 'replica'  # Not configured in tests, so any read routed there would fail
+        token = _request_state.set(state)
+        try:
+            self.assertEqual(dashboard_summary.get()['approved_security_count'], 1)
+            self.assertEqual(rebuild_summaries([guard.id]), 1)
+        finally:
+            _request_state.reset(token)
+            dashboard_summary.invalidate()
+        self.assertTrue(GuardComplianceSummary.objects.filter(security_guard=guard).exists())
+
+    def test_middleware_is_dropped_without_a_replica(self):
+        from django.core.exceptions import MiddlewareNotUsed
+        from .replicas import ReplicaRoutingMiddleware
+
+        with override_settings(DATABASE_REPLICA_ALIAS=None):
+            with self.assertRaises(MiddlewareNotUsed):
+                ReplicaRoutingMiddleware(lambda request: None)
@@ -7,12 +7,19 @@ app_name = 'security'
 urlpatterns = [
     path('signup/', views.security_signup, name='security_signup'),
     path('login/', views.security_login, name='security_login'),
+    path('logout/', views.security_logout, name='security_logout'),
     path('profile/', views.security_profile, name='security_profile'),
     path('compliance/', views.security_compliance, name='security_compliance'),
     path('route/', views.security_route, name='security_route'),
     path('validate-qr/', views.security_validate_qr, name='security_validate_qr'),
     path('scan-qr/', views.security_scan_qr, name='security_scan_qr'),
+    path('scan-qr/batch/', views.security_scan_qr_batch, name='security_scan_qr_batch'),
+    path('checkpoints/nearest/', views.security_nearest_checkpoints, name='security_nearest_checkpoints'),
+    path('scans/', views.security_scan_history, name='security_scan_history'),
     path('log-scan/', views.security_log_scan, name='security_log_scan'),
+    path('route-index/stats/', views.route_index_stats, name='route_index_stats'),
+    path('metrics/', views.metrics, name='metrics'),
     path('panic-alerts/', views.get_panic_alerts, name='get_panic_alerts'),
+    path('panic-alerts/stream/', views.panic_alert_stream, name='panic_alert_stream'),
     path('resolve-alert/', views.resolve_panic_alert, name='resolve_panic_alert'),
 ]
\ No newline at end of file
@@ -1,41 +1,67 @@
+import asyncio
 import logging
 import random
 import string
 import time
 import uuid
+from collections import Counter
+from datetime import date, timedelta
+from asgiref.sync import sync_to_async
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
 from django.contrib.auth.models import User
+from django.conf import settings
 from django.contrib.auth import authenticate
+from django.core.handlers.asgi import ASGIRequest
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from rest_framework.authtoken.models import Token
 from .models import SecurityProfile, ScanLog
-from adminstrator.models import SecurityCompliance
+from .authentication import CachedTokenAuthentication
+from .permissions import IsApprovedGuard, IsApprovedGuardOrStaff
+from .geo_index import geo_index, scan_geofence, scan_position
+from .qr_payloads import qr_registry
+from .replicas import replica_reads
+from .roles import request_role, resolve_role
+from .route_index import route_index
+from .alert_hub import alert_hub, alert_payload, format_sse
+from . import instrumentation, log_pipeline, scan_history
+from adminstrator.models import House, SecurityCompliance
+from adminstrator.compliance_counters import record_checkpoint_scans
+from adminstrator import route_progress
 from members.models import PanicAlert
 
 # Setup logger
 logger = logging.getLogger(__name__)
 
+# Upper bound on scans accepted by a single batch upload
+MAX_BATCH_SCANS = 500
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def security_signup(request):
     logger.info("Security signup attempt received.")
     try:
         data = request.data
-        logger.debug(f"Signup data: {data}")
+        logger.debug("Signup fields: %s", sorted(data))
 
         # Required fields
         required_fields = ['first_name', 'last_name', 'email', 'password']
         for field in required_fields:
             if field not in data or not data[field]:
-                logger.warning(f"Missing required field: {field}")
+                logger.warning("Missing required field: %s", field)
                 return Response({'error': f'{field} is required'}, status=status.HTTP_400_BAD_REQUEST)
 
         # Check existing user
         if User.objects.filter(email=data['email']).exists():
-            logger.warning(f"Duplicate email signup attempt: {data['email']}")
+            logger.warning("Duplicate email signup attempt: %s", data['email'])
             return Response({'error': 'Email already exists'}, status=status.HTTP_400_BAD_REQUEST)
 
         # Generate unique employee ID
@@ -52,7 +78,7 @@ def security_signup(request):
             return f'SEC{uuid.uuid4().hex[:8].upper()}'
 
         employee_id = generate_employee_id()
-        logger.debug(f"Generated employee ID: {employee_id}")
+        logger.debug("Generated employee ID: %s", employee_id)
 
         # Create user
         user = User.objects.create_user(
@@ -62,7 +88,7 @@ def security_signup(request):
             first_name=data['first_name'],
             last_name=data['last_name']
         )
-        logger.info(f"User created: {user.email}")
+        logger.info("User created: %s", user.email)
 
         # Create security profile
         SecurityProfile.objects.create(
@@ -73,7 +99,7 @@ def security_signup(request):
             employee_id=employee_id,
             status='pending'
         )
-        logger.info(f"Security profile created for {user.email}")
+        logger.info("Security profile created for %s", user.email)
 
         return Response({
             'success': True,
@@ -93,7 +119,7 @@ def security_login(request):
     logger.info("Security login attempt received.")
     try:
         data = request.data
-        logger.debug(f"Login data: {data}")
+        logger.debug("Login attempt for %s", data.get('email'))
 
         email = data.get('email')
         password = data.get('password')
@@ -105,27 +131,27 @@ def security_login(request):
         try:
             user = User.objects.get(email=email)
         except User.DoesNotExist:
-            logger.warning(f"Login failed: Unknown email {email}")
+            logger.warning("Login failed: Unknown email %s", email)
             return Response({'error': 'Invalid email or password'}, status=status.HTTP_401_UNAUTHORIZED)
 
         user = authenticate(username=user.username, password=password)
         if user is None:
-            logger.warning(f"Authentication failed for email {email}")
+            logger.warning("Authentication failed for email %s", email)
             return Response({'error': 'Invalid email or password'}, status=status.HTTP_401_UNAUTHORIZED)
 
         # Check profile status
         try:
             profile = SecurityProfile.objects.get(user=user)
         except SecurityProfile.DoesNotExist:
-            logger.error(f"Security profile missing for {email}")
+            logger.error("Security profile missing for %s", email)
             return Response({'error': 'Security profile not found'}, status=status.HTTP_404_NOT_FOUND)
 
         if profile.status != 'approved':
-            logger.info(f"User {email} attempted login with status {profile.status}")
+            logger.info("User %s attempted login with status %s", email, profile.status)
             return Response({'error': f'Account is {profile.status}. Please contact administrator.'}, status=status.HTTP_403_FORBIDDEN)
 
         token, _ = Token.objects.get_or_create(user=user)
-        logger.debug(f"Token issued for {email}")
+        logger.debug("Token issued for %s", email)
 
         return Response({
             'success': True,
@@ -145,112 +171,44 @@ def security_login(request):
         return Response({'error': f'Login failed: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-@api_view(['GET'])
+@api_view(['POST'])
 @permission_classes([IsAuthenticated])
-def security_profile(request):
-    logger.info(f"Profile requested by {request.user.email}")
-    try:
-        profile = SecurityProfile.objects.get(user=request.user)
-        logger.debug(f"Profile found for {request.user.email}")
-
-        return Response({
-            'user': {
-                'id': request.user.id,
-                'email': request.user.email,
-                'first_name': request.user.first_name,
-                'last_name': request.user.last_name,
-            },
-            'profile': {
-                'employee_id': profile.employee_id,
-                'phone_number': profile.phone_number,
-                'address': profile.address,
-                'date_of_birth': profile.date_of_birth,
-                'status': profile.status,
-            }
-        })
-    except SecurityProfile.DoesNotExist:
-        logger.error(f"Profile not found for {request.user.email}")
-        return Response({'error': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
-
-
-
-
-def validate_qr_data(qr_data, security_profile):
-    """Helper function to validate QR data for scanning"""
-    from members.models import UserProfile
-    from adminstrator.models import Route
-
-    qr_data_clean = qr_data.strip()
-
-    if qr_data_clean.startswith('member:'):
-        try:
-            parts = qr_data_clean.split(':')
-            if len(parts) >= 2:
-                member_id_str = parts[1].strip()
-                member_id = int(member_id_str)
-            else:
-                raise ValueError("No member ID found after 'member:'")
-
-            # Check if the member exists and is approved
-            try:
-                member = UserProfile.objects.get(id=member_id)
-                if member.status != 'approved':
-                    return {
-                        'success': False,
-                        'message': f'Member {member.full_name} is not approved'
-                    }
-            except UserProfile.DoesNotExist:
-                return {
-                    'success': False,
-                    'message': f'Member not found for ID {member_id}'
-                }
+def security_logout(request):
+    """Revoke the caller's token; deleting it also evicts it from the auth cache"""
+    logger.info("Logout requested by %s", request.user.email)
+    if isinstance(request.auth, Token):
+        request.auth.delete()
+    return Response({'success': True, 'message': 'Logged out'})
 
-            # Check if the guard has an assigned route that includes this member
-            assigned_route = Route.objects.filter(
-                assigned_security_guard=security_profile,
-                checkpoints__id=member_id
-            ).first()
 
-            if not assigned_route:
-                return {
-                    'success': False,
-                    'message': f'Member {member.full_name} is not part of your assigned patrol route'
-                }
-
-            return {
-                'success': True,
-                'type': 'member_checkpoint',
-                'member': {
-                    'id': member.id,
-                    'full_name': member.full_name,
-                    'address': member.address,
-                    'route_name': assigned_route.name,
-                },
-                'location': member.address,
-                'message': f'Member checkpoint {member.full_name} validated successfully for route {assigned_route.name}'
-            }
-        except (ValueError, IndexError) as e:
-            return {
-                'success': False,
-                'message': f'Invalid member QR code format: {str(e)}'
-            }
-        except Exception as e:
-            return {
-                'success': False,
-                'message': f'Error validating member QR code: {str(e)}'
-            }
-
-    # For now, only support member QR codes
-    return {
-        'success': False,
-        'message': 'Unsupported QR code type'
-    }
+@api_view(['GET'])
+@permission_classes([IsApprovedGuard])
+def security_profile(request):
+    logger.info("Profile requested by %s", request.user.email)
+    profile = request.role.security_profile
+    logger.debug("Profile found for %s", request.user.email)
+
+    return Response({
+        'user': {
+            'id': request.user.id,
+            'email': request.user.email,
+            'first_name': request.user.first_name,
+            'last_name': request.user.last_name,
+        },
+        'profile': {
+            'employee_id': profile.employee_id,
+            'phone_number': profile.phone_number,
+            'address': profile.address,
+            'date_of_birth': profile.date_of_birth,
+            'status': profile.status,
+        }
+    })
 
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def security_validate_qr(request):
-    logger.info(f"QR validation requested by {request.user.email}")
+    logger.info("QR validation requested by %s", request.user.email)
     try:
         data = request.data
         qr_data = data.get('qr_data')
@@ -258,176 +216,8 @@ def security_validate_qr(request):
         if not qr_data:
             return Response({'error': 'qr_data is required'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Check if it's a member QR code (format: "member:{user_id}")
-        qr_data_clean = qr_data.strip()  # Remove any whitespace
-        if qr_data_clean.startswith('member:'):
-            logger.info(f"Processing member QR code: '{qr_data}' (cleaned: '{qr_data_clean}')")
-            try:
-                # Split and get the member ID, handling potential extra colons
-                parts = qr_data_clean.split(':')
-                if len(parts) >= 2:
-                    member_id_str = parts[1].strip()
-                    member_id = int(member_id_str)
-                else:
-                    raise ValueError("No member ID found after 'member:'")
-
-                logger.info(f"Extracted member_id: {member_id}")
-                from members.models import UserProfile
-
-                # First check if the user exists
-                try:
-                    member_profile = UserProfile.objects.get(user_id=member_id)
-                    logger.info(f"Found member profile: {member_profile}, status: '{member_profile.status}'")
-                except UserProfile.DoesNotExist:
-                    logger.warning(f"UserProfile not found for user_id: {member_id}")
-                    # Let's also check if there are any UserProfiles at all
-                    total_profiles = UserProfile.objects.count()
-                    logger.info(f"Total UserProfiles in database: {total_profiles}")
-                    return Response({
-                        'success': False,
-                        'message': f'Member profile not found for ID {member_id}'
-                    })
-
-                # Check if approved - be more flexible with status checking
-                if member_profile.status not in ['approved', 'Approved']:
-                    logger.warning(f"Member {member_id} has status: '{member_profile.status}', not approved")
-                    return Response({
-                        'success': False,
-                        'message': f'Member status is {member_profile.status}, not approved'
-                    })
-
-                logger.info(f"Successfully validated member: {member_profile.full_name}")
-                return Response({
-                    'success': True,
-                    'type': 'member',
-                    'member': {
-                        'id': member_profile.user.id,
-                        'full_name': member_profile.full_name,
-                        'email': member_profile.user.email,
-                        'phone': member_profile.phone,
-                        'address': member_profile.address,
-                    },
-                    'message': f'Member {member_profile.full_name} verified successfully'
-                })
-            except (ValueError, IndexError) as e:
-                logger.error(f"Error parsing member QR code '{qr_data}': {e}")
-                return Response({
-                    'success': False,
-                    'message': f'Invalid member QR code format: {str(e)}'
-                })
-            except Exception as e:
-                logger.error(f"Unexpected error validating member QR code: {e}")
-                return Response({
-                    'success': False,
-                    'message': f'Error validating member QR code: {str(e)}'
-                })
-
-        # Check if it's a member checkpoint QR code for patrol routes
-        if qr_data_clean.startswith('member:'):
-            logger.info(f"Processing member checkpoint QR code: '{qr_data}' (cleaned: '{qr_data_clean}')")
-            try:
-                # Split and get the member ID
-                parts = qr_data_clean.split(':')
-                if len(parts) >= 2:
-                    member_id_str = parts[1].strip()
-                    member_id = int(member_id_str)
-                else:
-                    raise ValueError("No member ID found after 'member:'")
-
-                logger.info(f"Extracted member_id: {member_id}")
-                from members.models import UserProfile
-                from adminstrator.models import Route
-
-                # Check if the member exists and is approved
-                try:
-                    member = UserProfile.objects.get(id=member_id)
-                    if member.status != 'approved':
-                        logger.warning(f"Member {member_id} has status: '{member.status}', not approved")
-                        return Response({
-                            'success': False,
-                            'message': f'Member {member.full_name} is not approved'
-                        })
-                    logger.info(f"Found approved member: {member.full_name} - {member.address}")
-                except UserProfile.DoesNotExist:
-                    logger.warning(f"Member not found for id: {member_id}")
-                    return Response({
-                        'success': False,
-                        'message': f'Member not found for ID {member_id}'
-                    })
-
-                # Get the security guard's profile
-                try:
-                    security_profile = SecurityProfile.objects.get(user=request.user)
-                except SecurityProfile.DoesNotExist:
-                    logger.error(f"Security profile not found for {request.user.email}")
-                    return Response({
-                        'success': False,
-                        'message': 'Security profile not found'
-                    })
-
-                # Check if the guard has an assigned route that includes this member
-                assigned_route = Route.objects.filter(
-                    assigned_security_guard=security_profile,
-                    checkpoints__id=member_id
-                ).first()
-
-                if not assigned_route:
-                    logger.warning(f"Member {member_id} is not in {request.user.email}'s assigned route")
-                    return Response({
-                        'success': False,
-                        'message': f'Member {member.full_name} is not part of your assigned patrol route'
-                    })
-
-                logger.info(f"Successfully validated member checkpoint: {member.full_name} for guard {request.user.email}")
-                return Response({
-                    'success': True,
-                    'type': 'member_checkpoint',
-                    'member': {
-                        'id': member.id,
-                        'full_name': member.full_name,
-                        'address': member.address,
-                        'route_name': assigned_route.name,
-                    },
-                    'message': f'Member checkpoint {member.full_name} validated successfully for route {assigned_route.name}'
-                })
-            except (ValueError, IndexError) as e:
-                logger.error(f"Error parsing member checkpoint QR code '{qr_data}': {e}")
-                return Response({
-                    'success': False,
-                    'message': f'Invalid member checkpoint QR code format: {str(e)}'
-                })
-            except Exception as e:
-                logger.error(f"Unexpected error validating member checkpoint QR code: {e}")
-                return Response({
-                    'success': False,
-                    'message': f'Error validating member checkpoint QR code: {str(e)}'
-                })
-
-        # Check if it's a location QR code for patrol routes
-        valid_locations = [
-            'Building A - Lobby',
-            'Building B - North Entrance',
-            'Building C - Server Room',
-            'Parking Garage - Level 2',
-            'Main Gate - Security Booth',
-            'Building D - Roof Access',
-            'Warehouse - Loading Bay',
-            'Admin Building - Rear Entrance'
-        ]
-
-        if qr_data in valid_locations:
-            return Response({
-                'success': True,
-                'type': 'location',
-                'location': qr_data,
-                'message': 'Location QR code validated successfully'
-            })
-
-        # If neither member, house, nor location, it's invalid
-        return Response({
-            'success': False,
-            'message': 'Invalid QR code - not a recognized member, house, or location'
-        })
+        security_profile = request_role(request).security_profile
+        return Response(qr_registry.resolve(qr_data, security_profile))
 
     except Exception as e:
         logger.exception("Error validating QR")
@@ -437,7 +227,7 @@ def security_validate_qr(request):
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def security_update_progress(request):
-    logger.info(f"Progress update requested by {request.user.email}")
+    logger.info("Progress update requested by %s", request.user.email)
     try:
         data = request.data
         route_id = data.get('route_id')
@@ -454,28 +244,81 @@ def security_update_progress(request):
         return Response({'error': f'Update failed: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def nearest_checkpoint_payloads(security_profile, latitude, longitude, limit=5):
+    """Checkpoints closest to a position: members on the guard's routes and houses"""
+    route_checkpoints = route_index.checkpoints_for(security_profile.id)
+    nearest = geo_index.nearest(
+        latitude, longitude, limit=limit,
+        max_distance_m=getattr(settings, 'GEO_NEAREST_MAX_METERS', 1000),
+        include=lambda kind, object_id: kind == 'house' or object_id in route_checkpoints,
+    )
+    house_ids = [object_id for _, kind, object_id in nearest if kind == 'house']
+    houses = {
+        house['id']: house for house in House.objects.filter(id__in=house_ids).values('id', 'house_number', 'address')
+    } if house_ids else {}
+
+    payloads = []
+    for distance, kind, object_id in nearest:
+        if kind == 'member':
+            member = route_index.get_member(object_id)
+            name, address = (member.full_name, member.address) if member else ('', '')
+        else:
+            house = houses.get(object_id, {})
+            name, address = house.get('house_number', ''), house.get('address', '')
+        payloads.append({'type': kind, 'id': object_id, 'name': name, 'address': address, 'distance_m': distance})
+    return payloads
+
+
+@api_view(['GET'])
+@permission_classes([IsApprovedGuard])
+def security_nearest_checkpoints(request):
+    """Checkpoints nearest to ?latitude=&longitude=, for recovering from a misread code"""
+    try:
+        position = scan_position(request.query_params)
+        limit = min(max(int(request.query_params.get('limit', 5)), 1), 20)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if position is None:
+        return Response({'error': 'latitude and longitude are required'}, status=status.HTTP_400_BAD_REQUEST)
+
+    profile = request.role.security_profile
+    return Response({'checkpoints': nearest_checkpoint_payloads(profile, *position, limit=limit)})
+
+
 @api_view(['POST'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsApprovedGuard])
 def security_scan_qr(request):
-    logger.info(f"QR scan requested by {request.user.email}")
+    logger.info("QR scan requested by %s", request.user.email)
     try:
         data = request.data
         qr_data = data.get('qr_data')
         comment = data.get('comment', '')
         scan_status = data.get('scan_status', 'completed')
-        latitude = data.get('latitude')
-        longitude = data.get('longitude')
 
         if not qr_data:
             return Response({'error': 'qr_data is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            position = scan_position(data)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         # Get security profile
-        profile = SecurityProfile.objects.get(user=request.user)
+        profile = request.role.security_profile
 
-        # Validate the QR code inline
-        validation_result = validate_qr_data(qr_data, profile)
+        validation_result = qr_registry.resolve(qr_data, profile)
         if not validation_result['success']:
-            return Response({'error': f'Validation failed: {validation_result["message"]}'}, status=status.HTTP_400_BAD_REQUEST)
+            error = {'error': f'Validation failed: {validation_result["message"]}'}
+            if position:
+                # A misread code: offer the checkpoints the guard is standing next to
+                error['nearest_checkpoints'] = nearest_checkpoint_payloads(profile, *position)
+            return Response(error, status=status.HTTP_400_BAD_REQUEST)
+
+        geofence = scan_geofence(validation_result, position)
+        if geofence and not geofence['within'] and getattr(settings, 'GEOFENCE_ENFORCE', False):
+            return Response({
+                'error': f"Scan is {geofence['distance_m']} m from the checkpoint, outside its {geofence['radius_m']} m geofence",
+                'geofence': geofence,
+            }, status=status.HTTP_400_BAD_REQUEST)
 
         # Log the scan
         scan_log = ScanLog.objects.create(
@@ -483,59 +326,211 @@ def security_scan_qr(request):
             qr_data=qr_data,
             comment=comment,
             location=validation_result.get('location') or validation_result.get('member', {}).get('address', ''),
+            latitude=position[0] if position else None,
+            longitude=position[1] if position else None,
+            geofence_distance_m=geofence['distance_m'] if geofence else None,
+            within_geofence=geofence['within'] if geofence else None,
         )
 
         # Update compliance if it's a member checkpoint scan
         if validation_result.get('type') == 'member_checkpoint':
-            from adminstrator.models import SecurityCompliance
-            from datetime import date
-
-            today = date.today()
-            compliance, created = SecurityCompliance.objects.get_or_create(
-                security_guard=profile,
-                date=today,
-                defaults={
-                    'shift_start': '09:00:00',  # Default shift start
-                    'shift_end': '17:00:00',    # Default shift end
-                    'patrols_completed': 0,
-                    'incidents_reported': 0,
-                    'tasks_completed': 0,
-                    'total_tasks_assigned': 5,  # Default tasks
-                    'on_time': True,
-                    'notes': '',
-                }
-            )
-
-            # Increment patrols and tasks completed
-            compliance.patrols_completed += 1
-            compliance.tasks_completed += 1
-            compliance.save()
-
-            logger.info(f"Updated compliance for {request.user.email}: patrols_completed = {compliance.patrols_completed}, tasks_completed = {compliance.tasks_completed}")
+            record_checkpoint_scans(profile.id, date.today())
+            logger.info("Updated compliance for %s", request.user.email)
 
-        logger.info(f"Scan completed for {request.user.email}: {qr_data}")
+        logger.info("Scan completed for %s: %s", request.user.email, qr_data)
         return Response({
             'success': True,
             'message': 'Scan logged successfully',
             'scan_id': scan_log.id,
-            'validation': validation_result
+            'validation': validation_result,
+            'geofence': geofence,
         }, status=status.HTTP_201_CREATED)
 
-    except SecurityProfile.DoesNotExist:
-        logger.error(f"Profile not found for {request.user.email}")
-        return Response({'error': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
         logger.exception("Error processing scan")
         return Response({'error': f'Scan failed: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
 @api_view(['POST'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsApprovedGuard])
+def security_scan_qr_batch(request):
+    """Ingest scans replayed by a guard device that was offline.
+
+    Expects {"scans": [{"scan_id": <uuid>, "qr_data": ..., "comment": ..., "scanned_at": <iso8601>,
+    "latitude": ..., "longitude": ...}]}.
+    Scans whose scan_id was already stored are reported as duplicates, so retries never double-count.
+    Malformed items, and scanned_at values in the future or older than OFFLINE_SCAN_MAX_AGE_HOURS,
+    are rejected one by one without failing the batch.
+    """
+    logger.info("Batch QR scan requested by %s", request.user.email)
+    try:
+        scans = request.data.get('scans')
+        if not isinstance(scans, list) or not scans:
+            return Response({'error': 'scans must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(scans) > MAX_BATCH_SCANS:
+            return Response({'error': f'A batch may contain at most {MAX_BATCH_SCANS} scans'}, status=status.HTTP_400_BAD_REQUEST)
+
+        profile = request.role.security_profile
+        enforce_geofence = getattr(settings, 'GEOFENCE_ENFORCE', False)
+
+        # Device clocks may run a little fast; replays older than the window are not credited
+        now = timezone.now()
+        max_age_hours = getattr(settings, 'OFFLINE_SCAN_MAX_AGE_HOURS', 72)
+        latest_scanned_at = now + timedelta(seconds=getattr(settings, 'OFFLINE_SCAN_CLOCK_SKEW_SECONDS', 300))
+        earliest_scanned_at = now - timedelta(hours=max_age_hours)
+
+        results = [None] * len(scans)
+        accepted = []  # (index, ScanLog, validation_result)
+        accepted_ids = set()
+
+        for index, item in enumerate(scans):
+            if not isinstance(item, dict):
+                results[index] = {'scan_id': None, 'status': 'rejected', 'message': 'Scan must be an object'}
+                continue
+
+            raw_scan_id = item.get('scan_id')
+            try:
+                scan_id = uuid.UUID(str(raw_scan_id))
+            except ValueError:
+                results[index] = {'scan_id': raw_scan_id, 'status': 'rejected', 'message': 'scan_id must be a UUID'}
+                continue
+
+            if scan_id in accepted_ids:
+                results[index] = {'scan_id': str(scan_id), 'status': 'duplicate', 'message': 'Repeated within batch'}
+                continue
+
+            qr_data = item.get('qr_data')
+            if not qr_data or not isinstance(qr_data, str):
+                results[index] = {'scan_id': str(scan_id), 'status': 'rejected', 'message': 'qr_data must be a non-empty string'}
+                continue
+            comment = item.get('comment') or ''
+            if not isinstance(comment, str):
+                results[index] = {'scan_id': str(scan_id), 'status': 'rejected', 'message': 'comment must be a string'}
+                continue
+
+            scanned_at = None
+            if item.get('scanned_at'):
+                scanned_at = parse_datetime(str(item['scanned_at']))
+                if scanned_at is None:
+                    results[index] = {'scan_id': str(scan_id), 'status': 'rejected', 'message': 'scanned_at is not a valid ISO 8601 timestamp'}
+                    continue
+                if timezone.is_naive(scanned_at):
+                    scanned_at = timezone.make_aware(scanned_at)
+                if scanned_at > latest_scanned_at:
+                    results[index] = {'scan_id': str(scan_id), 'status': 'rejected', 'message': 'scanned_at is in the future'}
+                    continue
+                if scanned_at < earliest_scanned_at:
+                    results[index] = {'scan_id': str(scan_id), 'status': 'rejected', 'message': f'scanned_at is older than {max_age_hours} hours'}
+                    continue
+
+            try:
+                position = scan_position(item)
+            except ValueError as e:
+                results[index] = {'scan_id': str(scan_id), 'status': 'rejected', 'message': str(e)}
+                continue
+
+            validation_result = qr_registry.resolve(qr_data, profile)
+            if not validation_result['success']:
+                results[index] = {'scan_id': str(scan_id), 'status': 'rejected', 'message': validation_result['message']}
+                continue
+
+            geofence = scan_geofence(validation_result, position)
+            if geofence and not geofence['within'] and enforce_geofence:
+                results[index] = {
+                    'scan_id': str(scan_id), 'status': 'rejected',
+                    'message': f"Scan is {geofence['distance_m']} m from the checkpoint, outside its {geofence['radius_m']} m geofence",
+                }
+                continue
+
+            accepted_ids.add(scan_id)
+            accepted.append((index, ScanLog(
+                security_guard=profile,
+                qr_data=qr_data,
+                comment=comment,
+                location=validation_result.get('location', ''),
+                client_scan_id=scan_id,
+                client_scanned_at=scanned_at,
+                latitude=position[0] if position else None,
+                longitude=position[1] if position else None,
+                geofence_distance_m=geofence['distance_m'] if geofence else None,
+                within_geofence=geofence['within'] if geofence else None,
+            ), validation_result))
+
+        # Anything already stored by an earlier upload is acknowledged, not re-applied
+        existing = dict(
+            ScanLog.objects.filter(security_guard=profile, client_scan_id__in=accepted_ids).values_list('client_scan_id', 'id')
+        )
+        to_create = []
+        for index, scan_log, validation_result in accepted:
+            if scan_log.client_scan_id in existing:
+                results[index] = {
+                    'scan_id': str(scan_log.client_scan_id),
+                    'status': 'duplicate',
+                    'scan_log_id': existing[scan_log.client_scan_id],
+                    'message': 'Scan already recorded',
+                }
+            else:
+                to_create.append((index, scan_log, validation_result))
+
+        try:
+            with transaction.atomic():
+                created_logs = ScanLog.objects.bulk_create([scan_log for _, scan_log, _ in to_create])
+
+                # bulk_create skips post_save, so visits are marked on the route bitmaps directly
+                for _, scan_log, _ in to_create:
+                    if scan_log.qr_data.startswith('member:'):
+                        route_progress.mark_scan(profile.id, scan_log.qr_data, timezone.localdate(
+                            scan_log.client_scanned_at or timezone.now()
+                        ))
+
+                # One compliance increment per day covered by the batch
+                patrols_per_day = Counter(
+                    timezone.localdate(scan_log.client_scanned_at) if scan_log.client_scanned_at else date.today()
+                    for _, scan_log, validation_result in to_create
+                    if validation_result.get('type') == 'member_checkpoint'
+                )
+                for day, count in patrols_per_day.items():
+                    record_checkpoint_scans(profile.id, day, count)
+        except IntegrityError:
+            # Only a concurrent upload storing some of these scan_ids first is worth retrying;
+            # a retry will mark them duplicate. Anything else is a server error.
+            if not ScanLog.objects.filter(
+                security_guard=profile, client_scan_id__in=[scan_log.client_scan_id for _, scan_log, _ in to_create]
+            ).exists():
+                raise
+            logger.warning("Batch scan conflict for %s", request.user.email)
+            return Response({'error': 'Batch conflicted with a concurrent upload, please retry'}, status=status.HTTP_409_CONFLICT)
+
+        for (index, scan_log, validation_result), created_log in zip(to_create, created_logs):
+            results[index] = {
+                'scan_id': str(scan_log.client_scan_id),
+                'status': 'created',
+                'scan_log_id': created_log.id,
+                'message': validation_result['message'],
+            }
+
+        summary = Counter(result['status'] for result in results)
+        logger.info("Batch scan for %s: %s", request.user.email, dict(summary))
+        return Response({
+            'success': True,
+            'created': summary['created'],
+            'duplicates': summary['duplicate'],
+            'rejected': summary['rejected'],
+            'results': results,
+        }, status=status.HTTP_200_OK)
+
+    except Exception as e:
+        logger.exception("Error processing batch scan")
+        return Response({'error': f'Batch scan failed: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['POST'])
+@permission_classes([IsApprovedGuard])
 def security_log_scan(request):
-    logger.info(f"Scan logging requested by {request.user.email}")
+    logger.info("Scan logging requested by %s", request.user.email)
     try:
         data = request.data
-        profile = SecurityProfile.objects.get(user=request.user)
+        profile = request.role.security_profile
 
         ScanLog.objects.create(
             security_guard=profile,
@@ -544,56 +539,43 @@ def security_log_scan(request):
             location=data.get('location', ''),
         )
 
-        logger.info(f"Scan logged for {request.user.email}: {data.get('location')}")
+        logger.info("Scan logged for %s: %s", request.user.email, data.get('location'))
         return Response({'success': True}, status=status.HTTP_201_CREATED)
 
-    except SecurityProfile.DoesNotExist:
-        logger.error(f"Profile not found for {request.user.email}")
-        return Response({'error': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
         logger.exception("Error logging scan")
         return Response({'error': f'Logging failed: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@replica_reads
 @api_view(['GET'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsApprovedGuard])
 def security_compliance(request):
-    logger.info(f"Compliance data requested by {request.user.email}")
-    try:
-        profile = SecurityProfile.objects.get(user=request.user)
-        logger.debug(f"Getting compliance data for {request.user.email}")
+    logger.info("Compliance data requested by %s", request.user.email)
+    profile = request.role.security_profile
+    logger.debug("Getting compliance data for %s", request.user.email)
 
-        # Get today's compliance record or create default
-        from datetime import date
-        today = date.today()
+    # Get today's compliance record or create default
+    from datetime import date
+    today = date.today()
 
-        try:
-            compliance = SecurityCompliance.objects.filter(
-                security_guard=profile,
-                date=today
-            ).first()
-
-            if compliance:
-                compliance_data = {
-                    'compliance_rate': round(compliance.compliance_score, 1),
-                    'completed_patrols': compliance.patrols_completed,
-                    'incidents_reported': compliance.incidents_reported,
-                    'tasks_completed': compliance.tasks_completed,
-                    'total_tasks': compliance.total_tasks_assigned,
-                    'on_time': compliance.on_time,
-                }
-            else:
-                # Default values if no record exists
-                compliance_data = {
-                    'compliance_rate': 0.0,
-                    'completed_patrols': 0,
-                    'incidents_reported': 0,
-                    'tasks_completed': 0,
-                    'total_tasks': 0,
-                    'on_time': True,
-                }
-        except Exception as e:
-            logger.warning(f"Error getting compliance data: {e}")
+    try:
+        compliance = SecurityCompliance.objects.filter(
+            security_guard=profile,
+            date=today
+        ).first()
+
+        if compliance:
+            compliance_data = {
+                'compliance_rate': round(compliance.compliance_score, 1),
+                'completed_patrols': compliance.patrols_completed,
+                'incidents_reported': compliance.incidents_reported,
+                'tasks_completed': compliance.tasks_completed,
+                'total_tasks': compliance.total_tasks_assigned,
+                'on_time': compliance.on_time,
+            }
+        else:
+            # Default values if no record exists
             compliance_data = {
                 'compliance_rate': 0.0,
                 'completed_patrols': 0,
@@ -602,119 +584,309 @@ def security_compliance(request):
                 'total_tasks': 0,
                 'on_time': True,
             }
+    except Exception as e:
+        logger.warning("Error getting compliance data: %s", e)
+        compliance_data = {
+            'compliance_rate': 0.0,
+            'completed_patrols': 0,
+            'incidents_reported': 0,
+            'tasks_completed': 0,
+            'total_tasks': 0,
+            'on_time': True,
+        }
+
+    # Calculate compliance metrics
+    on_time_patrols = 100.0 if compliance_data['on_time'] else 0.0
+    incident_reports = min(100.0, compliance_data['incidents_reported'] * 20.0)  # Assume up to 5 incidents = 100%
+    equipment_check = 100.0 if compliance_data['total_tasks'] > 0 and compliance_data['tasks_completed'] == compliance_data['total_tasks'] else 0.0
+    client_feedback = 85.0  # Mock value for now
+
+    return Response({
+        'compliance_rate': compliance_data['compliance_rate'],
+        'completed_patrols': compliance_data['completed_patrols'],
+        'compliance_metrics': {
+            'on_time_patrols': round(on_time_patrols, 1),
+            'incident_reports': round(incident_reports, 1),
+            'equipment_check': round(equipment_check, 1),
+            'client_feedback': client_feedback,
+        }
+    })
+
+
+@replica_reads
+@api_view(['GET'])
+@permission_classes([IsApprovedGuard])
+def security_route(request):
+    logger.info("Route data requested by %s", request.user.email)
+    profile = request.role.security_profile
 
-        # Calculate compliance metrics
-        on_time_patrols = 100.0 if compliance_data['on_time'] else 0.0
-        incident_reports = min(100.0, compliance_data['incidents_reported'] * 20.0)  # Assume up to 5 incidents = 100%
-        equipment_check = 100.0 if compliance_data['total_tasks'] > 0 and compliance_data['tasks_completed'] == compliance_data['total_tasks'] else 0.0
-        client_feedback = 85.0  # Mock value for now
+    # Get assigned route
+    try:
+        route = profile.assigned_routes.first()  # Get the first assigned route
+        if route:
+            members = {member.id: member for member in route.checkpoints.all()}
+            # Planned order (see adminstrator/route_planner.py); checkpoints added since the last plan follow by id
+            order = [member_id for member_id in route.checkpoint_order if member_id in members]
+            order += sorted(members.keys() - set(order))
+            checkpoints = []
+            for sequence, member_id in enumerate(order, start=1):
+                member = members[member_id]
+                checkpoints.append({
+                    'sequence': sequence,
+                    'id': member.id,
+                    'full_name': member.full_name,
+                    'address': member.address,
+                    'qr_code_data': member.qr_code_data,
+                    'latitude': member.latitude,
+                    'longitude': member.longitude,
+                })
 
-        return Response({
-            'compliance_rate': compliance_data['compliance_rate'],
-            'completed_patrols': compliance_data['completed_patrols'],
-            'compliance_metrics': {
-                'on_time_patrols': round(on_time_patrols, 1),
-                'incident_reports': round(incident_reports, 1),
-                'equipment_check': round(equipment_check, 1),
-                'client_feedback': client_feedback,
+            route_data = {
+                'id': route.id,
+                'name': route.name,
+                'description': route.description,
+                'checkpoints': checkpoints,
+                'total_checkpoints': len(checkpoints),
+                'planned_distance_m': route.planned_distance_m,
+                'estimated_walk_seconds': route.estimated_walk_seconds,
+                'planned_at': route.planned_at,
+                # Today's visits from the route's bitmap (see adminstrator/route_progress.py)
+                'progress': route_progress.route_progress(profile.id, route, timezone.localdate()),
             }
-        })
+        else:
+            route_data = None
+    except Exception as e:
+        logger.warning("Error getting route data: %s", e)
+        route_data = None
 
-    except SecurityProfile.DoesNotExist:
-        logger.error(f"Profile not found for {request.user.email}")
-        return Response({'error': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response({
+        'route': route_data,
+    })
 
 
+@replica_reads
 @api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def security_route(request):
-    logger.info(f"Route data requested by {request.user.email}")
+@permission_classes([IsApprovedGuardOrStaff])
+def security_scan_history(request):
+    """Cursor-paginated scan history.
+
+    Guards see their own scans; staff may pass ?guard=<SecurityProfile id> or omit it for all guards.
+    Filters: start, end (ISO date or datetime), location, qr_type (member, house, location).
+    Pass ?compact=1 or ?fields=id,qr_data,... to limit the returned columns.
+    """
+    logger.info("Scan history requested by %s", request.user.email)
     try:
-        profile = SecurityProfile.objects.get(user=request.user)
+        params = request.query_params
+        if request.user.is_staff:
+            guard_id = params.get('guard') or None
+            if guard_id is not None:
+                try:
+                    guard_id = int(guard_id)
+                except ValueError:
+                    return Response({'error': 'guard must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            guard_id = request.role.security_profile.id
 
-        # Get assigned route
         try:
-            route = profile.assigned_routes.first()  # Get the first assigned route
-            if route:
-                checkpoints = []
-                for member in route.checkpoints.all():
-                    checkpoints.append({
-                        'id': member.id,
-                        'full_name': member.full_name,
-                        'address': member.address,
-                        'qr_code_data': member.qr_code_data,
-                    })
-
-                route_data = {
-                    'id': route.id,
-                    'name': route.name,
-                    'description': route.description,
-                    'checkpoints': checkpoints,
-                    'total_checkpoints': len(checkpoints),
-                }
-            else:
-                route_data = None
-        except Exception as e:
-            logger.warning(f"Error getting route data: {e}")
-            route_data = None
+            limit = min(int(params.get('limit', scan_history.DEFAULT_PAGE_SIZE)), scan_history.MAX_PAGE_SIZE)
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            return Response({'error': 'limit must be a positive integer'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Get recent scans for progress tracking
-        from datetime import date, timedelta
-        today = date.today()
-        recent_scans = ScanLog.objects.filter(
-            security_guard=profile,
-            scanned_at__date__gte=today - timedelta(days=1)  # Last 24 hours
-        ).values_list('qr_data', flat=True)
+        try:
+            rows, next_cursor = scan_history.scan_history_page(
+                guard_id=guard_id,
+                start=scan_history.parse_bound(params.get('start')),
+                end=scan_history.parse_bound(params.get('end'), end=True),
+                location=params.get('location'),
+                qr_type=params.get('qr_type'),
+                cursor=params.get('cursor'),
+                limit=limit,
+                fields=scan_history.select_fields(params.get('fields'), compact=params.get('compact') in ('1', 'true')),
+            )
+        except scan_history.InvalidScanQuery as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response({
-            'route': route_data,
-            'recent_scans': list(recent_scans),
+            'results': rows,
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None,
         })
 
-    except SecurityProfile.DoesNotExist:
-        logger.error(f"Profile not found for {request.user.email}")
-        return Response({'error': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        logger.exception("Error getting scan history")
+        return Response({'error': f'Failed to get scan history: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
 @api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def get_panic_alerts(request):
-    logger.info(f"Panic alerts requested by {request.user.email}")
+@permission_classes([IsAdminUser])
+def route_index_stats(request):
+    """Hit/miss counters for the in-process route membership index"""
+    return Response(route_index.stats())
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def metrics(request):
+    """Per-view request metrics and log pipeline counters in Prometheus text format"""
+    body = instrumentation.metrics.prometheus() + log_pipeline.prometheus_lines()
+    return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def active_alert_payloads():
+    """Active panic alerts, newest first, with members loaded in the same query"""
+    alerts = PanicAlert.objects.filter(status='active').select_related('member').order_by('-timestamp')
+    return [alert_payload(alert) for alert in alerts]
+
+
+def alert_changes_since(since):
+    """Payloads of alerts raised or resolved at or after since, oldest first"""
+    alerts = PanicAlert.objects.filter(Q(timestamp__gte=since) | Q(resolved_at__gte=since)).select_related(
+        'member'
+    ).order_by('timestamp', 'id')
+    return [alert_payload(alert) for alert in alerts]
+
+
+# Seconds between keep-alive comments on an idle alert stream, and between re-reads of PanicAlert
+STREAM_HEARTBEAT_SECONDS = 15
+
+
+def _stream_security_profile(request):
+    """Resolve the guard for a stream request.
+
+    EventSource cannot set headers, so the token may also be passed as ?token=.
+    """
+    header = request.headers.get('Authorization', '')
+    key = header[len('Token '):].strip() if header.startswith('Token ') else request.GET.get('token')
+    if not key:
+        return None
+    try:
+        user, _ = CachedTokenAuthentication().authenticate_credentials(key)
+    except AuthenticationFailed:
+        return None
+    role = resolve_role(user)
+    return role.security_profile if role.is_approved_guard else False
+
+
+def _stream_cursor(request):
+    raw_cursor = request.headers.get('Last-Event-ID') or request.GET.get('cursor')
+    try:
+        return int(raw_cursor) if raw_cursor is not None else None
+    except ValueError:
+        return None
+
+
+async def panic_event_stream(cursor):
+    """Yield SSE frames: a snapshot when the cursor can't be replayed, then live events.
+
+    The hub only carries alerts written through this process, so every heartbeat also re-reads
+    PanicAlert and sends, without an event id, the changes that arrived through other workers.
+    """
+    subscription = alert_hub.subscribe()
+    # (event type, alert id) pairs already sent, so an alert seen both in the hub and the table goes out once
+    sent = set()
+
+    def unsent(event_type, data):
+        key = (event_type, data.get('id'))
+        if key in sent:
+            return False
+        sent.add(key)
+        return True
+
     try:
-        # Only security personnel can access this
-        SecurityProfile.objects.get(user=request.user)
+        polled_at = timezone.now()
+        last_id = cursor if cursor is not None else -1
+        backlog, complete = alert_hub.events_after(max(last_id, 0))
+        if cursor is None or not complete:
+            snapshot_id = alert_hub.last_id
+            alerts = await sync_to_async(active_alert_payloads)()
+            sent.update(('panic_created', alert['id']) for alert in alerts)
+            yield format_sse('snapshot', {'alerts': alerts}, snapshot_id)
+            last_id = snapshot_id
+            backlog = [event for event in backlog if event.id > snapshot_id]
+        for event in backlog:
+            if unsent(event.type, event.data):
+                yield format_sse(event.type, event.data, event.id)
+            last_id = event.id
+
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), timeout=STREAM_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # Reach back a heartbeat further so changes committed late in the last window are not missed
+                since = polled_at - timedelta(seconds=STREAM_HEARTBEAT_SECONDS)
+                polled_at = timezone.now()
+                quiet = True
+                for alert in await sync_to_async(alert_changes_since)(since):
+                    event_type = 'panic_created' if alert['status'] == 'active' else 'panic_resolved'
+                    if unsent(event_type, alert):
+                        quiet = False
+                        yield format_sse(event_type, alert)
+                if quiet:
+                    yield ': keep-alive\n\n'
+                continue
+            if subscription.overflowed:
+                subscription.overflowed = False
+                last_id = alert_hub.last_id
+                alerts = await sync_to_async(active_alert_payloads)()
+                sent.update(('panic_created', alert['id']) for alert in alerts)
+                yield format_sse('snapshot', {'alerts': alerts}, last_id)
+                continue
+            if event.id <= last_id:
+                continue  # Already sent from the backlog or covered by a snapshot
+            last_id = event.id
+            if unsent(event.type, event.data):
+                yield format_sse(event.type, event.data, event.id)
+    finally:
+        alert_hub.unsubscribe(subscription)
+
+
+async def panic_alert_stream(request):
+    """Server-Sent Events stream of panic alert create/resolve events for guards (serve via ASGI)"""
+    if not isinstance(request, ASGIRequest):
+        # WSGI buffers an async streaming body in full, so the stream would never reach the client
+        # and would hold a worker for good; send clients to the polling endpoint instead
+        return JsonResponse({
+            'error': 'The panic alert stream needs an ASGI server; poll the panic alerts endpoint instead',
+            'poll_url': reverse('security:get_panic_alerts'),
+        }, status=status.HTTP_501_NOT_IMPLEMENTED)
+    profile = await sync_to_async(_stream_security_profile)(request)
+    if profile is None:
+        return JsonResponse({'error': 'Authentication credentials were not provided.'}, status=status.HTTP_401_UNAUTHORIZED)
+    if profile is False:
+        logger.warning("Non-security user tried to open the panic alert stream")
+        return JsonResponse({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
+
+    logger.info("Panic alert stream opened by %s", profile.user.email)
+    response = StreamingHttpResponse(panic_event_stream(_stream_cursor(request)), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
+
+@api_view(['GET'])
+@permission_classes([IsApprovedGuard])
+def get_panic_alerts(request):
+    logger.info("Panic alerts requested by %s", request.user.email)
+    try:
         # Get active panic alerts
-        alerts = PanicAlert.objects.filter(status='active').order_by('-timestamp')
-
-        alert_data = []
-        for alert in alerts:
-            alert_data.append({
-                'id': alert.id,
-                'member_name': alert.member.get_full_name(),
-                'member_email': alert.member.email,
-                'address': alert.address,
-                'timestamp': alert.timestamp.isoformat(),
-                'status': alert.status
-            })
+        alert_data = active_alert_payloads()
 
         return Response({
             'success': True,
             'alerts': alert_data
         })
 
-    except SecurityProfile.DoesNotExist:
-        logger.warning(f"Non-security user {request.user.email} tried to access panic alerts")
-        return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
     except Exception as e:
-        logger.exception(f"Error getting panic alerts for {request.user.email}")
+        logger.exception("Error getting panic alerts for %s", request.user.email)
         return Response({'error': f'Failed to get alerts: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
 @api_view(['POST'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsApprovedGuard])
 def resolve_panic_alert(request):
-    logger.info(f"Panic alert resolution requested by {request.user.email}")
+    logger.info("Panic alert resolution requested by %s", request.user.email)
     try:
         data = request.data
         alert_id = data.get('alert_id')
@@ -724,27 +896,24 @@ def resolve_panic_alert(request):
         if not alert_id or alert_status not in ['resolved', 'false_alarm']:
             return Response({'error': 'alert_id and valid status required'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Only security personnel can resolve
-        profile = SecurityProfile.objects.get(user=request.user)
-
-        alert = PanicAlert.objects.get(id=alert_id)
+        alert = PanicAlert.objects.select_related('member').get(id=alert_id)
         alert.status = alert_status
         alert.resolved_by = request.user
         alert.resolved_at = timezone.now()
         alert.notes = notes
         alert.save()
 
-        logger.info(f"Panic alert {alert_id} resolved by {request.user.email} as {alert_status}")
+        payload = alert_payload(alert)
+        transaction.on_commit(lambda: alert_hub.publish('panic_resolved', payload))
+        logger.info("Panic alert %s resolved by %s as %s", alert_id, request.user.email, alert_status)
 
         return Response({
             'success': True,
             'message': f'Alert marked as {alert_status}'
         })
 
-    except SecurityProfile.DoesNotExist:
-        return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
     except PanicAlert.DoesNotExist:
         return Response({'error': 'Alert not found'}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
-        logger.exception(f"Error resolving panic alert")
+        logger.exception("Error resolving panic alert")
         return Response({'error': f'Failed to resolve alert: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)